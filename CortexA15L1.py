@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import os
 import m5
 from m5.objects import *
+from m5.util.convert import toMemorySize
 
 class L1ICache(Cache):
     tag_latency = 2
@@ -35,6 +37,153 @@ class L2Cache(Cache):
     def connectCPUSideBus(self, bus): self.cpu_side = bus.mem_side_ports
     def connectMemSideBus(self, bus): self.mem_side = bus.cpu_side_ports
 
+# Dernier niveau partage des configurations multi-coeurs (--l3-size)
+class L3Cache(Cache):
+    tag_latency = 20
+    data_latency = 20
+    response_latency = 20
+    mshrs = 32
+    tgts_per_mshr = 12
+    def connectCPUSideBus(self, bus): self.cpu_side = bus.mem_side_ports
+    def connectMemSideBus(self, bus): self.mem_side = bus.cpu_side_ports
+
+# Prefetchers de --l1d-prefetcher / --l2-prefetcher. gem5 n'a pas de prefetcher
+# "stream" simple : "stream" = AMPM (access map pattern matching), qui detecte
+# les flux sequentiels par zone memoire. BOP choisit son offset et n'a pas de
+# parametre degree : --pf-degree ne le change pas.
+PREFETCHERS = {
+    "stride": StridePrefetcher,
+    "tagged": TaggedPrefetcher,
+    "bop": BOPPrefetcher,
+    "stream": AMPMPrefetcher,
+}
+
+def make_prefetcher(kind, degree):
+    pf = PREFETCHERS[kind]()
+    if degree and kind != "bop":
+        if kind == "stream":
+            pf.ampm.start_degree = degree
+        else:
+            pf.degree = degree
+    return pf
+
+# Prefetch instructions de --l1i-prefetcher. Le fetch O3 de gem5 n'a pas de
+# front-end decouple, donc pas de vrai prefetch dirige par le fetch : "ahead"
+# entraine un prefetcher tagged sur chaque acces fetch et garde --pf-degree
+# lignes (4 par defaut) d'avance sur le flux, le plus proche disponible.
+# "nextline" = prefetch tagged classique de la ligne suivante.
+ICACHE_PREFETCHERS = ["nextline", "ahead"]
+
+def setup_icache_prefetch(icache, kind, degree):
+    icache.prefetcher = TaggedPrefetcher()
+    if kind == "nextline":
+        icache.prefetcher.degree = 1
+        icache.prefetch_on_pf_hit = True
+    else:
+        icache.prefetcher.degree = degree or 4
+        icache.prefetch_on_access = True
+
+# Politiques de remplacement de --l1-replacement / --l2-replacement
+# (LRU par defaut dans gem5).
+REPLACEMENT = {
+    "lru": LRURP,
+    "plru": TreePLRURP,
+    "random": RandomRP,
+    "bip": BIPRP,
+    "rrip": RRIPRP,
+    "brrip": BRRIPRP,
+    "fifo": FIFORP,
+}
+
+# Compresseurs de --l1d-compressor / --l2-compressor.
+COMPRESSORS = {
+    "bdi": BDI,
+    "cpack": CPack,
+    "fpc": FPC,
+}
+
+# Un cache compresse garde sa zone de donnees mais ses tags adressent des
+# superblocs d'au plus `ratio` lignes compressees : il contient d'autant plus
+# de lignes qu'elles se compressent bien ; la latence de decompression
+# s'ajoute a chaque hit sur une ligne compressee.
+def setup_compression(cache, kind, ratio):
+    cache.compressor = COMPRESSORS[kind]()
+    cache.tags = CompressedTags(max_compression_ratio=ratio)
+
+# Cache sectorise : un tag par secteur de `blocks` lignes consecutives, chaque
+# ligne avec son bit de validite ; un miss ne remplit que sa ligne, mais
+# l'eviction d'un secteur vide toutes ses lignes. Meme zone de donnees,
+# `blocks` fois moins de tags.
+def setup_sectors(cache, blocks):
+    cache.tags = SectorTags(num_blocks_per_sector=blocks)
+
+# Les caches classiques de gem5 sont toujours write-back. --l1d-write-policy
+# no-allocate ajoute un WriteAllocator : au-dela d'une ligne de stores
+# consecutifs il n'alloue plus et envoie les lignes (coalescees) a L2.
+def setup_write_no_allocate(cache):
+    cache.write_allocator = WriteAllocator(coalesce_limit=0, no_allocate_limit=1)
+
+# --l2-clusivity. La L2 mostly exclusive est remplie par les victimes des L1,
+# que celles-ci ecrivent deja en retour propres ou sales (writeback_clean).
+CLUSIVITY = {"incl": "mostly_incl", "excl": "mostly_excl"}
+
+# Tailles L1 qui ne sont pas des puissances de 2 (partages I/D d'un budget
+# fixe, ex. 12kB) : plus petite associativite a partir de `assoc` qui donne
+# un nombre d'ensembles puissance de 2 ; les autres gardent `assoc`.
+def fit_assoc(size, line, assoc):
+    lines = int(toMemorySize(size)) // line
+    while assoc < lines and (lines % assoc or (lines // assoc) & (lines // assoc - 1)):
+        assoc += 1
+    return assoc
+
+# Latence de L2/L3 (tag = data = reponse, en cycles) selon la capacite pour
+# --l2-size et --l3-size : environ x1,3 par doublement, comme les temps
+# d'acces CACTI, calee sur la L2 d'origine de 512kB / 10 cycles. Une taille
+# entre deux entrees prend la latence de la suivante. --l2-latency-table
+# remplace cette table (lignes "<taille> <cycles>", ex. temps d'acces CACTI
+# x frequence) et --l2-latency fixe directement la latence.
+L2_LATENCY = {"64kB": 5, "128kB": 6, "256kB": 8, "512kB": 10, "1MB": 13, "2MB": 17, "4MB": 22,
+              "8MB": 28, "16MB": 36}
+
+def read_latency_table(path):
+    table = {}
+    with open(path) as f:
+        for line in f:
+            fields = line.split("#")[0].split()
+            if fields:
+                table[fields[0]] = int(fields[1])
+    return table
+
+# Latence de la plus petite taille de la table qui contient `size` (None au-dela).
+def l2_latency(size, table):
+    need = toMemorySize(size)
+    fits = sorted((toMemorySize(s), cycles) for s, cycles in table.items() if toMemorySize(s) >= need)
+    return fits[0][1] if fits else None
+
+# Benchmarks des autres coeurs d'un run --mix, et des copies d'un --cmd pris
+# dans l'un de ces dossiers, pour un jeu de donnees (chemins relatifs a ce
+# fichier, dans Tp4). Blowfish chiffre vers /dev/null : les copies n'ecrivent
+# jamais dans le fichier de sortie du coeur 0.
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHMARKS = {
+    "dijkstra": ["dijkstra/dijkstra_{jeu}.riscv", "dijkstra/input.dat"],
+    "blowfish": ["blowfish/bf.riscv", "e", "blowfish/input_{jeu}.asc", os.devnull,
+                 "1234567890abcdeffedcba0987654321"],
+    "sha": ["SHA/sha.riscv", "SHA/input_{jeu}.asc"],
+}
+
+def benchmark_cmd(name, jeu):
+    args = [a.format(jeu=jeu) for a in BENCHMARKS[name]]
+    return [os.path.join(REPO_DIR, a) if "/" in a else a for a in args]
+
+# Commande des copies de --cmd : l'entree BENCHMARKS de son dossier, sinon
+# --cmd et --options tels quels.
+def copy_cmd(args):
+    name = os.path.basename(os.path.dirname(os.path.abspath(args.cmd))).lower()
+    if name in BENCHMARKS:
+        return benchmark_cmd(name, args.mix_dataset)
+    return [args.cmd] + args.options
+
 def parse_args():
     ap = argparse.ArgumentParser()
     ap.add_argument("--cmd", required=True, help="binaire a executer")
@@ -46,58 +195,234 @@ def parse_args():
 
     # NEW: pour varier simultanement L1I et L1D (1kB,2kB,4kB,8kB,16kB)
     ap.add_argument("--l1-size", default="32kB")
+    # Ou chacune separement (defaut : --l1-size)
+    ap.add_argument("--l1i-size")
+    ap.add_argument("--l1d-size")
 
-    return ap.parse_args()
+    # Prefetchers sur L1D et L2 (aucun par defaut, comme les sweeps d'origine)
+    ap.add_argument("--l1d-prefetcher", choices=["none"] + sorted(PREFETCHERS), default="none")
+    ap.add_argument("--l2-prefetcher", choices=["none"] + sorted(PREFETCHERS), default="none")
+    ap.add_argument("--pf-degree", type=int, default=0, help="degre de prefetch (0 : defaut gem5 ; ignore par bop)")
+    ap.add_argument("--l1i-prefetcher", choices=["none"] + ICACHE_PREFETCHERS, default="none")
 
-def build_system(args):
-    system = System()
-    system.clk_domain = SrcClockDomain(clock=args.clock, voltage_domain=VoltageDomain())
-    system.mem_mode = "timing"
-    system.mem_ranges = [AddrRange(args.mem_size)]
+    # Politique de remplacement de L1I/L1D et de L2
+    ap.add_argument("--l1-replacement", choices=sorted(REPLACEMENT), default="lru")
+    ap.add_argument("--l2-replacement", choices=sorted(REPLACEMENT), default="lru")
+
+    # L1D / L2 compresses (non compresses par defaut)
+    ap.add_argument("--l1d-compressor", choices=["none"] + sorted(COMPRESSORS), default="none")
+    ap.add_argument("--l2-compressor", choices=["none"] + sorted(COMPRESSORS), default="none")
+    ap.add_argument("--max-compression-ratio", type=int, default=2,
+                    help="lignes compressees par entree de tag d'un cache compresse")
+
+    # Tags sectorises sur L1D / L2 (0 : un tag par ligne)
+    ap.add_argument("--l1d-sector-blocks", type=int, default=0,
+                    help="lignes par secteur, puissance de 2 (secteur = lignes x taille de ligne)")
+    ap.add_argument("--l2-sector-blocks", type=int, default=0,
+                    help="lignes par secteur, puissance de 2 (secteur = lignes x taille de ligne)")
 
-    system.cache_line_size = 64
+    # Politique d'ecriture et clusivite de L2 (defaut gem5 : write-allocate, mostly inclusive)
+    ap.add_argument("--l1d-write-policy", choices=["allocate", "no-allocate"], default="allocate")
+    ap.add_argument("--l1d-write-buffers", type=int, default=0,
+                    help="entrees du write buffer de L1D (0 : 8, defaut gem5)")
+    ap.add_argument("--l2-clusivity", choices=sorted(CLUSIVITY), default="incl")
 
-    system.cpu = DerivO3CPU()
+    # Taille et associativite de L2 ("none" : pas de L2, les L1 sur le bus
+    # memoire) ; la latence suit la taille (L2_LATENCY) sauf si donnee
+    ap.add_argument("--l2-size", default="512kB")
+    ap.add_argument("--l2-assoc", type=int, default=16)
+    ap.add_argument("--l2-latency", type=int, default=0,
+                    help="latence tag/data/reponse de L2 en cycles (0 : selon la taille)")
+    ap.add_argument("--l2-latency-table", help='fichier de lignes "<taille> <cycles>" remplacant L2_LATENCY')
 
-    system.cpu.fetchQueueSize = 15
+    # Taille de ligne de tous les niveaux ; le fetch buffer s'y adapte
+    ap.add_argument("--line-size", type=int, choices=[16, 32, 64, 128], default=64)
 
-    system.cpu.decodeWidth  = 4
-    system.cpu.issueWidth   = 8
-    system.cpu.commitWidth  = 4
+    # Taille du front-end (0 : valeurs Cortex-A15 ci-dessous)
+    ap.add_argument("--fetch-buffer-size", type=int, default=0, help="fetch buffer en octets (<= ligne)")
+    ap.add_argument("--fetch-queue-size", type=int, default=0, help="entrees de la fetch queue")
 
-    system.cpu.fetchWidth    = 4
-    system.cpu.renameWidth   = 8
-    system.cpu.dispatchWidth = 8
-    system.cpu.wbWidth       = 4
+    # Multi-coeurs : --cmd sur le coeur 0, ses copies ou les benchmarks de
+    # --mix (a tour de role) sur les autres ; L1 privees, L2 privees ou
+    # partagee, L3 partagee optionnelle. Un seul coeur garde les noms de
+    # stats mono-coeur (system.cpu).
+    ap.add_argument("--cores", type=int, default=0, help="nombre de coeurs (0 : 1 + nombre de benchmarks --mix)")
+    ap.add_argument("--mix", default="", help="benchmarks des coeurs 1.., separes par des virgules (%s)"
+                    % ", ".join(BENCHMARKS))
+    ap.add_argument("--mix-dataset", choices=["small", "large"], default="small",
+                    help="jeu de donnees des benchmarks --mix et des copies de --cmd")
+    ap.add_argument("--l2-sharing", choices=["private", "shared"], default="private")
+    ap.add_argument("--l3-size", default="none", help='taille de la L3 partagee ("none" : pas de L3)')
+    ap.add_argument("--l3-assoc", type=int, default=16)
+    ap.add_argument("--l3-latency", type=int, default=0,
+                    help="latence tag/data/reponse de L3 en cycles (0 : selon la taille)")
 
-    system.cpu.numROBEntries = 16
-    system.cpu.LQEntries = 16
-    system.cpu.SQEntries = 16
+    # Stats output: stats.txt, gzip-compressed stats.txt.gz or gem5's HDF5 stats.h5
+    ap.add_argument("--stats-format", choices=["text", "gzip", "hdf5"], default="text")
 
-    system.cpu.branchPred = LocalBP()
-    system.cpu.branchPred.BTBEntries = 256
+    args = ap.parse_args()
+    args.l1i_size = args.l1i_size or args.l1_size
+    args.l1d_size = args.l1d_size or args.l1_size
+    for level in ("l1d", "l2"):
+        if getattr(args, f"{level}_sector_blocks") and getattr(args, f"{level}_compressor") != "none":
+            ap.error(f"--{level}-sector-blocks et --{level}-compressor remplacent tous deux les tags")
+    if args.fetch_buffer_size > args.line_size:
+        ap.error(f"--fetch-buffer-size {args.fetch_buffer_size} depasse la ligne de {args.line_size}B")
+    if args.l2_size == "none":
+        l2_opts = (args.l2_prefetcher, args.l2_replacement, args.l2_compressor,
+                   args.l2_sector_blocks, args.l2_clusivity)
+        if l2_opts != ("none", "lru", "none", 0, "incl"):
+            ap.error("--l2-size none : pas de L2 pour les autres options --l2-*")
+    table = read_latency_table(args.l2_latency_table) if args.l2_latency_table else L2_LATENCY
+    if args.l2_size != "none" and not args.l2_latency:
+        args.l2_latency = l2_latency(args.l2_size, table)
+        if args.l2_latency is None:
+            ap.error(f"--l2-size {args.l2_size} depasse la table de latences de L2, donner --l2-latency")
+    if args.l3_size != "none" and not args.l3_latency:
+        args.l3_latency = l2_latency(args.l3_size, table)
+        if args.l3_latency is None:
+            ap.error(f"--l3-size {args.l3_size} depasse la table de latences, donner --l3-latency")
+    args.mix = [m for m in args.mix.split(",") if m]
+    unknown = [m for m in args.mix if m not in BENCHMARKS]
+    if unknown:
+        ap.error(f"--mix : benchmark(s) inconnu(s) {', '.join(unknown)}")
+    args.cores = args.cores or 1 + len(args.mix)
+    if args.cores < 1:
+        ap.error("--cores doit valoir au moins 1")
+    return args
 
-    system.cpu.icache = L1ICache()
-    system.cpu.icache.size = args.l1_size
-    system.cpu.icache.assoc = 2
+# Un coeur Cortex-A15 et ses L1I/L1D privees
+def make_cpu(args):
+    cpu = DerivO3CPU()
 
-    system.cpu.dcache = L1DCache()
-    system.cpu.dcache.size = args.l1_size
-    system.cpu.dcache.assoc = 2
+    # fetch buffer : 64B (defaut gem5), ramene a la ligne si elle est plus petite
+    # (sinon "fetch buffer 64 > block 32")
+    cpu.fetchBufferSize = min(64, args.line_size)
+    cpu.fetchQueueSize = 15
+    if args.fetch_buffer_size:
+        cpu.fetchBufferSize = args.fetch_buffer_size
+    if args.fetch_queue_size:
+        cpu.fetchQueueSize = args.fetch_queue_size
 
-    system.l2bus = L2XBar()
-    system.l2cache = L2Cache()
-    system.l2cache.size = "512kB"
-    system.l2cache.assoc = 16
+    cpu.decodeWidth  = 4
+    cpu.issueWidth   = 8
+    cpu.commitWidth  = 4
 
-    system.cpu.icache.connectCPU(system.cpu)
-    system.cpu.dcache.connectCPU(system.cpu)
-    system.cpu.icache.connectBus(system.l2bus)
-    system.cpu.dcache.connectBus(system.l2bus)
-    system.l2cache.connectCPUSideBus(system.l2bus)
+    cpu.fetchWidth    = 4
+    cpu.renameWidth   = 8
+    cpu.dispatchWidth = 8
+    cpu.wbWidth       = 4
 
+    cpu.numROBEntries = 16
+    cpu.LQEntries = 16
+    cpu.SQEntries = 16
+
+    cpu.branchPred = LocalBP()
+    cpu.branchPred.BTBEntries = 256
+
+    cpu.icache = L1ICache()
+    cpu.icache.size = args.l1i_size
+    cpu.icache.assoc = fit_assoc(args.l1i_size, args.line_size, 2)
+    cpu.icache.replacement_policy = REPLACEMENT[args.l1_replacement]()
+    if args.l1i_prefetcher != "none":
+        setup_icache_prefetch(cpu.icache, args.l1i_prefetcher, args.pf_degree)
+
+    cpu.dcache = L1DCache()
+    cpu.dcache.size = args.l1d_size
+    cpu.dcache.assoc = fit_assoc(args.l1d_size, args.line_size, 2)
+    cpu.dcache.replacement_policy = REPLACEMENT[args.l1_replacement]()
+    if args.l1d_prefetcher != "none":
+        cpu.dcache.prefetcher = make_prefetcher(args.l1d_prefetcher, args.pf_degree)
+    if args.l1d_compressor != "none":
+        setup_compression(cpu.dcache, args.l1d_compressor, args.max_compression_ratio)
+    if args.l1d_sector_blocks:
+        setup_sectors(cpu.dcache, args.l1d_sector_blocks)
+    if args.l1d_write_policy == "no-allocate":
+        setup_write_no_allocate(cpu.dcache)
+    if args.l1d_write_buffers:
+        cpu.dcache.write_buffers = args.l1d_write_buffers
+    return cpu
+
+def make_l2(args):
+    l2 = L2Cache()
+    l2.size = args.l2_size
+    l2.assoc = fit_assoc(args.l2_size, args.line_size, args.l2_assoc)
+    l2.tag_latency = args.l2_latency
+    l2.data_latency = args.l2_latency
+    l2.response_latency = args.l2_latency
+    l2.replacement_policy = REPLACEMENT[args.l2_replacement]()
+    if args.l2_prefetcher != "none":
+        l2.prefetcher = make_prefetcher(args.l2_prefetcher, args.pf_degree)
+    if args.l2_compressor != "none":
+        setup_compression(l2, args.l2_compressor, args.max_compression_ratio)
+    if args.l2_sector_blocks:
+        setup_sectors(l2, args.l2_sector_blocks)
+    l2.clusivity = CLUSIVITY[args.l2_clusivity]
+    return l2
+
+def build_system(args):
+    system = System()
+    system.clk_domain = SrcClockDomain(clock=args.clock, voltage_domain=VoltageDomain())
+    system.mem_mode = "timing"
+    system.mem_ranges = [AddrRange(args.mem_size)]
+
+    system.cache_line_size = args.line_size
+
+    cpus = [make_cpu(args) for _ in range(args.cores)]
+    if len(cpus) == 1:
+        system.cpu = cpus[0]
+    else:
+        for i, cpu in enumerate(cpus):
+            cpu.cpu_id = i
+        system.cpu = cpus
+
+    # Bus memoire ; avec --l3-size une L3 partagee devant lui
     system.membus = SystemXBar()
-    system.l2cache.connectMemSideBus(system.membus)
+    below = system.membus
+    if args.l3_size != "none":
+        system.l3bus = L2XBar()
+        system.l3cache = L3Cache()
+        system.l3cache.size = args.l3_size
+        system.l3cache.assoc = fit_assoc(args.l3_size, args.line_size, args.l3_assoc)
+        system.l3cache.tag_latency = args.l3_latency
+        system.l3cache.data_latency = args.l3_latency
+        system.l3cache.response_latency = args.l3_latency
+        system.l3cache.connectCPUSideBus(system.l3bus)
+        system.l3cache.connectMemSideBus(system.membus)
+        below = system.l3bus
+
+    # L2 : 512kB 16 voies par defaut (--l2-size, --l2-assoc), une par coeur ou
+    # partagee (--l2-sharing) ; sans L2, les L1 directement sur la L3 ou le
+    # bus memoire
+    for cpu in cpus:
+        cpu.icache.connectCPU(cpu)
+        cpu.dcache.connectCPU(cpu)
+    if args.l2_size == "none":
+        for cpu in cpus:
+            if args.l3_size == "none":
+                # Rien sous les L1 pour garder les victimes propres : on les jette
+                cpu.icache.writeback_clean = False
+                cpu.dcache.writeback_clean = False
+            cpu.icache.connectBus(below)
+            cpu.dcache.connectBus(below)
+    elif len(cpus) == 1 or args.l2_sharing == "shared":
+        system.l2bus = L2XBar()
+        system.l2cache = make_l2(args)
+        for cpu in cpus:
+            cpu.icache.connectBus(system.l2bus)
+            cpu.dcache.connectBus(system.l2bus)
+        system.l2cache.connectCPUSideBus(system.l2bus)
+        system.l2cache.connectMemSideBus(below)
+    else:
+        buses = [L2XBar() for _ in cpus]
+        l2s = [make_l2(args) for _ in cpus]
+        system.l2bus = buses
+        system.l2cache = l2s
+        for cpu, bus, l2 in zip(cpus, buses, l2s):
+            cpu.icache.connectBus(bus)
+            cpu.dcache.connectBus(bus)
+            l2.connectCPUSideBus(bus)
+            l2.connectMemSideBus(below)
     system.system_port = system.membus.cpu_side_ports
 
     system.mem_ctrl = MemCtrl()
@@ -105,20 +430,43 @@ def build_system(args):
     system.mem_ctrl.dram.range = system.mem_ranges[0]
     system.mem_ctrl.port = system.membus.mem_side_ports
 
-    process = Process()
-    process.cmd = [args.cmd] + args.options
+    # --cmd sur le coeur 0, puis ses copies ou les benchmarks de --mix
+    cmds = [[args.cmd] + args.options]
+    for i in range(1, len(cpus)):
+        if args.mix:
+            cmds.append(benchmark_cmd(args.mix[(i - 1) % len(args.mix)], args.mix_dataset))
+        else:
+            cmds.append(copy_cmd(args))
     system.workload = SEWorkload.init_compatible(args.cmd)
-    system.cpu.workload = process
-    system.cpu.createThreads()
-    system.cpu.createInterruptController()
+    for i, (cpu, cmd) in enumerate(zip(cpus, cmds)):
+        process = Process(pid=100 + i)
+        process.cmd = cmd
+        cpu.workload = process
+        cpu.createThreads()
+        cpu.createInterruptController()
 
     return system
 
+def setup_stats(fmt):
+    # gem5 has opened its text output (--stats-file, stats.txt) before running
+    # this script; swap it for a text visitor on stats.txt.gz (gem5 gzips
+    # output files named *.gz as it writes them) or for the h5 visitor (needs
+    # gem5 built with HDF5)
+    if fmt == "text":
+        return
+    del m5.stats.outputList[:]
+    m5.stats.addStatVisitor("stats.txt.gz" if fmt == "gzip" else "h5://stats.h5")
+    # Drop the stats.txt left empty now, so readers never take it for the stats
+    txt = os.path.join(m5.options.outdir, "stats.txt")
+    if os.path.isfile(txt) and os.path.getsize(txt) == 0:
+        os.remove(txt)
+
 def main():
     args = parse_args()
     system = build_system(args)
     root = Root(full_system=False, system=system)
     m5.instantiate()
+    setup_stats(args.stats_format)
 
     if args.maxinsts > 0:
         ev = m5.simulate(args.maxinsts)
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import os
 import m5
 from m5.objects import *
 
@@ -42,6 +43,8 @@ def parse_args():
     ap.add_argument("--clock", default="2GHz")
     ap.add_argument("--mem-size", default="2GB")
     ap.add_argument("--maxinsts", type=int, default=0)
+    # Stats output: stats.txt, gzip-compressed stats.txt.gz or gem5's HDF5 stats.h5
+    ap.add_argument("--stats-format", choices=["text", "gzip", "hdf5"], default="text")
     return ap.parse_args()
 
 def build_system(args):
@@ -125,11 +128,26 @@ def build_system(args):
 
     return system
 
+def setup_stats(fmt):
+    # gem5 has opened its text output (--stats-file, stats.txt) before running
+    # this script; swap it for a text visitor on stats.txt.gz (gem5 gzips
+    # output files named *.gz as it writes them) or for the h5 visitor (needs
+    # gem5 built with HDF5)
+    if fmt == "text":
+        return
+    del m5.stats.outputList[:]
+    m5.stats.addStatVisitor("stats.txt.gz" if fmt == "gzip" else "h5://stats.h5")
+    # Drop the stats.txt left empty now, so readers never take it for the stats
+    txt = os.path.join(m5.options.outdir, "stats.txt")
+    if os.path.isfile(txt) and os.path.getsize(txt) == 0:
+        os.remove(txt)
+
 def main():
     args = parse_args()
     system = build_system(args)
     root = Root(full_system=False, system=system)
     m5.instantiate()
+    setup_stats(args.stats_format)
 
     if args.maxinsts > 0:
         ev = m5.simulate(args.maxinsts)
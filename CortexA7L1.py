@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 
 import argparse
+import os
 import m5
 from m5.objects import *
+from m5.util.convert import toMemorySize
 
 
 class L1ICache(Cache):
@@ -51,6 +53,174 @@ class L2Cache(Cache):
         self.mem_side = bus.cpu_side_ports
 
 
+# Shared last level of the multi-core configurations (--l3-size)
+class L3Cache(Cache):
+    tag_latency = 20
+    data_latency = 20
+    response_latency = 20
+    mshrs = 32
+    tgts_per_mshr = 12
+
+    def connectCPUSideBus(self, bus):
+        self.cpu_side = bus.mem_side_ports
+
+    def connectMemSideBus(self, bus):
+        self.mem_side = bus.cpu_side_ports
+
+
+# Hardware prefetchers for --l1d-prefetcher / --l2-prefetcher. gem5 has no
+# plain stream prefetcher: "stream" is AMPM (access map pattern matching),
+# which detects sequential streams over memory zones. BOP picks its own offset
+# and has no degree parameter, so --pf-degree leaves it alone.
+PREFETCHERS = {
+    "stride": StridePrefetcher,
+    "tagged": TaggedPrefetcher,
+    "bop": BOPPrefetcher,
+    "stream": AMPMPrefetcher,
+}
+
+
+def make_prefetcher(kind, degree):
+    pf = PREFETCHERS[kind]()
+    if degree and kind != "bop":
+        if kind == "stream":
+            pf.ampm.start_degree = degree
+        else:
+            pf.degree = degree
+    return pf
+
+
+# Instruction prefetch for --l1i-prefetcher. gem5's O3 fetch has no decoupled
+# front-end, so there is no true fetch-directed prefetcher: "ahead" trains a
+# tagged prefetcher on every fetch access and keeps --pf-degree lines (4 by
+# default) ahead of the fetch stream, the closest available. "nextline" is
+# classic tagged next-line prefetch (on a miss or the first hit to a
+# prefetched line).
+ICACHE_PREFETCHERS = ["nextline", "ahead"]
+
+
+def setup_icache_prefetch(icache, kind, degree):
+    icache.prefetcher = TaggedPrefetcher()
+    if kind == "nextline":
+        icache.prefetcher.degree = 1
+        icache.prefetch_on_pf_hit = True
+    else:
+        icache.prefetcher.degree = degree or 4
+        icache.prefetch_on_access = True
+
+
+# Replacement policies for --l1-replacement / --l2-replacement (gem5's
+# default is LRU).
+REPLACEMENT = {
+    "lru": LRURP,
+    "plru": TreePLRURP,
+    "random": RandomRP,
+    "bip": BIPRP,
+    "rrip": RRIPRP,
+    "brrip": BRRIPRP,
+    "fifo": FIFORP,
+}
+
+
+# Compressors for --l1d-compressor / --l2-compressor.
+COMPRESSORS = {
+    "bdi": BDI,
+    "cpack": CPack,
+    "fpc": FPC,
+}
+
+
+# A compressed cache keeps its data array but its tags address superblocks
+# of up to `ratio` compressed lines, so it holds more lines the better they
+# compress; decompression latency is added to every hit on a compressed line.
+def setup_compression(cache, kind, ratio):
+    cache.compressor = COMPRESSORS[kind]()
+    cache.tags = CompressedTags(max_compression_ratio=ratio)
+
+
+# Sector cache: one tag per sector of `blocks` consecutive lines, each line
+# with its own valid bit; a miss fills only its line, but a sector eviction
+# drops every line of the sector. Same data array, `blocks` times fewer tags.
+def setup_sectors(cache, blocks):
+    cache.tags = SectorTags(num_blocks_per_sector=blocks)
+
+
+# gem5's classic caches are write-back only. --l1d-write-policy no-allocate
+# adds a WriteAllocator: past one line of consecutive stores it stops
+# allocating and sends the (coalesced) lines to L2 instead.
+def setup_write_no_allocate(cache):
+    cache.write_allocator = WriteAllocator(coalesce_limit=0, no_allocate_limit=1)
+
+
+# --l2-clusivity. The mostly exclusive L2 is filled by the L1 victims, which
+# the L1s already write back clean or dirty (writeback_clean above).
+CLUSIVITY = {"incl": "mostly_incl", "excl": "mostly_excl"}
+
+
+# L1 sizes that are not a power of two (I/D splits of a fixed budget, e.g.
+# 12kB) get the smallest associativity from `assoc` up that leaves a
+# power-of-two number of sets; other sizes keep `assoc`.
+def fit_assoc(size, line, assoc):
+    lines = int(toMemorySize(size)) // line
+    while assoc < lines and (lines % assoc or (lines // assoc) & (lines // assoc - 1)):
+        assoc += 1
+    return assoc
+
+
+# L2/L3 hit latency (tag = data = response, in cycles) by capacity for
+# --l2-size and --l3-size: about x1.3 per doubling, as CACTI access times
+# grow, anchored on the original 512kB L2 / 10 cycles. A size between two
+# entries takes the latency of the next larger one. --l2-latency-table
+# replaces this table (lines "<size> <cycles>", e.g. CACTI access times times
+# the clock) and --l2-latency sets the latency directly.
+L2_LATENCY = {"64kB": 5, "128kB": 6, "256kB": 8, "512kB": 10, "1MB": 13, "2MB": 17, "4MB": 22,
+              "8MB": 28, "16MB": 36}
+
+
+def read_latency_table(path):
+    table = {}
+    with open(path) as f:
+        for line in f:
+            fields = line.split("#")[0].split()
+            if fields:
+                table[fields[0]] = int(fields[1])
+    return table
+
+
+# Latency of the smallest table size that holds `size` (None past the table).
+def l2_latency(size, table):
+    need = toMemorySize(size)
+    fits = sorted((toMemorySize(s), cycles) for s, cycles in table.items() if toMemorySize(s) >= need)
+    return fits[0][1] if fits else None
+
+
+# Benchmarks of the other cores of a --mix run, and of the copies of a --cmd
+# from one of these folders, for a data set (paths relative to this file, in
+# the Tp4 folder). Blowfish encrypts to /dev/null, so the copies never write
+# to the output file of core 0.
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+BENCHMARKS = {
+    "dijkstra": ["dijkstra/dijkstra_{jeu}.riscv", "dijkstra/input.dat"],
+    "blowfish": ["blowfish/bf.riscv", "e", "blowfish/input_{jeu}.asc", os.devnull,
+                 "1234567890abcdeffedcba0987654321"],
+    "sha": ["SHA/sha.riscv", "SHA/input_{jeu}.asc"],
+}
+
+
+def benchmark_cmd(name, jeu):
+    args = [a.format(jeu=jeu) for a in BENCHMARKS[name]]
+    return [os.path.join(REPO_DIR, a) if "/" in a else a for a in args]
+
+
+# Command of the copies of --cmd: the BENCHMARKS entry of its folder, else
+# --cmd and --options unchanged.
+def copy_cmd(args):
+    name = os.path.basename(os.path.dirname(os.path.abspath(args.cmd))).lower()
+    if name in BENCHMARKS:
+        return benchmark_cmd(name, args.mix_dataset)
+    return [args.cmd] + args.options
+
+
 def parse_args():
     ap = argparse.ArgumentParser()
     ap.add_argument("--cmd", required=True)
@@ -61,77 +231,252 @@ def parse_args():
 
     # NEW: vary L1I and L1D simultaneously (e.g., 1kB, 2kB, 4kB, 8kB, 16kB)
     ap.add_argument("--l1-size", default="32kB")
-
-    return ap.parse_args()
-
-
-def build_system(args):
-    system = System()
-    system.clk_domain = SrcClockDomain(
-        clock=args.clock, voltage_domain=VoltageDomain()
-    )
-    system.mem_mode = "timing"
-    system.mem_ranges = [AddrRange(args.mem_size)]
-
-    # Cortex A7: cache line size 32B
-    system.cache_line_size = 32
-
-    system.cpu = DerivO3CPU()
+    # Or each one on its own (default: --l1-size)
+    ap.add_argument("--l1i-size")
+    ap.add_argument("--l1d-size")
+
+    # Prefetchers on L1D and L2 (none by default, as in the original sweeps)
+    ap.add_argument("--l1d-prefetcher", choices=["none"] + sorted(PREFETCHERS), default="none")
+    ap.add_argument("--l2-prefetcher", choices=["none"] + sorted(PREFETCHERS), default="none")
+    ap.add_argument("--pf-degree", type=int, default=0,
+                    help="prefetch degree (0: gem5 default of each prefetcher; ignored by bop)")
+    ap.add_argument("--l1i-prefetcher", choices=["none"] + ICACHE_PREFETCHERS, default="none")
+
+    # Replacement policy of L1I/L1D and of L2
+    ap.add_argument("--l1-replacement", choices=sorted(REPLACEMENT), default="lru")
+    ap.add_argument("--l2-replacement", choices=sorted(REPLACEMENT), default="lru")
+
+    # Compressed L1D / L2 (uncompressed by default)
+    ap.add_argument("--l1d-compressor", choices=["none"] + sorted(COMPRESSORS), default="none")
+    ap.add_argument("--l2-compressor", choices=["none"] + sorted(COMPRESSORS), default="none")
+    ap.add_argument("--max-compression-ratio", type=int, default=2,
+                    help="compressed lines per tag entry of a compressed cache")
+
+    # Sector tags on L1D / L2 (0: one tag per line)
+    ap.add_argument("--l1d-sector-blocks", type=int, default=0,
+                    help="lines per sector, a power of 2 (sector size = lines x line size)")
+    ap.add_argument("--l2-sector-blocks", type=int, default=0,
+                    help="lines per sector, a power of 2 (sector size = lines x line size)")
+
+    # Write policy and L2 clusivity (gem5 defaults: write-allocate, mostly inclusive)
+    ap.add_argument("--l1d-write-policy", choices=["allocate", "no-allocate"], default="allocate")
+    ap.add_argument("--l1d-write-buffers", type=int, default=0,
+                    help="L1D write buffer entries (0: gem5 default of 8)")
+    ap.add_argument("--l2-clusivity", choices=sorted(CLUSIVITY), default="incl")
+
+    # L2 size and associativity ("none": no L2, the L1s sit on the memory bus);
+    # the hit latency follows the size (L2_LATENCY) unless given
+    ap.add_argument("--l2-size", default="512kB")
+    ap.add_argument("--l2-assoc", type=int, default=8)
+    ap.add_argument("--l2-latency", type=int, default=0,
+                    help="L2 tag/data/response latency in cycles (0: from the L2 size)")
+    ap.add_argument("--l2-latency-table", help='file of "<size> <cycles>" lines replacing L2_LATENCY')
+
+    # Cache line size of every level; the fetch buffer follows it
+    ap.add_argument("--line-size", type=int, choices=[16, 32, 64, 128], default=32)
+
+    # Front-end sizing (0: keep the Cortex-A7 values below)
+    ap.add_argument("--fetch-buffer-size", type=int, default=0,
+                    help="fetch buffer in bytes, at most the cache line")
+    ap.add_argument("--fetch-queue-size", type=int, default=0, help="fetch queue entries")
+
+    # Multi-core: --cmd on core 0, copies of it or the --mix benchmarks (in
+    # turn) on the others; private L1s, private or shared L2, optional
+    # shared L3. One core keeps the single-core stat names (system.cpu).
+    ap.add_argument("--cores", type=int, default=0, help="number of cores (0: 1 + number of --mix benchmarks)")
+    ap.add_argument("--mix", default="", help="comma-separated benchmarks of cores 1.. (%s)" % ", ".join(BENCHMARKS))
+    ap.add_argument("--mix-dataset", choices=["small", "large"], default="small",
+                    help="data set of the --mix benchmarks and of the copies of --cmd")
+    ap.add_argument("--l2-sharing", choices=["private", "shared"], default="private")
+    ap.add_argument("--l3-size", default="none", help='shared L3 size ("none": no L3)')
+    ap.add_argument("--l3-assoc", type=int, default=16)
+    ap.add_argument("--l3-latency", type=int, default=0,
+                    help="L3 tag/data/response latency in cycles (0: from the L3 size)")
+
+    # Stats output: stats.txt, gzip-compressed stats.txt.gz or gem5's HDF5 stats.h5
+    ap.add_argument("--stats-format", choices=["text", "gzip", "hdf5"], default="text")
+
+    args = ap.parse_args()
+    args.l1i_size = args.l1i_size or args.l1_size
+    args.l1d_size = args.l1d_size or args.l1_size
+    for level in ("l1d", "l2"):
+        if getattr(args, f"{level}_sector_blocks") and getattr(args, f"{level}_compressor") != "none":
+            ap.error(f"--{level}-sector-blocks and --{level}-compressor both replace the tags")
+    if args.fetch_buffer_size > args.line_size:
+        ap.error(f"--fetch-buffer-size {args.fetch_buffer_size} is larger than the {args.line_size}B line")
+    if args.l2_size == "none":
+        l2_opts = (args.l2_prefetcher, args.l2_replacement, args.l2_compressor,
+                   args.l2_sector_blocks, args.l2_clusivity)
+        if l2_opts != ("none", "lru", "none", 0, "incl"):
+            ap.error("--l2-size none leaves no L2 for the other --l2-* options")
+    table = read_latency_table(args.l2_latency_table) if args.l2_latency_table else L2_LATENCY
+    if args.l2_size != "none" and not args.l2_latency:
+        args.l2_latency = l2_latency(args.l2_size, table)
+        if args.l2_latency is None:
+            ap.error(f"--l2-size {args.l2_size} is past the L2 latency table, give --l2-latency")
+    if args.l3_size != "none" and not args.l3_latency:
+        args.l3_latency = l2_latency(args.l3_size, table)
+        if args.l3_latency is None:
+            ap.error(f"--l3-size {args.l3_size} is past the latency table, give --l3-latency")
+    args.mix = [m for m in args.mix.split(",") if m]
+    unknown = [m for m in args.mix if m not in BENCHMARKS]
+    if unknown:
+        ap.error(f"--mix: unknown benchmark(s) {', '.join(unknown)}")
+    args.cores = args.cores or 1 + len(args.mix)
+    if args.cores < 1:
+        ap.error("--cores must be at least 1")
+    return args
+
+
+# One Cortex-A7 core with its private L1I/L1D
+def make_cpu(args):
+    cpu = DerivO3CPU()
 
     # IMPORTANT: O3 default fetch buffer = 64B in some gem5 versions.
     # With cache line size 32B, it can trigger: "fetch buffer 64 > block 32".
-    system.cpu.fetchBufferSize = 32
+    # The fetch buffer holds one cache line, whatever --line-size is.
+    cpu.fetchBufferSize = args.line_size
 
     # Fetch queue
-    system.cpu.fetchQueueSize = 8
+    cpu.fetchQueueSize = 8
+
+    if args.fetch_buffer_size:
+        cpu.fetchBufferSize = args.fetch_buffer_size
+    if args.fetch_queue_size:
+        cpu.fetchQueueSize = args.fetch_queue_size
 
     # Decode / Issue / Commit : 2 / 4 / 2
-    system.cpu.decodeWidth = 2
-    system.cpu.issueWidth = 4
-    system.cpu.commitWidth = 2
+    cpu.decodeWidth = 2
+    cpu.issueWidth = 4
+    cpu.commitWidth = 2
 
     # Other pipeline widths for coherence
-    system.cpu.fetchWidth = 2
-    system.cpu.renameWidth = 4
-    system.cpu.dispatchWidth = 4
-    system.cpu.wbWidth = 2
+    cpu.fetchWidth = 2
+    cpu.renameWidth = 4
+    cpu.dispatchWidth = 4
+    cpu.wbWidth = 2
 
     # RUU/LSQ : 2 / 8  (interpretation gem5: ROB=2, LQ=8, SQ=8)
-    system.cpu.numROBEntries = 2
-    system.cpu.LQEntries = 8
-    system.cpu.SQEntries = 8
+    cpu.numROBEntries = 2
+    cpu.LQEntries = 8
+    cpu.SQEntries = 8
 
     # Branch predictor: bimodal, BTB=256
-    system.cpu.branchPred = BiModeBP()
-    system.cpu.branchPred.BTBEntries = 256
+    cpu.branchPred = BiModeBP()
+    cpu.branchPred.BTBEntries = 256
 
     # -------- Caches C-A7 --------
-    # L1I: size variable (default 32kB), 2-way, block=32B (system.cache_line_size)
-    system.cpu.icache = L1ICache()
-    system.cpu.icache.size = args.l1_size
-    system.cpu.icache.assoc = 2
-
-    # L1D: size variable (default 32kB), 2-way
-    system.cpu.dcache = L1DCache()
-    system.cpu.dcache.size = args.l1_size
-    system.cpu.dcache.assoc = 2
-
-    # L2: FIXED 512kB, 8-way
-    system.l2bus = L2XBar()
-    system.l2cache = L2Cache()
-    system.l2cache.size = "512kB"
-    system.l2cache.assoc = 8
-
-    # Connect caches
-    system.cpu.icache.connectCPU(system.cpu)
-    system.cpu.dcache.connectCPU(system.cpu)
-    system.cpu.icache.connectBus(system.l2bus)
-    system.cpu.dcache.connectBus(system.l2bus)
-    system.l2cache.connectCPUSideBus(system.l2bus)
-
-    # Main memory bus
+    # L1I: size variable (--l1-size/--l1i-size, default 32kB), 2-way,
+    # block=32B (system.cache_line_size, --line-size)
+    cpu.icache = L1ICache()
+    cpu.icache.size = args.l1i_size
+    cpu.icache.assoc = fit_assoc(args.l1i_size, args.line_size, 2)
+    cpu.icache.replacement_policy = REPLACEMENT[args.l1_replacement]()
+    if args.l1i_prefetcher != "none":
+        setup_icache_prefetch(cpu.icache, args.l1i_prefetcher, args.pf_degree)
+
+    # L1D: size variable (--l1-size/--l1d-size, default 32kB), 2-way
+    cpu.dcache = L1DCache()
+    cpu.dcache.size = args.l1d_size
+    cpu.dcache.assoc = fit_assoc(args.l1d_size, args.line_size, 2)
+    cpu.dcache.replacement_policy = REPLACEMENT[args.l1_replacement]()
+    if args.l1d_prefetcher != "none":
+        cpu.dcache.prefetcher = make_prefetcher(args.l1d_prefetcher, args.pf_degree)
+    if args.l1d_compressor != "none":
+        setup_compression(cpu.dcache, args.l1d_compressor, args.max_compression_ratio)
+    if args.l1d_sector_blocks:
+        setup_sectors(cpu.dcache, args.l1d_sector_blocks)
+    if args.l1d_write_policy == "no-allocate":
+        setup_write_no_allocate(cpu.dcache)
+    if args.l1d_write_buffers:
+        cpu.dcache.write_buffers = args.l1d_write_buffers
+    return cpu
+
+
+def make_l2(args):
+    l2 = L2Cache()
+    l2.size = args.l2_size
+    l2.assoc = fit_assoc(args.l2_size, args.line_size, args.l2_assoc)
+    l2.tag_latency = args.l2_latency
+    l2.data_latency = args.l2_latency
+    l2.response_latency = args.l2_latency
+    l2.replacement_policy = REPLACEMENT[args.l2_replacement]()
+    if args.l2_prefetcher != "none":
+        l2.prefetcher = make_prefetcher(args.l2_prefetcher, args.pf_degree)
+    if args.l2_compressor != "none":
+        setup_compression(l2, args.l2_compressor, args.max_compression_ratio)
+    if args.l2_sector_blocks:
+        setup_sectors(l2, args.l2_sector_blocks)
+    l2.clusivity = CLUSIVITY[args.l2_clusivity]
+    return l2
+
+
+def build_system(args):
+    system = System()
+    system.clk_domain = SrcClockDomain(
+        clock=args.clock, voltage_domain=VoltageDomain()
+    )
+    system.mem_mode = "timing"
+    system.mem_ranges = [AddrRange(args.mem_size)]
+
+    # Cortex A7: cache line size 32B (--line-size)
+    system.cache_line_size = args.line_size
+
+    cpus = [make_cpu(args) for _ in range(args.cores)]
+    if len(cpus) == 1:
+        system.cpu = cpus[0]
+    else:
+        for i, cpu in enumerate(cpus):
+            cpu.cpu_id = i
+        system.cpu = cpus
+
+    # Main memory bus; with --l3-size a shared L3 sits in front of it
     system.membus = SystemXBar()
-    system.l2cache.connectMemSideBus(system.membus)
+    below = system.membus
+    if args.l3_size != "none":
+        system.l3bus = L2XBar()
+        system.l3cache = L3Cache()
+        system.l3cache.size = args.l3_size
+        system.l3cache.assoc = fit_assoc(args.l3_size, args.line_size, args.l3_assoc)
+        system.l3cache.tag_latency = args.l3_latency
+        system.l3cache.data_latency = args.l3_latency
+        system.l3cache.response_latency = args.l3_latency
+        system.l3cache.connectCPUSideBus(system.l3bus)
+        system.l3cache.connectMemSideBus(system.membus)
+        below = system.l3bus
+
+    # Connect caches. L2: 512kB, 8-way by default (--l2-size, --l2-assoc),
+    # one per core or shared (--l2-sharing); without L2, the L1s go straight
+    # to the L3 or the memory bus.
+    for cpu in cpus:
+        cpu.icache.connectCPU(cpu)
+        cpu.dcache.connectCPU(cpu)
+    if args.l2_size == "none":
+        for cpu in cpus:
+            if args.l3_size == "none":
+                # Nothing below the L1s keeps clean victims: drop them instead
+                cpu.icache.writeback_clean = False
+                cpu.dcache.writeback_clean = False
+            cpu.icache.connectBus(below)
+            cpu.dcache.connectBus(below)
+    elif len(cpus) == 1 or args.l2_sharing == "shared":
+        system.l2bus = L2XBar()
+        system.l2cache = make_l2(args)
+        for cpu in cpus:
+            cpu.icache.connectBus(system.l2bus)
+            cpu.dcache.connectBus(system.l2bus)
+        system.l2cache.connectCPUSideBus(system.l2bus)
+        system.l2cache.connectMemSideBus(below)
+    else:
+        buses = [L2XBar() for _ in cpus]
+        l2s = [make_l2(args) for _ in cpus]
+        system.l2bus = buses
+        system.l2cache = l2s
+        for cpu, bus, l2 in zip(cpus, buses, l2s):
+            cpu.icache.connectBus(bus)
+            cpu.dcache.connectBus(bus)
+            l2.connectCPUSideBus(bus)
+            l2.connectMemSideBus(below)
     system.system_port = system.membus.cpu_side_ports
 
     # DRAM
@@ -140,22 +485,45 @@ def build_system(args):
     system.mem_ctrl.dram.range = system.mem_ranges[0]
     system.mem_ctrl.port = system.membus.mem_side_ports
 
-    # Workload
-    process = Process()
-    process.cmd = [args.cmd] + args.options
+    # Workloads: --cmd on core 0, then copies of it or the --mix benchmarks
+    cmds = [[args.cmd] + args.options]
+    for i in range(1, len(cpus)):
+        if args.mix:
+            cmds.append(benchmark_cmd(args.mix[(i - 1) % len(args.mix)], args.mix_dataset))
+        else:
+            cmds.append(copy_cmd(args))
     system.workload = SEWorkload.init_compatible(args.cmd)
-    system.cpu.workload = process
-    system.cpu.createThreads()
-    system.cpu.createInterruptController()
+    for i, (cpu, cmd) in enumerate(zip(cpus, cmds)):
+        process = Process(pid=100 + i)
+        process.cmd = cmd
+        cpu.workload = process
+        cpu.createThreads()
+        cpu.createInterruptController()
 
     return system
 
 
+def setup_stats(fmt):
+    # gem5 has opened its text output (--stats-file, stats.txt) before running
+    # this script; swap it for a text visitor on stats.txt.gz (gem5 gzips
+    # output files named *.gz as it writes them) or for the h5 visitor (needs
+    # gem5 built with HDF5)
+    if fmt == "text":
+        return
+    del m5.stats.outputList[:]
+    m5.stats.addStatVisitor("stats.txt.gz" if fmt == "gzip" else "h5://stats.h5")
+    # Drop the stats.txt left empty now, so readers never take it for the stats
+    txt = os.path.join(m5.options.outdir, "stats.txt")
+    if os.path.isfile(txt) and os.path.getsize(txt) == 0:
+        os.remove(txt)
+
+
 def main():
     args = parse_args()
     system = build_system(args)
     root = Root(full_system=False, system=system)
     m5.instantiate()
+    setup_stats(args.stats_format)
 
     if args.maxinsts > 0:
         ev = m5.simulate(args.maxinsts)
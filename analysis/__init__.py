@@ -0,0 +1 @@
+"""Post-processing of the gem5 runs (runs_L1_*/<programme>_<jeu>_L1_<taille>/stats.txt)."""
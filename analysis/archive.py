@@ -0,0 +1,398 @@
+"""Single-file, deduplicated archive of a runs_L1_* tree with random access.
+
+    python -m analysis.archive pack dijkstra/runs_L1_A7        # -> dijkstra/runs_L1_A7.pack
+    python -m analysis.archive list dijkstra/runs_L1_A7.pack
+    python -m analysis.archive cat dijkstra/runs_L1_A7.pack dijkstra_small_L1_4kB/stats.txt
+    python -m analysis.archive extract dijkstra/runs_L1_A7.pack --to /tmp/runs_L1_A7
+    python -m analysis.archive verify dijkstra/runs_L1_A7.pack
+
+The run folders of a sweep (config.ini/json/dot/svg/pdf, stats.txt) are
+nearly identical from one run to the next. Every file is cut into chunks at
+line boundaries chosen from the line's key (the stat or option name, never
+its value), so the same stretch of two configs or two stats files gives
+chunks that line up. Identical chunks are stored once; the others are
+deflated with the chunk at the same key of the first run as preset
+dictionary, so only what differs costs space. Reading a file decompresses
+its own chunks (and their reference chunks) only.
+
+Layout: MAGIC, the compressed chunks, a zlib-compressed JSON index (chunk
+offsets, file list with size, mtime, mode and SHA-256), then TRAILER giving
+the offset and size of the index.
+
+The parsers read packed runs in place: a path below the archive, as in
+dijkstra/runs_L1_A7.pack/dijkstra_small_L1_4kB/stats.txt, is served from it
+(stats.open_run_file, stats.has_file), and stats.find_runs lists the runs of
+*/runs_L1_*.pack next to the unpacked folders.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import struct
+import sys
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+SUFFIX = ".pack"
+MAGIC = b"G5RUNPK1"
+TRAILER = struct.Struct("<QQ8s")  # index offset, index size, MAGIC
+VERSION = 1
+
+# Chunking: cut after at least CHUNK_MIN bytes at a line whose key hashes to
+# 0 under CHUNK_MASK (about one line in 64), and always by CHUNK_MAX. zlib
+# uses at most 32 KiB of preset dictionary, so a reference chunk fits whole.
+CHUNK_MIN = 1024
+CHUNK_MAX = 30000
+CHUNK_MASK = 0x3f
+ZDICT_MAX = 32768
+LEVEL = 9
+
+KEY_RE = re.compile(rb"[^\s=:]*")
+
+
+def chunks(data: bytes) -> Iterator[bytes]:
+    """Split data into content-defined chunks, cut after lines picked by their key."""
+    start = pos = 0
+    n = len(data)
+    while pos < n:
+        nl = data.find(b"\n", pos, start + CHUNK_MAX)
+        if nl < 0:
+            # No line end before the size cap (binary data): cut at the cap.
+            pos = min(start + CHUNK_MAX, n)
+            yield data[start:pos]
+            start = pos
+            continue
+        key = KEY_RE.match(data, pos).group(0)
+        pos = nl + 1
+        if pos - start >= CHUNK_MIN and key and not zlib.crc32(key) & CHUNK_MASK:
+            yield data[start:pos]
+            start = pos
+    if start < n:
+        yield data[start:]
+
+
+def _anchor(name: str, chunk: bytes) -> tuple[str, bytes]:
+    """Chunks of the same file name starting at the same key share a reference."""
+    return Path(name).name, KEY_RE.match(chunk).group(0)[:200]
+
+
+@dataclass(frozen=True)
+class Member:
+    name: str
+    size: int
+    mtime_ns: int
+    mode: int
+    sha256: str
+    chunks: tuple[int, ...]
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+def pack(tree: Path, out: Path | None = None) -> Path:
+    """Write every file below ``tree`` into one archive (default: <tree>.pack next to it)."""
+    tree = Path(tree)
+    if not tree.is_dir():
+        raise ArchiveError(f"{tree} is not a directory")
+    out = Path(out) if out else tree.with_name(tree.name + SUFFIX)
+    tmp = out.with_name(out.name + ".tmp")
+
+    table: list[list[int]] = []          # [offset, compressed size, size, reference chunk or -1]
+    by_digest: dict[bytes, int] = {}
+    refs: dict[tuple[str, bytes], int] = {}
+    raw: dict[int, bytes] = {}           # reference chunks, for the chunks compressed against them
+    files = []
+    with tmp.open("wb") as f:
+        f.write(MAGIC)
+        for path in sorted(p for p in tree.rglob("*") if p.is_file()):
+            name = path.relative_to(tree).as_posix()
+            data = path.read_bytes()
+            st = path.stat()
+            ids = []
+            for chunk in chunks(data):
+                digest = hashlib.sha256(chunk).digest()
+                cid = by_digest.get(digest)
+                if cid is None:
+                    anchor = _anchor(name, chunk)
+                    ref = refs.get(anchor, -1)
+                    if ref < 0:
+                        comp = zlib.compressobj(LEVEL)
+                    else:
+                        comp = zlib.compressobj(LEVEL, zdict=raw[ref][-ZDICT_MAX:])
+                    blob = comp.compress(chunk) + comp.flush()
+                    cid = len(table)
+                    table.append([f.tell(), len(blob), len(chunk), ref])
+                    f.write(blob)
+                    by_digest[digest] = cid
+                    if ref < 0:
+                        refs[anchor] = cid
+                        raw[cid] = chunk
+                ids.append(cid)
+            files.append({"name": name, "size": len(data), "mtime_ns": st.st_mtime_ns,
+                          "mode": st.st_mode & 0o7777, "sha256": hashlib.sha256(data).hexdigest(),
+                          "chunks": ids})
+        index = zlib.compress(json.dumps({"version": VERSION, "chunks": table, "files": files},
+                                         separators=(",", ":")).encode(), LEVEL)
+        offset = f.tell()
+        f.write(index)
+        f.write(TRAILER.pack(offset, len(index), MAGIC))
+    os.replace(tmp, out)
+    return out
+
+
+class RunArchive:
+    """Read access to the files of a packed runs_L1_* tree."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self._f: BinaryIO = self.path.open("rb")
+        try:
+            self._load_index()
+        except Exception:
+            self._f.close()
+            raise
+        self._refs: dict[int, bytes] = {}
+
+    def _load_index(self) -> None:
+        f = self._f
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ArchiveError(f"{self.path} is not a run archive")
+        f.seek(-TRAILER.size, os.SEEK_END)
+        offset, size, magic = TRAILER.unpack(f.read(TRAILER.size))
+        if magic != MAGIC:
+            raise ArchiveError(f"{self.path} is truncated (no index)")
+        f.seek(offset)
+        index = json.loads(zlib.decompress(f.read(size)))
+        if index.get("version") != VERSION:
+            raise ArchiveError(f"{self.path}: unsupported archive version {index.get('version')}")
+        self._chunks: list[list[int]] = index["chunks"]
+        self.members: dict[str, Member] = {
+            m["name"]: Member(m["name"], m["size"], m["mtime_ns"], m["mode"], m["sha256"], tuple(m["chunks"]))
+            for m in index["files"]}
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "RunArchive":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.members
+
+    def names(self) -> list[str]:
+        return list(self.members)
+
+    def run_dirs(self) -> list[str]:
+        """Top-level folders of the packed tree (the run folders)."""
+        return sorted({name.split("/", 1)[0] for name in self.members if "/" in name})
+
+    def _chunk(self, cid: int) -> bytes:
+        if cid in self._refs:
+            return self._refs[cid]
+        offset, size, _, ref = self._chunks[cid]
+        self._f.seek(offset)
+        blob = self._f.read(size)
+        if ref < 0:
+            data = zlib.decompress(blob)
+            # Reference chunks are shared by many others: keep them.
+            self._refs[cid] = data
+            return data
+        dec = zlib.decompressobj(zdict=self._chunk(ref)[-ZDICT_MAX:])
+        return dec.decompress(blob) + dec.flush()
+
+    def read(self, name: str) -> bytes:
+        try:
+            member = self.members[name]
+        except KeyError:
+            raise FileNotFoundError(f"{name} not in {self.path}") from None
+        return b"".join(self._chunk(cid) for cid in member.chunks)
+
+    def open(self, name: str) -> io.BytesIO:
+        return io.BytesIO(self.read(name))
+
+    def verify(self) -> list[str]:
+        """Names of the members whose content does not match the recorded SHA-256."""
+        return [m.name for m in self.members.values()
+                if hashlib.sha256(self.read(m.name)).hexdigest() != m.sha256]
+
+    def extract(self, dest: Path, names: list[str] | None = None) -> int:
+        dest = Path(dest)
+        n = 0
+        for name in names or self.names():
+            member = self.members.get(name)
+            if member is None:
+                raise FileNotFoundError(f"{name} not in {self.path}")
+            target = dest / name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(self.read(name))
+            os.chmod(target, member.mode)
+            os.utime(target, ns=(member.mtime_ns, member.mtime_ns))
+            n += 1
+        return n
+
+
+# -- paths below an archive ----------------------------------------------
+
+_open: dict[Path, tuple[tuple[int, int], RunArchive]] = {}
+
+
+def _archive(path: Path) -> RunArchive:
+    """Opened archive, reopened when the file was rewritten."""
+    st = path.stat()
+    stamp = (st.st_size, st.st_mtime_ns)
+    cached = _open.get(path)
+    if cached is not None:
+        if cached[0] == stamp:
+            return cached[1]
+        cached[1].close()
+    archive = RunArchive(path)
+    _open[path] = (stamp, archive)
+    return archive
+
+
+def locate(path: Path) -> tuple[RunArchive, str] | None:
+    """(archive, member name) for a path going through a .pack file, None otherwise."""
+    path = Path(path)
+    if SUFFIX not in str(path):
+        return None
+    for parent in path.parents:
+        if parent.suffix == SUFFIX and parent.is_file():
+            return _archive(parent), path.relative_to(parent).as_posix()
+    return None
+
+
+def member(path: Path) -> Member | None:
+    found = locate(path)
+    if found is None:
+        return None
+    archive, name = found
+    return archive.members.get(name)
+
+
+def read_bytes(path: Path) -> bytes:
+    found = locate(path)
+    if found is None:
+        raise FileNotFoundError(path)
+    archive, name = found
+    return archive.read(name)
+
+
+def run_dirs(pack_path: Path) -> list[Path]:
+    """Run folders of an archive, as paths below it."""
+    return [Path(pack_path) / name for name in _archive(Path(pack_path)).run_dirs()]
+
+
+# -- command line ----------------------------------------------------------
+
+def _size(n: float) -> str:
+    for unit in ("B", "kB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f} {unit}" if unit == "B" else f"{n:.1f} {unit}"
+        n /= 1024
+    return ""
+
+
+def cmd_pack(args: argparse.Namespace) -> int:
+    tree = Path(args.tree)
+    out = pack(tree, Path(args.out) if args.out else None)
+    with RunArchive(out) as archive:
+        bad = archive.verify()
+        total = sum(m.size for m in archive.members.values())
+        n = len(archive.members)
+    if bad:
+        raise SystemExit(f"{out}: {len(bad)} file(s) do not read back correctly, keeping {tree}")
+    print(f"Archive written: {out} ({n} files, {_size(total)} -> {_size(out.stat().st_size)})")
+    if args.remove:
+        shutil.rmtree(tree)
+        print("Removed", tree)
+    return 0
+
+
+def cmd_list(args: argparse.Namespace) -> int:
+    with RunArchive(Path(args.archive)) as archive:
+        for m in archive.members.values():
+            print(f"{m.size:>10}  {m.name}")
+    return 0
+
+
+def cmd_cat(args: argparse.Namespace) -> int:
+    with RunArchive(Path(args.archive)) as archive:
+        try:
+            data = archive.read(args.member)
+        except FileNotFoundError as e:
+            raise SystemExit(str(e))
+    sys.stdout.buffer.write(data)
+    return 0
+
+
+def cmd_extract(args: argparse.Namespace) -> int:
+    path = Path(args.archive)
+    dest = Path(args.to) if args.to else path.with_suffix("")
+    with RunArchive(path) as archive:
+        try:
+            n = archive.extract(dest, args.members or None)
+        except FileNotFoundError as e:
+            raise SystemExit(str(e))
+    print(f"{n} file(s) extracted to {dest}")
+    return 0
+
+
+def cmd_verify(args: argparse.Namespace) -> int:
+    with RunArchive(Path(args.archive)) as archive:
+        bad = archive.verify()
+        n = len(archive.members)
+    for name in bad:
+        print("Corrupt:", name)
+    print(f"{n - len(bad)}/{n} files OK")
+    return 1 if bad else 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Pack runs_L1_* trees into single deduplicated archives")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("pack", help="Pack a runs_L1_* folder")
+    p.add_argument("tree", help="Folder to pack, e.g. dijkstra/runs_L1_A7")
+    p.add_argument("--out", help=f"Archive file (default: <tree>{SUFFIX})")
+    p.add_argument("--remove", action="store_true", help="Delete the folder once the archive checks out")
+    p.set_defaults(func=cmd_pack)
+
+    p = sub.add_parser("list", help="List the packed files")
+    p.add_argument("archive")
+    p.set_defaults(func=cmd_list)
+
+    p = sub.add_parser("cat", help="Write one packed file to stdout")
+    p.add_argument("archive")
+    p.add_argument("member", help="Path inside the archive, e.g. dijkstra_small_L1_4kB/stats.txt")
+    p.set_defaults(func=cmd_cat)
+
+    p = sub.add_parser("extract", help="Unpack all or some files")
+    p.add_argument("archive")
+    p.add_argument("members", nargs="*", help="Paths inside the archive (default: all)")
+    p.add_argument("--to", help="Destination folder (default: the archive path without .pack)")
+    p.set_defaults(func=cmd_extract)
+
+    p = sub.add_parser("verify", help="Check every file against its SHA-256")
+    p.add_argument("archive")
+    p.set_defaults(func=cmd_verify)
+
+    args = ap.parse_args()
+    try:
+        return args.func(args)
+    except ArchiveError as e:
+        raise SystemExit(str(e))
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
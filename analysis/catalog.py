@@ -0,0 +1,426 @@
+"""SQLite catalog of the L1 sweep runs: configuration parameters and all stats.
+
+    python -m analysis.catalog update
+    python -m analysis.catalog params
+    python -m analysis.catalog query --param l1d_size --stat system.cpu.cpi --where core=A15 --out cpi.csv
+
+``runs`` holds one row per run folder: its identity (programme, core,
+jeu_donnees, L1_taille, variante, as in the CSVs) and the parameters read
+from config.json (PARAMS: cache sizes, associativities and latencies,
+prefetchers, replacement policies, compressors, tag organisation, write
+policy and L2 clusivity, CPU widths and queue sizes, branch predictor,
+number of cores and of L2s; per-core values are those of core 0).
+``stats`` holds every value of the first stats dump as (run_id, key, value).
+``update`` is incremental: a run is only re-read when the size or mtime of
+its stats file or config.json changed, and folders that disappeared are
+dropped.
+
+From Python, Catalog.query() returns columns as lists (NumPy arrays with
+arrays=True), and Catalog.runs() / Catalog.read_stats() stand in for
+stats.find_runs() / stats.read_stats(), which is what the --catalog option of
+the metrics, CPI-stack and interval scripts uses.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import re
+import sqlite3
+import sys
+from pathlib import Path
+from typing import Any, Iterable, Sequence
+
+from cachemodel.common import parse_size
+
+from . import archive
+from .stats import REPO_ROOT, RunInfo, find_runs, open_run_file, read_stats, sort_runs
+
+DEFAULT_DB = REPO_ROOT / "runs_catalog.sqlite"
+SCHEMA_VERSION = 8
+
+IDENTITY = ("programme", "core", "jeu_donnees", "L1_taille", "variante")
+
+# (column, path below config.json["system"], SQL type)
+PARAMS: list[tuple[str, str, str]] = [
+    ("cpu_type", "cpu.type", "TEXT"),
+    ("clock_ticks", "clk_domain.clock", "INTEGER"),
+    ("cache_line_size", "cache_line_size", "INTEGER"),
+    ("fetch_width", "cpu.fetchWidth", "INTEGER"),
+    ("fetch_buffer_size", "cpu.fetchBufferSize", "INTEGER"),
+    ("fetch_queue_size", "cpu.fetchQueueSize", "INTEGER"),
+    ("decode_width", "cpu.decodeWidth", "INTEGER"),
+    ("rename_width", "cpu.renameWidth", "INTEGER"),
+    ("issue_width", "cpu.issueWidth", "INTEGER"),
+    ("commit_width", "cpu.commitWidth", "INTEGER"),
+    ("rob_entries", "cpu.numROBEntries", "INTEGER"),
+    ("iq_entries", "cpu.numIQEntries", "INTEGER"),
+    ("lq_entries", "cpu.LQEntries", "INTEGER"),
+    ("sq_entries", "cpu.SQEntries", "INTEGER"),
+    ("bp_type", "cpu.branchPred.type", "TEXT"),
+    ("btb_entries", "cpu.branchPred.BTBEntries", "INTEGER"),
+    ("ras_size", "cpu.branchPred.RASSize", "INTEGER"),
+]
+CACHE_FIELDS = ("size", "assoc", "tag_latency", "data_latency", "response_latency", "mshrs")
+CACHE_LEVELS = (("l1i", "cpu.icache"), ("l1d", "cpu.dcache"), ("l2", "l2cache"), ("l3", "l3cache"))
+PARAMS += [(f"{level}_{field}", f"{path}.{field}", "INTEGER")
+           for level, path in CACHE_LEVELS
+           for field in CACHE_FIELDS]
+PARAMS += [(f"{level}_replacement", f"{path}.replacement_policy.type", "TEXT") for level, path in CACHE_LEVELS]
+PARAMS += [("l1i_prefetcher", "cpu.icache.prefetcher.type", "TEXT"),
+           ("l1d_prefetcher", "cpu.dcache.prefetcher.type", "TEXT"),
+           ("l2_prefetcher", "l2cache.prefetcher.type", "TEXT")]
+PARAMS += [("l1d_compressor", "cpu.dcache.compressor.type", "TEXT"),
+           ("l1d_compression_ratio_max", "cpu.dcache.tags.max_compression_ratio", "INTEGER"),
+           ("l2_compressor", "l2cache.compressor.type", "TEXT"),
+           ("l2_compression_ratio_max", "l2cache.tags.max_compression_ratio", "INTEGER")]
+PARAMS += [("l1d_tags", "cpu.dcache.tags.type", "TEXT"),
+           ("l1d_sector_blocks", "cpu.dcache.tags.num_blocks_per_sector", "INTEGER"),
+           ("l2_tags", "l2cache.tags.type", "TEXT"),
+           ("l2_sector_blocks", "l2cache.tags.num_blocks_per_sector", "INTEGER")]
+PARAMS += [("l1d_write_allocator", "cpu.dcache.write_allocator.type", "TEXT"),
+           ("l1d_write_buffers", "cpu.dcache.write_buffers", "INTEGER"),
+           ("l2_clusivity", "l2cache.clusivity", "TEXT")]
+# Number of instances of a SimObject that is a list on multi-core systems
+# (0 when absent): one per core, or one per core for private L2s.
+COUNTS = (("num_cores", "cpu"), ("num_l2", "l2cache"))
+PARAMS += [(name, path, "INTEGER") for name, path in COUNTS]
+PARAM_NAMES = [p[0] for p in PARAMS]
+
+INDEXES = {
+    "runs_workload": ("runs", "programme, core, jeu_donnees"),
+    "runs_l1i": ("runs", "l1i_size, l1i_assoc"),
+    "runs_l1d": ("runs", "l1d_size, l1d_assoc"),
+    "runs_l2": ("runs", "l2_size, l2_assoc"),
+    "runs_cpu": ("runs", "cpu_type, rob_entries"),
+    "stats_key": ("stats", "key"),
+}
+
+WHERE_RE = re.compile(r"^\s*(?P<col>\w+)\s*(?P<op><=|>=|!=|=|<|>)\s*(?P<val>.*?)\s*$")
+
+
+def _lookup(config: dict, path: str) -> Any:
+    node: Any = config
+    for part in path.split("."):
+        if isinstance(node, list):
+            node = node[0] if node else None
+        if not isinstance(node, dict) or part not in node:
+            return None
+        node = node[part]
+    if isinstance(node, list):
+        node = node[0] if node else None
+    return node if isinstance(node, (int, float, str)) else None
+
+
+def config_params(config_path: Path) -> dict[str, Any]:
+    """PARAMS values of a config.json (None for the ones it does not have)."""
+    try:
+        with open_run_file(Path(config_path)) as f:
+            system = json.load(f).get("system", {})
+    except (OSError, ValueError):
+        system = {}
+    params = {name: _lookup(system, path) for name, path, _ in PARAMS}
+    for name, path in COUNTS:
+        node = system.get(path)
+        params[name] = len(node) if isinstance(node, list) else int(isinstance(node, dict))
+    return params
+
+
+def _stamp(path: Path) -> str | None:
+    try:
+        st = path.stat()
+    except OSError:
+        # A file of a packed run: the size and mtime it was packed with.
+        member = archive.member(path)
+        return f"{member.size}:{member.mtime_ns}" if member is not None else None
+    return f"{st.st_size}:{st.st_mtime_ns}"
+
+
+def parse_where(text: str) -> tuple[str, str, Any]:
+    """'l1d_size>=4096' -> ('l1d_size', '>=', 4096) on an identity or parameter column."""
+    m = WHERE_RE.match(text)
+    if not m:
+        raise ValueError(f"Cannot parse filter {text!r} (expected column<op>value)")
+    col, op, val = m.group("col"), m.group("op"), m.group("val")
+    if col not in IDENTITY and col not in PARAM_NAMES:
+        raise ValueError(f"Unknown column {col!r} in filter {text!r}")
+    value: Any = val
+    try:
+        value = int(val)
+    except ValueError:
+        try:
+            value = float(val)
+        except ValueError:
+            pass
+    return col, op, value
+
+
+class Catalog:
+    def __init__(self, db_path: Path = DEFAULT_DB, root: Path = REPO_ROOT) -> None:
+        self.db_path = Path(db_path)
+        self.root = Path(root).resolve()
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self._create()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "Catalog":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def _create(self) -> None:
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version not in (0, SCHEMA_VERSION):
+            # The catalog is a cache of the run folders: rebuild it when the schema changes.
+            self.conn.executescript("DROP TABLE IF EXISTS stats; DROP TABLE IF EXISTS runs;")
+        params = "".join(f",\n    {name} {sqltype}" for name, _, sqltype in PARAMS)
+        self.conn.executescript(f"""
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    programme TEXT,
+    core TEXT,
+    jeu_donnees TEXT,
+    L1_taille TEXT,
+    variante TEXT,
+    stats_stamp TEXT,
+    config_stamp TEXT{params}
+);
+CREATE TABLE IF NOT EXISTS stats (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (run_id, key)
+) WITHOUT ROWID;
+""")
+        for name, (table, cols) in INDEXES.items():
+            self.conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({cols})")
+        self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.conn.commit()
+
+    def _key(self, run_dir: Path) -> str:
+        """Run folder as stored in the catalog: relative to root when below it."""
+        run_dir = Path(run_dir).resolve()
+        try:
+            return run_dir.relative_to(self.root).as_posix()
+        except ValueError:
+            return run_dir.as_posix()
+
+    def _path(self, key: str) -> Path:
+        return self.root / key
+
+    def _run_id(self, run_dir: Path) -> int | None:
+        row = self.conn.execute("SELECT id FROM runs WHERE path = ?", (self._key(run_dir),)).fetchone()
+        return row[0] if row else None
+
+    def __contains__(self, run_dir: Path) -> bool:
+        return self._run_id(run_dir) is not None
+
+    # -- ingestion --------------------------------------------------------
+
+    def update(self, runs: Iterable[RunInfo] | None = None, prune: bool | None = None) -> tuple[int, int, int]:
+        """Ingest new or modified runs; return (ingested, unchanged, removed).
+
+        Without ``runs`` every run folder below root is scanned and, unless
+        prune=False, runs whose folder disappeared are removed.
+        """
+        if runs is None:
+            runs = find_runs(self.root)
+            prune = True if prune is None else prune
+        runs = list(runs)
+        known = {path: (sid, cid) for path, sid, cid in
+                 self.conn.execute("SELECT path, stats_stamp, config_stamp FROM runs")}
+        ingested = unchanged = removed = 0
+        with self.conn:
+            for run in runs:
+                key = self._key(run.path)
+                stamps = (_stamp(run.stats_path), _stamp(run.path / "config.json"))
+                if stamps[0] is None:
+                    continue
+                if known.get(key) == stamps:
+                    unchanged += 1
+                    continue
+                self._ingest(run, key, stamps)
+                ingested += 1
+            if prune:
+                seen = {self._key(r.path) for r in runs}
+                for key in set(known) - seen:
+                    self.conn.execute("DELETE FROM runs WHERE path = ?", (key,))
+                    removed += 1
+        return ingested, unchanged, removed
+
+    def _ingest(self, run: RunInfo, key: str, stamps: tuple[str | None, str | None]) -> None:
+        params = config_params(run.path / "config.json")
+        cols = ["path", *IDENTITY, "stats_stamp", "config_stamp", *PARAM_NAMES]
+        vals = [key, run.programme, run.core, run.jeu_donnees, run.l1_size, run.variant, *stamps,
+                *(params[n] for n in PARAM_NAMES)]
+        updates = ", ".join(f"{c} = excluded.{c}" for c in cols[1:])
+        self.conn.execute(
+            f"INSERT INTO runs ({', '.join(cols)}) VALUES ({', '.join('?' * len(cols))}) "
+            f"ON CONFLICT(path) DO UPDATE SET {updates}", vals)
+        run_id = self._run_id(run.path)
+        self.conn.execute("DELETE FROM stats WHERE run_id = ?", (run_id,))
+        self.conn.executemany("INSERT INTO stats (run_id, key, value) VALUES (?, ?, ?)",
+                              ((run_id, k, v) for k, v in read_stats(run.stats_path).items()))
+
+    # -- reading ----------------------------------------------------------
+
+    def _select_runs(self, where: Sequence[tuple[str, str, Any]] = ()) -> list[tuple]:
+        sql = f"SELECT id, path, {', '.join(IDENTITY)}, {', '.join(PARAM_NAMES)} FROM runs"
+        args: list[Any] = []
+        if where:
+            clauses = []
+            for col, op, val in where:
+                if col not in IDENTITY and col not in PARAM_NAMES:
+                    raise ValueError(f"Unknown column {col!r}")
+                clauses.append(f"{col} {op} ?")
+                args.append(val)
+            sql += " WHERE " + " AND ".join(clauses)
+        rows = self.conn.execute(sql, args).fetchall()
+        rows.sort(key=lambda r: (r[2], r[3], r[6] or "", r[4], parse_size(r[5] or "")))
+        return rows
+
+    def runs(self, cores: Iterable[str] | None = None,
+             where: Sequence[tuple[str, str, Any]] = ()) -> list[RunInfo]:
+        """Catalogued runs as RunInfo, in find_runs() order."""
+        wanted = set(cores) if cores is not None else None
+        out = [RunInfo(r[2], r[3], r[4], r[5], self._path(r[1]), r[6] or "") for r in self._select_runs(where)]
+        return sort_runs(r for r in out if wanted is None or r.core in wanted)
+
+    def read_stats(self, stats_path: Path, keys: Iterable[str] | None = None) -> dict[str, float]:
+        """Same contract as stats.read_stats(), served from the catalog."""
+        run_id = self._run_id(Path(stats_path).parent)
+        if run_id is None:
+            raise KeyError(f"{Path(stats_path).parent} is not in the catalog {self.db_path}")
+        if keys is None:
+            cur = self.conn.execute("SELECT key, value FROM stats WHERE run_id = ?", (run_id,))
+        else:
+            keys = list(keys)
+            cur = self.conn.execute(
+                f"SELECT key, value FROM stats WHERE run_id = ? AND key IN ({', '.join('?' * len(keys))})",
+                [run_id, *keys])
+        return {k: float("nan") if v is None else v for k, v in cur}
+
+    def stat_keys(self, pattern: str) -> list[str]:
+        """Stat names matching a '*' wildcard (or the name itself)."""
+        if "*" not in pattern:
+            return [pattern]
+        glob = pattern.replace("[", "[[]")
+        return [k for (k,) in self.conn.execute(
+            "SELECT DISTINCT key FROM stats WHERE key GLOB ? ORDER BY key", (glob,))]
+
+    def query(self, stats: Sequence[str] = (), params: Sequence[str] = (),
+              where: Sequence[tuple[str, str, Any]] = (), arrays: bool = False) -> dict[str, Any]:
+        """Columns (identity, then params, then stats) of the runs matching ``where``.
+
+        Stat names may contain '*' wildcards, which expand to one column per
+        matching stat. Missing values are None (NaN in arrays mode).
+        """
+        for p in params:
+            if p not in PARAM_NAMES:
+                raise ValueError(f"Unknown parameter {p!r} (see 'params')")
+        keys = [k for s in stats for k in self.stat_keys(s)]
+        rows = self._select_runs(where)
+        ids = [r[0] for r in rows]
+        pos = {run_id: i for i, run_id in enumerate(ids)}
+
+        cols: dict[str, list[Any]] = {c: [r[2 + i] for r in rows] for i, c in enumerate(IDENTITY)}
+        offset = 2 + len(IDENTITY)
+        for p in params:
+            j = offset + PARAM_NAMES.index(p)
+            cols[p] = [r[j] for r in rows]
+        for k in keys:
+            cols[k] = [None] * len(rows)
+        if keys and ids:
+            cur = self.conn.execute(
+                f"SELECT run_id, key, value FROM stats WHERE key IN ({', '.join('?' * len(keys))})", keys)
+            for run_id, key, value in cur:
+                if run_id in pos:
+                    cols[key][pos[run_id]] = value
+        return to_arrays(cols) if arrays else cols
+
+
+def to_arrays(cols: dict[str, list[Any]]) -> dict[str, Any]:
+    """NumPy version of a query() result: float arrays for numeric columns, object arrays otherwise."""
+    try:
+        import numpy as np
+    except ImportError:
+        raise RuntimeError("NumPy is not installed; call query() without arrays=True") from None
+    out = {}
+    for name, values in cols.items():
+        if all(v is None or isinstance(v, (int, float)) for v in values):
+            out[name] = np.array([np.nan if v is None else v for v in values], dtype=float)
+        else:
+            out[name] = np.array(values, dtype=object)
+    return out
+
+
+def _cell(value: Any) -> str:
+    if value is None or value != value:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.6f}".rstrip("0").rstrip(".")
+    return str(value)
+
+
+def cmd_update(cat: Catalog, args: argparse.Namespace) -> int:
+    ingested, unchanged, removed = cat.update()
+    print(f"Catalog updated: {ingested} ingested, {unchanged} unchanged, {removed} removed -> {cat.db_path}")
+    return 0
+
+
+def cmd_params(cat: Catalog, args: argparse.Namespace) -> int:
+    for name in [*IDENTITY, *PARAM_NAMES]:
+        values = [v for (v,) in cat.conn.execute(f"SELECT DISTINCT {name} FROM runs ORDER BY {name}")]
+        print(f"{name}: {', '.join(_cell(v) for v in values)}")
+    return 0
+
+
+def cmd_query(cat: Catalog, args: argparse.Namespace) -> int:
+    try:
+        where = [parse_where(w) for w in args.where]
+        cols = cat.query(args.stat, args.param, where)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    names = list(cols)
+    n = len(cols[IDENTITY[0]])
+    f = open(args.out, "w", newline="", encoding="utf-8") if args.out else sys.stdout
+    try:
+        w = csv.writer(f)
+        w.writerow(names)
+        for i in range(n):
+            w.writerow([_cell(cols[c][i]) for c in names])
+    finally:
+        if args.out:
+            f.close()
+    if args.out:
+        print("CSV written:", args.out)
+    return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="SQLite catalog of the runs_L1_* configurations and stats")
+    ap.add_argument("--db", default=str(DEFAULT_DB), help="Catalog database file")
+    ap.add_argument("--root", default=str(REPO_ROOT), help="Repository root holding */runs_L1_*")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    sub.add_parser("update", help="Ingest new or modified runs, drop removed ones")
+    sub.add_parser("params", help="List the identity/parameter columns and their values")
+    q = sub.add_parser("query", help="Export parameters and stats of the matching runs as CSV")
+    q.add_argument("--param", action="append", default=[], help="Parameter column (repeatable)")
+    q.add_argument("--stat", action="append", default=[], help="Stat name, '*' wildcards allowed (repeatable)")
+    q.add_argument("--where", action="append", default=[],
+                   help="Filter such as core=A7 or l1d_size>=4096 (repeatable, AND-ed)")
+    q.add_argument("--out", help="CSV output filename (default: stdout)")
+    args = ap.parse_args()
+
+    with Catalog(Path(args.db), Path(args.root)) as cat:
+        return {"update": cmd_update, "params": cmd_params, "query": cmd_query}[args.cmd](cat, args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,127 @@
+"""Top-down cycle accounting (CPI stack) from the O3 pipeline stats.
+
+Every cycle of a run is assigned to exactly one category, so the components
+of each row add up to the measured CPI:
+
+* base:    cycles in which commit retired at least one instruction;
+* the remaining (stall) cycles are shared between the categories below;
+  when their estimates add up to more than is left, they are all scaled
+  down by the same factor, so no category is squeezed out by another:
+  - icache:  fetch stalled on the I-cache (fetchStats0.icacheStallCycles);
+  - branch:  bad speculation, the cycles squashing: the largest of the fetch,
+             decode, rename and IEW *.squashCycles (the stages squash in the
+             same cycles, so they are not added);
+  - dcache:  L1D misses served by the L2, miss latency divided by the MLP;
+  - l2:      L1D misses that also missed in the L2 (served by DRAM), same MLP;
+             without an L2 (--l2-size none) every L1D miss counts here;
+  - rob_lsq: rename blocked on a full ROB/IQ/LQ/SQ beyond the miss cycles;
+  - other:   everything left (dependencies, serialisation, drain, idle),
+             0 when the estimates were scaled down.
+
+The MLP is the one of the core implied by the interval fit on its base runs
+(analysis.interval.core_mlp), as in calc_*_mem_cpi.py; 1 for a core without
+base runs to fit.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+from pathlib import Path
+from typing import Callable
+
+from cachemodel.common import fmt
+
+from .catalog import Catalog
+from .interval import core_mlp
+from .multicore import MC_PREFIX
+from .stats import REPO_ROOT, RunInfo, find_runs, read_stats
+
+CATEGORIES = ("base", "icache", "dcache", "l2", "branch", "rob_lsq", "other")
+STALLS = ("icache", "branch", "dcache", "l2", "rob_lsq")
+
+INSTS = "simInsts"
+CYCLES = "system.cpu.numCycles"
+TICKS = "simTicks"
+COMMIT_SAMPLES = "system.cpu.commit.numCommittedDist::samples"
+COMMIT_ZERO = "system.cpu.commit.numCommittedDist::0"
+ICACHE_STALL = "system.cpu.fetchStats0.icacheStallCycles"
+SQUASH = tuple(f"system.cpu.{stage}.squashCycles" for stage in ("fetch", "decode", "rename", "iew"))
+D_MISS_LAT = "system.cpu.dcache.demandMissLatency::total"
+L2_MSHR_LAT = "system.l2cache.demandMshrMissLatency::cpu.data"
+RENAME_BLOCK = "system.cpu.rename.blockCycles"
+KEYS = [INSTS, CYCLES, TICKS, COMMIT_SAMPLES, COMMIT_ZERO, ICACHE_STALL, D_MISS_LAT, L2_MSHR_LAT,
+        RENAME_BLOCK, *SQUASH]
+
+
+def cycle_stack(run: RunInfo, read: Callable[..., dict[str, float]] = read_stats,
+                mlp: float = 1.0) -> tuple[float, dict[str, float]]:
+    """Return (instructions, cycles per category) for one run."""
+    s = read(run.stats_path, KEYS)
+    missing = [k for k in KEYS if k not in s and k != L2_MSHR_LAT]
+    if missing:
+        raise ValueError(f"Missing required keys in {run.stats_path}: {missing}")
+    cycles = s[CYCLES]
+    ticks_per_cycle = s[TICKS] / cycles
+
+    committing = s[COMMIT_SAMPLES] - s[COMMIT_ZERO]
+    d_miss = s[D_MISS_LAT] / ticks_per_cycle
+    # No L2 stats: the L1D misses go straight to DRAM
+    l2_mshr = s[L2_MSHR_LAT] / ticks_per_cycle if L2_MSHR_LAT in s else d_miss
+    # Cycles the L1D is blocked (no MSHR/target) pass while misses are outstanding: not added
+    d_exposed = d_miss / mlp
+    l2_exposed = min(l2_mshr / mlp, d_exposed)
+
+    wanted = {
+        "icache": s[ICACHE_STALL],
+        "branch": max(s[k] for k in SQUASH),
+        "dcache": d_exposed - l2_exposed,
+        "l2": l2_exposed,
+        "rob_lsq": max(s[RENAME_BLOCK] - d_exposed, 0.0),
+    }
+    stack = {"base": min(committing, cycles)}
+    left = cycles - stack["base"]
+    total = sum(max(wanted[cat], 0.0) for cat in STALLS)
+    scale = left / total if total > left else 1.0
+    for cat in STALLS:
+        stack[cat] = max(wanted[cat], 0.0) * scale
+    stack["other"] = max(left - sum(stack[cat] for cat in STALLS), 0.0)
+    return s[INSTS], stack
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="CPI stack (top-down cycle accounting) for the L1 sweep runs")
+    ap.add_argument("--root", default=str(REPO_ROOT), help="Repository root holding */runs_L1_*")
+    ap.add_argument("--cores", help="Comma-separated cores (default: all found)")
+    ap.add_argument("--catalog", help="Read runs and stats from this catalog (analysis.catalog) instead")
+    ap.add_argument("--out", default="cpistack_L1.csv", help="CSV output filename")
+    args = ap.parse_args()
+
+    cores = args.cores.split(",") if args.cores else None
+    if args.catalog:
+        catalog = Catalog(Path(args.catalog), Path(args.root))
+        runs, read = catalog.runs(cores), catalog.read_stats
+    else:
+        runs, read = find_runs(Path(args.root), cores), read_stats
+    # Multi-core runs have per-core stats (system.cpu0, ...): see analysis.multicore
+    runs = [r for r in runs if MC_PREFIX not in r.variant]
+    if not runs:
+        raise SystemExit(f"No runs_L1_* folders with stats.txt under {args.root}")
+    mlps = core_mlp(runs, read)
+    print("MLP per core (interval fit): " + ", ".join(f"{c} {m:.2f}" for c, m in sorted(mlps.items())))
+
+    variants = any(r.variant for r in runs)
+    with open(args.out, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["core", "programme", "jeu_donnees", "L1_taille"] + ["variante"] * variants
+                   + ["cpi"] + [f"cpi_{c}" for c in CATEGORIES])
+        for run in runs:
+            insts, stack = cycle_stack(run, read, mlps.get(run.core, 1.0))
+            cpi = sum(stack.values()) / insts
+            w.writerow([run.core, run.programme, run.jeu_donnees, run.l1_size] + [run.variant] * variants
+                       + [fmt(cpi)] + [fmt(stack[c] / insts) for c in CATEGORIES])
+    print("CSV written:", args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,357 @@
+"""Interval-analysis CPI model fitted to the gem5 L1 sweeps.
+
+Following first-order interval analysis, the cycles of a run are the
+dispatch-limited base plus one interval per miss event:
+
+    CPI = base[workload] + (P_i * I_mpki + P_d * D_mpki + P_l2 * L2_mpki + P_br * BR_mpki) / 1000
+
+``base`` is the CPI of the workload with a perfect memory system and
+predictor (one per programme/jeu_donnees). The L2-miss and branch MPKI
+hardly move with the L1 size, so their penalties cannot be separated from
+``base`` by regression; they are set mechanistically instead: P_br is the
+front-end refill depth taken from config.json and P_l2 the measured average
+L2 miss latency in cycles. P_i and P_d are fitted per core and are
+effective penalties, i.e. the miss latency already divided by the
+memory-level parallelism the core achieves; the implied MLP is reported as
+measured average L1D miss latency / P_d.
+
+``fit`` estimates base and P_i/P_d with non-negative least squares from the
+runs_L1_<core> folders and reports the error of leave-one-L1-size-out
+predictions (each L1 size is held out in turn and predicted from the others).
+``predict`` combines the fitted parameters with miss rates from the offline
+models (cachemodel.cache / parallel / rvsim) to estimate the CPI of L1
+configurations that were never simulated in gem5. Offline I-cache miss rates
+should be per fetch block (rvsim --fetch-block) to match gem5's accounting.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from cachemodel.common import fmt
+
+from .catalog import Catalog
+from .stats import REPO_ROOT, RunInfo, find_runs, open_run_file, read_stats
+
+INSTS = "simInsts"
+CYCLES = "system.cpu.numCycles"
+TICKS = "simTicks"
+I_ACC = "system.cpu.icache.demandAccesses::total"
+I_MISS = "system.cpu.icache.demandMisses::total"
+I_MISS_LAT = "system.cpu.icache.demandMissLatency::total"
+D_ACC = "system.cpu.dcache.demandAccesses::total"
+D_MISS = "system.cpu.dcache.demandMisses::total"
+D_MISS_LAT = "system.cpu.dcache.demandMissLatency::total"
+L2_MISS = "system.l2cache.demandMisses::total"
+L2_MISS_LAT = "system.l2cache.demandMissLatency::total"
+BR_MISP = "system.cpu.commit.branchMispredicts"
+KEYS = [INSTS, CYCLES, TICKS, I_ACC, I_MISS, I_MISS_LAT, D_ACC, D_MISS, D_MISS_LAT, L2_MISS, L2_MISS_LAT, BR_MISP]
+
+EVENTS = ("icache", "dcache", "l2", "branch")
+FITTED = ("icache", "dcache")
+
+# Pipeline delays from fetch to branch resolution and back to fetch (gem5 O3 parameters).
+REFILL_DELAYS = ("fetchToDecodeDelay", "decodeToRenameDelay", "renameToIEWDelay",
+                 "issueToExecuteDelay", "iewToFetchDelay")
+
+
+@dataclass
+class RunEvents:
+    run: RunInfo
+    cpi: float
+    i_apki: float
+    d_apki: float
+    mpki: dict[str, float]
+    i_miss_cycles: float  # average L1I demand miss latency, in core cycles
+    d_miss_cycles: float  # average L1D demand miss latency, in core cycles
+    l2_miss_cycles: float  # average L2 demand miss latency, in core cycles
+    refill_cycles: float  # front-end refill after a mispredict, in core cycles
+
+
+def load_events(run: RunInfo, read: Callable[..., dict[str, float]] = read_stats) -> RunEvents:
+    s = read(run.stats_path, KEYS)
+    missing = [k for k in KEYS if k not in s]
+    if missing:
+        raise ValueError(f"Missing required keys in {run.stats_path}: {missing}")
+    insts, cycles = s[INSTS], s[CYCLES]
+    kilo = insts / 1000.0
+    ticks_per_cycle = s[TICKS] / cycles
+    return RunEvents(
+        run=run,
+        cpi=cycles / insts,
+        i_apki=s[I_ACC] / kilo,
+        d_apki=s[D_ACC] / kilo,
+        mpki={
+            "icache": s[I_MISS] / kilo,
+            "dcache": s[D_MISS] / kilo,
+            "l2": s[L2_MISS] / kilo,
+            "branch": s[BR_MISP] / kilo,
+        },
+        i_miss_cycles=s[I_MISS_LAT] / ticks_per_cycle / s[I_MISS] if s[I_MISS] else 0.0,
+        d_miss_cycles=s[D_MISS_LAT] / ticks_per_cycle / s[D_MISS] if s[D_MISS] else 0.0,
+        l2_miss_cycles=s[L2_MISS_LAT] / ticks_per_cycle / s[L2_MISS] if s[L2_MISS] else 0.0,
+        refill_cycles=refill_depth(run.path / "config.json"),
+    )
+
+
+def refill_depth(config_path: Path) -> float:
+    """Sum of the fetch-to-execute-to-fetch delays of the (first) CPU in config.json."""
+    with open_run_file(config_path) as f:
+        cpu = json.load(f)["system"]["cpu"]
+    if isinstance(cpu, list):
+        cpu = cpu[0]
+    return float(1 + sum(cpu.get(k, 1) for k in REFILL_DELAYS))
+
+
+def _solve(a: list[list[float]], b: list[float]) -> list[float]:
+    """Gaussian elimination with partial pivoting (a is square)."""
+    n = len(b)
+    m = [row[:] + [b[i]] for i, row in enumerate(a)]
+    for col in range(n):
+        piv = max(range(col, n), key=lambda r: abs(m[r][col]))
+        if abs(m[piv][col]) < 1e-12:
+            raise ValueError("singular system")
+        m[col], m[piv] = m[piv], m[col]
+        for r in range(n):
+            if r != col and m[r][col]:
+                f = m[r][col] / m[col][col]
+                m[r] = [x - f * y for x, y in zip(m[r], m[col])]
+    return [m[i][n] / m[i][i] for i in range(n)]
+
+
+def least_squares(rows: list[list[float]], y: list[float], nonneg: list[bool]) -> list[float]:
+    """min ||X w - y|| with w[j] >= 0 where nonneg[j], by dropping negative terms and refitting."""
+    n = len(rows[0])
+    active = list(range(n))
+    while True:
+        xtx = [[sum(r[i] * r[j] for r in rows) for j in active] for i in active]
+        xty = [sum(r[i] * t for r, t in zip(rows, y)) for i in active]
+        try:
+            w_act = _solve(xtx, xty)
+        except ValueError:
+            # Collinear column (e.g. no misses of that kind anywhere): drop the last constrained one.
+            drop = [j for j in active if nonneg[j]][-1]
+            active.remove(drop)
+            continue
+        neg = [(w, j) for w, j in zip(w_act, active) if nonneg[j] and w < 0]
+        if not neg:
+            w = [0.0] * n
+            for v, j in zip(w_act, active):
+                w[j] = v
+            return w
+        active.remove(min(neg)[1])
+
+
+@dataclass
+class CoreModel:
+    core: str
+    penalties: dict[str, float]
+    workloads: dict[str, dict[str, float]]
+
+    def components(self, workload: str, mpki: dict[str, float]) -> dict[str, float]:
+        comp = {"base": self.workloads[workload]["base"]}
+        for ev in EVENTS:
+            comp[ev] = self.penalties[ev] * mpki[ev] / 1000.0
+        return comp
+
+    def predict(self, workload: str, mpki: dict[str, float]) -> float:
+        return sum(self.components(workload, mpki).values())
+
+    def to_json(self) -> dict:
+        return {"penalties": self.penalties, "workloads": self.workloads}
+
+
+def fit_core(core: str, events: list[RunEvents]) -> CoreModel:
+    workloads = sorted({e.run.workload for e in events})
+    l2_lat = [e.l2_miss_cycles for e in events if e.l2_miss_cycles > 0]
+    penalties = {
+        "l2": sum(l2_lat) / len(l2_lat) if l2_lat else 0.0,
+        "branch": sum(e.refill_cycles for e in events) / len(events),
+    }
+    rows, y = [], []
+    for e in events:
+        rows.append([1.0 if e.run.workload == w else 0.0 for w in workloads]
+                    + [e.mpki[ev] / 1000.0 for ev in FITTED])
+        fixed = (penalties["l2"] * e.mpki["l2"] + penalties["branch"] * e.mpki["branch"]) / 1000.0
+        y.append(e.cpi - fixed)
+    w = least_squares(rows, y, [False] * len(workloads) + [True] * len(FITTED))
+    penalties.update(zip(FITTED, w[len(workloads):]))
+    penalties = {ev: penalties[ev] for ev in EVENTS}
+
+    per_wl: dict[str, dict[str, float]] = {}
+    for i, wl in enumerate(workloads):
+        ev_wl = [e for e in events if e.run.workload == wl]
+        n = len(ev_wl)
+        per_wl[wl] = {
+            "base": w[i],
+            "i_apki": sum(e.i_apki for e in ev_wl) / n,
+            "d_apki": sum(e.d_apki for e in ev_wl) / n,
+            "l2_mpki": sum(e.mpki["l2"] for e in ev_wl) / n,
+            "branch_mpki": sum(e.mpki["branch"] for e in ev_wl) / n,
+        }
+    return CoreModel(core, penalties, per_wl)
+
+
+def implied_mlp(model: CoreModel, events: list[RunEvents]) -> float | None:
+    p_d = model.penalties["dcache"]
+    lat = [e.d_miss_cycles for e in events if e.d_miss_cycles > 0]
+    if p_d <= 0 or not lat:
+        return None
+    return (sum(lat) / len(lat)) / p_d
+
+
+def core_mlp(runs: list[RunInfo], read: Callable[..., dict[str, float]] = read_stats) -> dict[str, float]:
+    """MLP of each core implied by the fit on its base runs, at least 1 (cores with no fit are left out).
+
+    gem5 counts no cycles with a miss outstanding, so the MLP cannot be read
+    from the stats; the fitted P_dcache is the L1D miss penalty the core
+    actually pays, and the measured average L1D miss latency over it is the
+    number of misses overlapped on average.
+    """
+    by_core: dict[str, list[RunEvents]] = {}
+    for run in runs:
+        if not run.variant:
+            by_core.setdefault(run.core, []).append(load_events(run, read))
+    out = {}
+    for core, events in by_core.items():
+        mlp = implied_mlp(fit_core(core, events), events)
+        if mlp:
+            out[core] = max(mlp, 1.0)
+    return out
+
+
+def cmd_fit(args: argparse.Namespace) -> int:
+    cores = args.cores.split(",") if args.cores else None
+    if args.catalog:
+        catalog = Catalog(Path(args.catalog), Path(args.root))
+        runs, read = catalog.runs(cores), catalog.read_stats
+    else:
+        runs, read = find_runs(Path(args.root), cores), read_stats
+    # The model is fitted on the base configuration only: variants (prefetchers, ...)
+    # change the miss penalties it assumes constant per core.
+    runs = [r for r in runs if not r.variant]
+    if not runs:
+        raise SystemExit(f"No runs_L1_* folders with stats.txt under {args.root}")
+    by_core: dict[str, list[RunEvents]] = {}
+    for run in runs:
+        by_core.setdefault(run.core, []).append(load_events(run, read))
+
+    params = {}
+    out_rows = []
+    for core, events in sorted(by_core.items()):
+        model = fit_core(core, events)
+        params[core] = model.to_json()
+
+        # Leave-one-L1-size-out: every run is predicted by a model that never saw its size.
+        heldout: dict[Path, float] = {}
+        for size in sorted({e.run.l1_size for e in events}):
+            train = [e for e in events if e.run.l1_size != size]
+            if not train:
+                continue
+            m = fit_core(core, train)
+            for e in events:
+                if e.run.l1_size == size and e.run.workload in m.workloads:
+                    heldout[e.run.path] = m.predict(e.run.workload, e.mpki)
+
+        errors = []
+        for e in events:
+            fitted = model.predict(e.run.workload, e.mpki)
+            pred = heldout.get(e.run.path)
+            err = (pred - e.cpi) / e.cpi if pred is not None else None
+            if err is not None:
+                errors.append(abs(err))
+            out_rows.append([core, e.run.programme, e.run.jeu_donnees, e.run.l1_size, fmt(e.cpi),
+                             fmt(fitted), fmt(pred), fmt(100.0 * err if err is not None else None)])
+
+        mlp = implied_mlp(model, events)
+        pen = " ".join(f"P_{ev}={model.penalties[ev]:.1f}" for ev in EVENTS)
+        print(f"{core}: {pen} implied_MLP={mlp:.2f}" if mlp else f"{core}: {pen}")
+        if errors:
+            print(f"{core}: held-out CPI error mean={100 * sum(errors) / len(errors):.2f}% "
+                  f"max={100 * max(errors):.2f}% over {len(errors)} runs")
+
+    with open(args.params, "w", encoding="utf-8") as f:
+        json.dump(params, f, indent=2, sort_keys=True)
+        f.write("\n")
+    with open(args.out, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["core", "programme", "jeu_donnees", "L1_taille", "cpi", "cpi_fit", "cpi_heldout",
+                    "heldout_err_pct"])
+        w.writerows(out_rows)
+    print("Parameters written:", args.params)
+    print("CSV written:", args.out)
+    return 0
+
+
+def cmd_predict(args: argparse.Namespace) -> int:
+    with open(args.params, encoding="utf-8") as f:
+        params = json.load(f)
+    if args.core not in params:
+        raise SystemExit(f"No parameters for core {args.core!r} in {args.params} (have {sorted(params)})")
+    model = CoreModel(args.core, params[args.core]["penalties"], params[args.core]["workloads"])
+
+    with open(args.csv, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    if not rows:
+        raise SystemExit("Empty CSV: " + args.csv)
+
+    out_rows = []
+    for r in rows:
+        programme = r.get("programme") or args.programme
+        jeu = r.get("jeu_donnees") or args.jeu
+        wl = f"{programme}/{jeu}"
+        if wl not in model.workloads:
+            print(f"Warning: no fitted base CPI for {wl} on {args.core}, skipped")
+            continue
+        p = model.workloads[wl]
+        mpki = {
+            "icache": float(r["icache_miss"]) * p["i_apki"],
+            "dcache": float(r["dcache_miss"]) * p["d_apki"],
+            "l2": p["l2_mpki"],
+            "branch": p["branch_mpki"],
+        }
+        comp = model.components(wl, mpki)
+        out_rows.append([args.core, programme, jeu, r.get("L1_taille", ""), fmt(sum(comp.values()))]
+                        + [fmt(comp[k]) for k in ("base",) + EVENTS])
+
+    with open(args.out, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["core", "programme", "jeu_donnees", "L1_taille", "cpi_pred", "cpi_base"]
+                   + [f"cpi_{ev}" for ev in EVENTS])
+        w.writerows(out_rows)
+    print("CSV written:", args.out)
+    return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Interval-analysis CPI model fitted to the gem5 L1 sweeps")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    fit = sub.add_parser("fit", help="Fit per-core parameters and report held-out error")
+    fit.add_argument("--root", default=str(REPO_ROOT), help="Repository root holding */runs_L1_*")
+    fit.add_argument("--cores", help="Comma-separated cores to fit (default: all found)")
+    fit.add_argument("--catalog", help="Read runs and stats from this catalog (analysis.catalog) instead")
+    fit.add_argument("--params", default="interval_params.json", help="Fitted parameters output")
+    fit.add_argument("--out", default="interval_fit.csv", help="Per-run measured/fitted/held-out CSV")
+    fit.set_defaults(func=cmd_fit)
+
+    pred = sub.add_parser("predict", help="Predict CPI from offline miss rates")
+    pred.add_argument("--params", default="interval_params.json", help="Parameters written by 'fit'")
+    pred.add_argument("--core", required=True, help="Core whose parameters to use (A7, A15)")
+    pred.add_argument("--csv", required=True,
+                      help="CSV with L1_taille, icache_miss, dcache_miss (and optionally programme, jeu_donnees)")
+    pred.add_argument("--programme", help="Programme when the CSV has no programme column")
+    pred.add_argument("--jeu", help="Data set when the CSV has no jeu_donnees column")
+    pred.add_argument("--out", default="interval_pred.csv", help="CSV output filename")
+    pred.set_defaults(func=cmd_predict)
+
+    args = ap.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,254 @@
+"""Best I/D split of a fixed L1 budget, found with as few gem5 runs as possible.
+
+    python -m analysis.l1split --programme dijkstra --core A7 --jeu small --budget 16kB
+    python -m analysis.l1split ... --step 2kB --max-runs 4 --dry-run
+
+To first order the I-cache misses depend on the L1I size only and the
+D-cache misses on the L1D size, so the symmetric sweep (runs_L1_<core>,
+base configuration) already gives an I and a D miss curve per workload.
+Every split l1i + l1d = budget on a --step grid is scored with the interval
+model of analysis.interval, fitted on the base runs of the core, over those
+curves (linear in log2(size) between simulated sizes, extrapolated from the
+end segments beyond them). When the fit leaves the core no I-cache penalty
+(non-negative least squares clips it to 0, as on the A7), the ranking would
+ignore the I-side curve and always favour the smallest L1I; the measured
+average L1I miss latency of the workload is used as its penalty instead
+(the front end does not overlap I-cache misses), with a warning.
+
+gem5 is then only run to confirm: first the best-predicted split, then the
+unmeasured grid neighbours of the best measured split, better predicted
+first, until both neighbours of the best measured split are measured or
+--max-runs gem5 runs were made. Splits already simulated (their
+split-<l1i>-<l1d> run folder, or the symmetric run of budget/2) are not run
+again.
+
+The L1s stay 2-way where the size allows it, but a size that is not a power
+of two gets the associativity CortexA*L1.fit_assoc picks for a power-of-two
+number of sets (10kB: 5-way, 6kB or 12kB: 3-way on both cores), so such
+splits also change the associativity; the CSV gives the ways of each side
+(l1i_assoc, l1d_assoc).
+
+The runs go through <programme>/run_<core>L1_sweep.sh with L1_SPLITS and
+DATASETS set and the other sweep lists at their defaults, so they land in
+runs_L1_<core> like any other sweep run. The CSV lists every split of the
+grid with its predicted and, where simulated, measured CPI and IPC.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import math
+import os
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable
+
+from cachemodel.common import fmt, fmt_size, parse_size
+
+from .catalog import Catalog
+from .interval import CYCLES, INSTS, CoreModel, RunEvents, fit_core, load_events
+from .stats import REPO_ROOT, RunInfo, find_runs, read_stats
+
+# Sweep lists that would change the configuration of the split runs.
+SWEEP_VARS = ("PREFETCHERS", "FRONTENDS", "REPLACEMENTS", "COMPRESSORS", "SECTORS", "WRITES",
+              "LINE_SIZES", "L2_CONFIGS", "MULTICORE", "L1_SIZES", "STATS_PIPE")
+
+# Default L1 line size and associativity of each core (CortexA*L1.py).
+L1_GEOMETRY = {"A7": (32, 2), "A15": (64, 2)}
+
+
+def l1_assoc(core: str, size: int) -> int:
+    """Ways of an L1 of ``size`` bytes, as CortexA*L1.fit_assoc sets them."""
+    line, assoc = L1_GEOMETRY[core]
+    lines = size // line
+    while assoc < lines and (lines % assoc or (lines // assoc) & (lines // assoc - 1)):
+        assoc += 1
+    return assoc
+
+
+@dataclass
+class Split:
+    l1i: int
+    l1d: int
+    cpi_pred: float
+    cpi: float | None = None
+    source: str = ""  # "existing" or "gem5" once measured
+
+    @property
+    def label(self) -> str:
+        """L1_SPLITS entry of the sweep scripts."""
+        return f"{fmt_size(self.l1i)}:{fmt_size(self.l1d)}"
+
+    @property
+    def variant(self) -> str:
+        return f"split-{fmt_size(self.l1i)}-{fmt_size(self.l1d)}"
+
+
+def miss_curve(events: list[RunEvents], event: str) -> list[tuple[float, float]]:
+    """(log2 L1 size, mpki) of one miss event over the symmetric runs."""
+    return sorted((math.log2(parse_size(e.run.l1_size)), e.mpki[event]) for e in events)
+
+
+def interpolate(curve: list[tuple[float, float]], size: int) -> float:
+    """mpki at ``size``: linear in log2(size) on the segment around it, or the end segment beyond."""
+    x = math.log2(size)
+    segment = next(((a, b) for a, b in zip(curve, curve[1:]) if x <= b[0]), (curve[-2], curve[-1]))
+    (x0, y0), (x1, y1) = segment
+    return max(y0 + (y1 - y0) * (x - x0) / (x1 - x0), 0.0)
+
+
+def icache_fallback(model: CoreModel, events: list[RunEvents]) -> float | None:
+    """I-cache penalty to rank with when the core fit has none: the workload's measured L1I miss latency."""
+    if model.penalties["icache"] > 0:
+        return None
+    lat = [e.i_miss_cycles for e in events if e.i_miss_cycles > 0]
+    return sum(lat) / len(lat) if lat else None
+
+
+def predict_splits(model: CoreModel, core_events: list[RunEvents], workload: str, budget: int,
+                   step: int) -> list[Split]:
+    """Every split of the grid, ordered by L1I size, with its interval-model CPI."""
+    events = [e for e in core_events if e.run.workload == workload]
+    i_curve, d_curve = miss_curve(events, "icache"), miss_curve(events, "dcache")
+    p = model.workloads[workload]
+    splits = []
+    for l1i in range(step, budget, step):
+        mpki = {
+            "icache": interpolate(i_curve, l1i),
+            "dcache": interpolate(d_curve, budget - l1i),
+            "l2": p["l2_mpki"],
+            "branch": p["branch_mpki"],
+        }
+        splits.append(Split(l1i, budget - l1i, model.predict(workload, mpki)))
+    return splits
+
+
+def run_cpi(run: RunInfo, read: Callable[..., dict[str, float]] = read_stats) -> float | None:
+    s = read(run.stats_path, [INSTS, CYCLES])
+    return s[CYCLES] / s[INSTS] if s.get(INSTS) and CYCLES in s else None
+
+
+def search(splits: list[Split], measure: Callable[[Split], float], max_runs: int) -> int:
+    """Measure the best-predicted split, then climb to better measured neighbours; return the gem5 runs made."""
+    n_runs = 0
+
+    def run(split: Split) -> None:
+        nonlocal n_runs
+        split.cpi = measure(split)
+        split.source = "gem5"
+        n_runs += 1
+
+    first = min(splits, key=lambda s: s.cpi_pred)
+    if first.cpi is None and n_runs < max_runs:
+        run(first)
+    while n_runs < max_runs:
+        measured = [i for i, s in enumerate(splits) if s.cpi is not None]
+        if not measured:
+            break
+        best = min(measured, key=lambda i: splits[i].cpi)
+        todo = [splits[j] for j in (best - 1, best + 1) if 0 <= j < len(splits) and splits[j].cpi is None]
+        if not todo:
+            break
+        run(min(todo, key=lambda s: s.cpi_pred))
+    return n_runs
+
+
+def sweep_runner(root: Path, programme: str, core: str, jeu: str) -> Callable[[Split], float]:
+    """measure() that simulates one split with the sweep script of the programme and core."""
+    script = root / programme / f"run_{core}L1_sweep.sh"
+    if not script.is_file():
+        raise SystemExit(f"No sweep script {script}")
+
+    def measure(split: Split) -> float:
+        env = {k: v for k, v in os.environ.items() if k not in SWEEP_VARS}
+        with tempfile.TemporaryDirectory() as tmp:
+            out = Path(tmp) / "resultats.csv"
+            env.update(L1_SPLITS=split.label, DATASETS=jeu, CSV_OUT=str(out))
+            print(f"gem5: {programme}/{jeu} on {core}, L1I {fmt_size(split.l1i)} + L1D {fmt_size(split.l1d)}")
+            subprocess.run(["bash", str(script)], env=env, check=True, stdout=subprocess.DEVNULL)
+            with out.open(newline="", encoding="utf-8") as f:
+                rows = [r for r in csv.DictReader(f) if r.get("variante") == split.variant]
+        if not rows:
+            raise SystemExit(f"{script} wrote no result for {split.variant}")
+        return float(rows[0]["cpi"])
+
+    return measure
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Find the I/D split of an L1 budget with the highest IPC")
+    ap.add_argument("--programme", required=True, help="Programme (dijkstra, blowfish)")
+    ap.add_argument("--core", required=True, choices=sorted(L1_GEOMETRY), help="Core")
+    ap.add_argument("--jeu", required=True, help="Data set (small, large)")
+    ap.add_argument("--budget", required=True, help="Total L1I + L1D size, e.g. 16kB")
+    ap.add_argument("--step", help="Split granularity (default: budget / 8)")
+    ap.add_argument("--max-runs", type=int, default=6, help="At most this many gem5 runs")
+    ap.add_argument("--dry-run", action="store_true", help="Only rank the splits, run nothing")
+    ap.add_argument("--root", default=str(REPO_ROOT), help="Repository root holding */runs_L1_*")
+    ap.add_argument("--catalog", help="Read the existing runs from this catalog (analysis.catalog) instead")
+    ap.add_argument("--out", default="l1split.csv", help="CSV output filename")
+    args = ap.parse_args()
+
+    root = Path(args.root)
+    budget = parse_size(args.budget)
+    step = parse_size(args.step) if args.step else budget // 8
+    if budget % 2048 or step % 1024 or not 0 < step < budget or budget % step:
+        raise SystemExit("--budget must be a multiple of 2kB and --step a multiple of 1kB dividing it")
+
+    if args.catalog:
+        catalog = Catalog(Path(args.catalog), root)
+        runs, read = catalog.runs([args.core]), catalog.read_stats
+    else:
+        runs, read = find_runs(root, [args.core]), read_stats
+    workload = f"{args.programme}/{args.jeu}"
+    base = [load_events(r, read) for r in runs if not r.variant]
+    if len({e.run.l1_size for e in base if e.run.workload == workload}) < 2:
+        raise SystemExit(f"Need the symmetric sweep of {workload} on {args.core} (at least two L1 sizes)")
+
+    model = fit_core(args.core, base)
+    p_i = icache_fallback(model, [e for e in base if e.run.workload == workload])
+    if p_i is not None:
+        print(f"Warning: the {args.core} interval model has no I-cache sensitivity (P_icache = 0); "
+              f"ranking with the measured L1I miss latency of {workload}, {p_i:.1f} cycles")
+        model.penalties["icache"] = p_i
+    splits = predict_splits(model, base, workload, budget, step)
+    half = fmt_size(budget // 2)
+    done = {r.variant: r for r in runs
+            if r.workload == workload and r.l1_size == half and (r.variant == "" or r.variant.startswith("split-"))}
+    for s in splits:
+        run = done.get("" if s.l1i == s.l1d else s.variant)
+        if run is not None:
+            s.cpi, s.source = run_cpi(run, read), "existing"
+
+    n_runs = 0
+    if args.dry_run:
+        best = min(splits, key=lambda s: s.cpi_pred)
+        print(f"Best predicted: L1I {fmt_size(best.l1i)} + L1D {fmt_size(best.l1d)}"
+              + (" (already simulated)" if best.cpi is not None else f" (L1_SPLITS={best.label})"))
+    else:
+        measure = sweep_runner(root, args.programme, args.core, args.jeu)
+        n_runs = search(splits, measure, args.max_runs)
+
+    with open(args.out, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["core", "programme", "jeu_donnees", "budget", "l1i", "l1d", "l1i_assoc", "l1d_assoc",
+                    "cpi_pred", "cpi", "ipc", "source"])
+        for s in splits:
+            w.writerow([args.core, args.programme, args.jeu, fmt_size(budget), fmt_size(s.l1i), fmt_size(s.l1d),
+                        l1_assoc(args.core, s.l1i), l1_assoc(args.core, s.l1d),
+                        fmt(s.cpi_pred), fmt(s.cpi), fmt(1.0 / s.cpi if s.cpi else None), s.source])
+
+    measured = [s for s in splits if s.cpi is not None]
+    if measured:
+        best = min(measured, key=lambda s: s.cpi)
+        print(f"{workload} on {args.core}, {fmt_size(budget)}: best measured split L1I {fmt_size(best.l1i)} + "
+              f"L1D {fmt_size(best.l1d)}, IPC {1.0 / best.cpi:.4f} ({n_runs} gem5 run(s), "
+              f"{len(measured)} of {len(splits)} splits measured)")
+    print("CSV written:", args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
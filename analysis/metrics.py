@@ -0,0 +1,343 @@
+"""Derived-stat expression engine driven by a metrics definition file.
+
+A definition file (metrics.ini next to this module by default) holds one
+section per metric set; each entry is ``name = expression``:
+
+    [metrics_L1]
+    cpi = system.cpu.cpi
+    bp_cond_mispredict_rate = system.cpu.branchPred.condIncorrect / system.cpu.branchPred.condPredicted
+    l1_mpki = 1000 * sum(system.cpu.*cache.demandMisses::total) / simInsts
+
+Expressions are Python arithmetic over gem5 stat names. A name containing
+``*`` is a wildcard matching every stat of that shape; it has to be reduced
+with sum/mean/min/max/count (a bare wildcard is summed); over the bins of a
+vector stat (``name::*``), bins() counts the numeric bins ::0..::N and
+binmean() is their mean subscript weighted by the bin values. Since ``*``
+binds to names, write multiplication with spaces (``a * b``). Earlier metrics of
+the same section can be used by name. Division by zero and missing stats
+give NaN, which the CSV writers print as an empty cell.
+
+Each expression is compiled once into a row function and mapped over the
+columns of a StatTable, so every metric is evaluated for all runs in one
+pass and each stats.txt is parsed only once, whatever the number of metrics.
+"""
+from __future__ import annotations
+
+import argparse
+import ast
+import configparser
+import csv
+import keyword
+import math
+import re
+from dataclasses import dataclass, field
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Callable, Iterable, Sequence
+
+from .catalog import Catalog
+from .stats import REPO_ROOT, find_runs, has_file, read_stats
+
+METRICS_FILE = Path(__file__).resolve().parent / "metrics.ini"
+
+NAN = float("nan")
+
+# A gem5 stat name: dotted components, optional ::subname, '*' allowed anywhere
+# inside a name (so multiplication needs spaces around '*').
+STAT_RE = re.compile(r"(?<![\w.:])(?:[A-Za-z_]|\*(?=[\w.]))[\w*]*(?:(?:\.|::)[\w*]+)*")
+
+
+def _div(a: float, b: float) -> float:
+    if b == 0 or b != b:
+        return NAN
+    return a / b
+
+
+def _values(group: Sequence[float]) -> list[float]:
+    return [v for v in group if v == v]
+
+
+def _sum(group: Sequence[float]) -> float:
+    vals = _values(group)
+    return math.fsum(vals) if vals else NAN
+
+
+def _mean(group: Sequence[float]) -> float:
+    vals = _values(group)
+    return math.fsum(vals) / len(vals) if vals else NAN
+
+
+def _min(group: Sequence[float]) -> float:
+    vals = _values(group)
+    return min(vals) if vals else NAN
+
+
+def _max(group: Sequence[float]) -> float:
+    vals = _values(group)
+    return max(vals) if vals else NAN
+
+
+def _count(group: Sequence[float]) -> float:
+    return float(len(_values(group)))
+
+
+def _bins(group: "Group") -> list[tuple[int, float]]:
+    """(subscript, value) of the ::0, ::1, ... entries of a vector stat."""
+    out = []
+    for key, v in zip(group.keys, group):
+        sub = key.rpartition("::")[2]
+        if sub.isdigit() and v == v:
+            out.append((int(sub), v))
+    return out
+
+
+def _nbins(group: "Group") -> float:
+    return float(len(_bins(group))) or NAN
+
+
+def _binmean(group: "Group") -> float:
+    bins = _bins(group)
+    total = math.fsum(v for _, v in bins)
+    return _div(math.fsum(i * v for i, v in bins), total)
+
+
+REDUCERS: dict[str, Callable[[Sequence[float]], float]] = {
+    "sum": _sum, "mean": _mean, "min": _min, "max": _max, "count": _count,
+    "bins": _nbins, "binmean": _binmean,
+}
+FUNCTIONS: dict[str, Callable[..., float]] = {"abs": abs, "sqrt": lambda v: math.sqrt(v) if v >= 0 else NAN}
+
+_ALLOWED = (ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Load, ast.Constant,
+            ast.Add, ast.Sub, ast.Mult, ast.Div, ast.Pow, ast.USub, ast.UAdd, ast.IfExp, ast.Compare,
+            ast.Gt, ast.GtE, ast.Lt, ast.LtE, ast.Eq, ast.NotEq)
+
+
+class MetricError(ValueError):
+    pass
+
+
+class _Rewrite(ast.NodeTransformer):
+    """a / b -> _div(a, b); bare wildcard -> sum(wildcard)."""
+
+    def __init__(self, wildcards: set[str]) -> None:
+        self.wildcards = wildcards
+
+    def visit_BinOp(self, node: ast.BinOp) -> ast.AST:
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Div):
+            return ast.Call(func=ast.Name("_div", ast.Load()), args=[node.left, node.right], keywords=[])
+        return node
+
+    def visit_Call(self, node: ast.Call) -> ast.AST:
+        name = node.func.id if isinstance(node.func, ast.Name) else None
+        if name in REDUCERS:
+            if len(node.args) != 1 or not (isinstance(node.args[0], ast.Name) and node.args[0].id in self.wildcards):
+                raise MetricError(f"{name}() takes a single wildcard stat")
+            return node
+        self.generic_visit(node)
+        return node
+
+    def visit_Name(self, node: ast.Name) -> ast.AST:
+        if node.id in self.wildcards:
+            return ast.Call(func=ast.Name("sum", ast.Load()), args=[node], keywords=[])
+        return node
+
+
+@dataclass
+class Metric:
+    name: str
+    expression: str
+    stats: list[str]            # exact stat names, in argument order
+    patterns: list[str]         # wildcard patterns, in argument order
+    deps: list[str]             # earlier metrics used by name
+    func: Callable[..., float]
+
+
+def compile_metric(name: str, expression: str, known: Iterable[str] = ()) -> Metric:
+    known = set(known)
+    stats: list[str] = []
+    patterns: list[str] = []
+    deps: list[str] = []
+    placeholders: dict[str, str] = {}
+
+    def repl(m: re.Match) -> str:
+        tok = m.group(0)
+        if tok in placeholders:
+            return placeholders[tok]
+        if tok in REDUCERS or tok in FUNCTIONS or keyword.iskeyword(tok):
+            return tok
+        if tok in known:
+            ph = f"_m{len(deps)}"
+            deps.append(tok)
+        elif "*" in tok:
+            ph = f"_w{len(patterns)}"
+            patterns.append(tok)
+        else:
+            ph = f"_s{len(stats)}"
+            stats.append(tok)
+        placeholders[tok] = ph
+        return ph
+
+    source = STAT_RE.sub(repl, expression.strip())
+    try:
+        tree = ast.parse(source, mode="eval")
+    except SyntaxError as e:
+        raise MetricError(f"{name}: cannot parse {expression!r}: {e.msg}") from None
+    for node in ast.walk(tree):
+        if not isinstance(node, _ALLOWED):
+            raise MetricError(f"{name}: unsupported syntax {type(node).__name__} in {expression!r}")
+        if isinstance(node, ast.Call) and not (
+                isinstance(node.func, ast.Name) and (node.func.id in REDUCERS or node.func.id in FUNCTIONS)):
+            raise MetricError(f"{name}: unknown function in {expression!r}")
+    try:
+        tree = ast.fix_missing_locations(_Rewrite({f"_w{i}" for i in range(len(patterns))}).visit(tree))
+    except MetricError as e:
+        raise MetricError(f"{name}: {e}") from None
+
+    args = ([f"_s{i}" for i in range(len(stats))] + [f"_w{i}" for i in range(len(patterns))]
+            + [f"_m{i}" for i in range(len(deps))])
+    lam = ast.Expression(ast.Lambda(
+        args=ast.arguments(posonlyargs=[], args=[ast.arg(a) for a in args], kwonlyargs=[], kw_defaults=[],
+                           defaults=[]),
+        body=tree.body))
+    ast.fix_missing_locations(lam)
+    env = {"_div": _div, **REDUCERS, **FUNCTIONS}
+    func = eval(compile(lam, f"<metric {name}>", "eval"), env)
+    return Metric(name, expression, stats, patterns, deps, func)
+
+
+class Group(tuple):
+    """Values of one run for the stats a wildcard matched, named by ``keys``."""
+    keys: tuple[str, ...] = ()
+
+
+@dataclass
+class StatTable:
+    """Stat values of many runs, stored column-wise (NaN where a run lacks a stat)."""
+    n_runs: int
+    columns: dict[str, list[float]] = field(default_factory=dict)
+
+    @classmethod
+    def from_dicts(cls, rows: Sequence[dict[str, float]]) -> "StatTable":
+        keys = sorted({k for r in rows for k in r})
+        return cls(len(rows), {k: [r.get(k, NAN) for r in rows] for k in keys})
+
+    @classmethod
+    def load(cls, stats_paths: Sequence[Path], metrics: "MetricSet | None" = None,
+             read: Callable[[Path], dict[str, float]] = read_stats) -> "StatTable":
+        """Parse each stats.txt once, keeping only what the metric set references.
+
+        ``read`` may be Catalog.read_stats to take the values from the run catalog.
+        """
+        rows = []
+        for p in stats_paths:
+            if read is read_stats and not has_file(Path(p)):
+                values = {}
+            else:
+                values = read(Path(p))
+            if metrics is not None:
+                values = {k: v for k, v in values.items() if metrics.wants(k)}
+            rows.append(values)
+        return cls.from_dicts(rows)
+
+    def column(self, key: str) -> list[float]:
+        return self.columns.get(key, [NAN] * self.n_runs)
+
+    def group(self, pattern: str) -> list[Group]:
+        keys = tuple(k for k in self.columns if fnmatchcase(k, pattern))
+        cols = [self.columns[k] for k in keys]
+        groups = [Group(vals) for vals in zip(*cols)] if cols else [Group() for _ in range(self.n_runs)]
+        for g in groups:
+            g.keys = keys
+        return groups
+
+
+class MetricSet:
+    def __init__(self, definitions: Sequence[tuple[str, str]]) -> None:
+        self.metrics: list[Metric] = []
+        known: list[str] = []
+        for name, expr in definitions:
+            if name in known:
+                raise MetricError(f"Metric {name!r} defined twice")
+            self.metrics.append(compile_metric(name, expr, known))
+            known.append(name)
+        self.stats = sorted({s for m in self.metrics for s in m.stats})
+        self.patterns = sorted({p for m in self.metrics for p in m.patterns})
+
+    @property
+    def names(self) -> list[str]:
+        return [m.name for m in self.metrics]
+
+    def wants(self, key: str) -> bool:
+        return key in self.stats or any(fnmatchcase(key, p) for p in self.patterns)
+
+    def evaluate(self, table: StatTable) -> dict[str, list[float]]:
+        out: dict[str, list[float]] = {}
+        for m in self.metrics:
+            cols = ([table.column(s) for s in m.stats] + [table.group(p) for p in m.patterns]
+                    + [out[d] for d in m.deps])
+            if cols:
+                out[m.name] = [_safe(m.func, row) for row in zip(*cols)]
+            else:
+                out[m.name] = [_safe(m.func, ())] * table.n_runs
+        return out
+
+
+def _safe(func: Callable[..., float], row: tuple) -> float:
+    try:
+        v = float(func(*row))
+    except (ArithmeticError, ValueError, TypeError):
+        return NAN
+    return v
+
+
+def load_metrics(path: Path = METRICS_FILE, section: str = "metrics_L1") -> MetricSet:
+    parser = configparser.ConfigParser(delimiters=("=",), comment_prefixes=("#", ";"),
+                                       inline_comment_prefixes=("#",), interpolation=None)
+    parser.optionxform = str  # type: ignore[assignment]
+    with Path(path).open(encoding="utf-8") as f:
+        parser.read_file(f)
+    if not parser.has_section(section):
+        raise MetricError(f"No [{section}] section in {path} (have {parser.sections()})")
+    return MetricSet(list(parser.items(section)))
+
+
+def fmt_value(val: float | None) -> str:
+    if val is None or val != val:
+        return ""
+    return f"{val:.6f}".rstrip("0").rstrip(".")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Evaluate a metric set of metrics.ini over all L1 sweep runs")
+    ap.add_argument("--metrics", default=str(METRICS_FILE), help="Metrics definition file")
+    ap.add_argument("--set", default="metrics_L1", help="Section of the definition file to evaluate")
+    ap.add_argument("--root", default=str(REPO_ROOT), help="Repository root holding */runs_L1_*")
+    ap.add_argument("--catalog", help="Read runs and stats from this catalog (analysis.catalog) instead")
+    ap.add_argument("--out", default="metrics_all.csv", help="CSV output filename")
+    args = ap.parse_args()
+
+    metrics = load_metrics(Path(args.metrics), args.set)
+    if args.catalog:
+        catalog = Catalog(Path(args.catalog), Path(args.root))
+        runs, read = catalog.runs(), catalog.read_stats
+    else:
+        runs, read = find_runs(Path(args.root)), read_stats
+    if not runs:
+        raise SystemExit(f"No runs_L1_* folders with stats.txt under {args.root}")
+    values = metrics.evaluate(StatTable.load([r.stats_path for r in runs], metrics, read))
+    # The variante column only appears when configuration variants were swept.
+    variants = any(r.variant for r in runs)
+
+    with open(args.out, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["core", "programme", "jeu_donnees", "L1_taille"] + ["variante"] * variants + metrics.names)
+        for i, r in enumerate(runs):
+            w.writerow([r.core, r.programme, r.jeu_donnees, r.l1_size] + [r.variant] * variants
+                       + [fmt_value(values[n][i]) for n in metrics.names])
+    print("CSV written:", args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,118 @@
+"""Weighted speedup of the multi-core runs against the single-core runs.
+
+    python -m analysis.multicore [--cores A7,A15] [--catalog runs_catalog.sqlite] [--out multicore_L1.csv]
+
+A multi-core run (mc-<cores>-<L2>-<L3>[-<mix>] in its variante, MULTICORE in
+the sweep scripts) runs its programme on core 0 and copies of it, or the
+mix benchmarks, on the other cores; which binary each core ran is read from
+config.json. Each core's IPC under contention is divided by the IPC of the
+same benchmark alone: the single-core run of the same core type, data set,
+L1 size and variante without its mc- part. The sum over the cores is the
+weighted speedup (N for no interference at all); cpu0_slowdown is how much
+the programme of the folder loses to its neighbours at that L1 size.
+
+A core whose benchmark has no single-core run (SHA has no sweep script)
+leaves weighted_speedup empty; its IPC is still in ipc_per_core, one value
+per core joined with "+" in the order of benchmarks (metrics.ini [multicore]
+only has the sum and core 0).
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+from pathlib import Path
+from typing import Callable
+
+from cachemodel.common import fmt
+
+from .catalog import Catalog
+from .stats import REPO_ROOT, RunInfo, find_runs, open_run_file, read_stats
+
+MC_PREFIX = "mc-"
+
+
+def single_variant(variant: str) -> str:
+    """The variante of the single-core run matching a multi-core variante."""
+    return "_".join(p for p in variant.split("_") if p and not p.startswith(MC_PREFIX))
+
+
+def core_benchmarks(run: RunInfo) -> list[str]:
+    """Benchmark of each core, from the directory of its binary in config.json."""
+    try:
+        with open_run_file(run.path / "config.json") as f:
+            cpus = json.load(f)["system"]["cpu"]
+    except (OSError, ValueError, KeyError):
+        return []
+    if not isinstance(cpus, list):
+        cpus = [cpus]
+    names = []
+    for cpu in cpus:
+        workload = cpu.get("workload") or [{}]
+        cmd = (workload[0] if isinstance(workload, list) else workload).get("cmd") or [""]
+        names.append(Path(cmd[0]).parent.name.lower())
+    return names
+
+
+def alone_ipc(runs: list[RunInfo], read: Callable[..., dict[str, float]]) -> dict[tuple[str, ...], float]:
+    """IPC of every single-core run, keyed by (programme, core, jeu, L1 size, variante)."""
+    out = {}
+    for run in runs:
+        if MC_PREFIX in run.variant:
+            continue
+        ipc = read(run.stats_path, ["system.cpu.ipc"]).get("system.cpu.ipc")
+        if ipc:
+            out[(run.programme.lower(), run.core, run.jeu_donnees, run.l1_size, run.variant)] = ipc
+    return out
+
+
+def speedups(run: RunInfo, alone: dict[tuple[str, ...], float],
+             read: Callable[..., dict[str, float]]) -> tuple[list[str], list[float | None], list[float | None]]:
+    """(benchmark, shared IPC, alone IPC) of each core of a multi-core run."""
+    names = core_benchmarks(run)
+    keys = [f"system.cpu{i}.ipc" for i in range(len(names))]
+    s = read(run.stats_path, keys)
+    variant = single_variant(run.variant)
+    ipc = [s.get(k) for k in keys]
+    ref = [alone.get((name, run.core, run.jeu_donnees, run.l1_size, variant)) for name in names]
+    return names, ipc, ref
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Weighted speedup of the multi-core sweep runs")
+    ap.add_argument("--root", default=str(REPO_ROOT), help="Repository root holding */runs_L1_*")
+    ap.add_argument("--cores", help="Comma-separated cores (default: all found)")
+    ap.add_argument("--catalog", help="Read runs and stats from this catalog (analysis.catalog) instead")
+    ap.add_argument("--out", default="multicore_L1.csv", help="CSV output filename")
+    args = ap.parse_args()
+
+    cores = args.cores.split(",") if args.cores else None
+    if args.catalog:
+        catalog = Catalog(Path(args.catalog), Path(args.root))
+        runs, read = catalog.runs(cores), catalog.read_stats
+    else:
+        runs, read = find_runs(Path(args.root), cores), read_stats
+    multi = [r for r in runs if MC_PREFIX in r.variant]
+    if not multi:
+        raise SystemExit(f"No multi-core runs (variante {MC_PREFIX}...) under {args.root}")
+    alone = alone_ipc(runs, read)
+
+    with open(args.out, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["core", "programme", "jeu_donnees", "L1_taille", "variante", "cores", "benchmarks",
+                    "ipc_per_core", "ipc_sum", "weighted_speedup", "cpu0_ipc", "cpu0_ipc_alone", "cpu0_slowdown"])
+        for run in multi:
+            names, ipc, ref = speedups(run, alone, read)
+            complete = bool(names) and None not in ipc
+            ws = sum(i / r for i, r in zip(ipc, ref)) if complete and all(ref) else None
+            cpu0, ref0 = (ipc[0], ref[0]) if names else (None, None)
+            w.writerow([run.core, run.programme, run.jeu_donnees, run.l1_size, run.variant, len(names),
+                        "+".join(names), "+".join(fmt(i) for i in ipc),
+                        fmt(sum(ipc) if complete else None), fmt(ws),
+                        fmt(cpu0), fmt(ref0), fmt(ref0 / cpu0 if ref0 and cpu0 else None)])
+    print("CSV written:", args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
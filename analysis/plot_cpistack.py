@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import math
+from pathlib import Path
+
+try:
+    import matplotlib.pyplot as plt
+except Exception:
+    print("ERROR: matplotlib no esta instalado. Instala python3-matplotlib para usar este script.")
+    raise SystemExit(1)
+
+CATEGORIES = ["cpi_base", "cpi_icache", "cpi_dcache", "cpi_l2", "cpi_branch", "cpi_rob_lsq", "cpi_other"]
+LABELS = {
+    "cpi_base": "base",
+    "cpi_icache": "I-cache",
+    "cpi_dcache": "D-cache",
+    "cpi_l2": "L2/DRAM",
+    "cpi_branch": "bad speculation",
+    "cpi_rob_lsq": "ROB/LSQ full",
+    "cpi_other": "other",
+}
+HATCHES = {"small": "", "large": "//"}
+
+
+def parse_size(label: str) -> float:
+    s = label.strip()
+    lower = s.lower()
+    for suffix, factor in (("kb", 1.0), ("mb", 1024.0), ("gb", 1024.0 * 1024.0)):
+        if lower.endswith(suffix):
+            try:
+                return float(lower[: -len(suffix)]) * factor
+            except ValueError:
+                return float("inf")
+    try:
+        return float(lower)
+    except ValueError:
+        return float("inf")
+
+
+def parse_float(value: str | None) -> float | None:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def order_datasets(datasets: list[str]) -> list[str]:
+    preferred = ["small", "large"]
+    ordered = [d for d in preferred if d in datasets]
+    rest = [d for d in datasets if d not in ordered]
+    return ordered + sorted(rest)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Barras apiladas de la pila de CPI por L1_taille")
+    parser.add_argument("--csv", default="cpistack_L1.csv", help="CSV generado por analysis.cpistack")
+    parser.add_argument("--outdir", help="Directorio de salida para las imagenes (por defecto el del CSV)")
+    parser.add_argument("--show", action="store_true", help="Mostrar las figuras en pantalla")
+    args = parser.parse_args()
+
+    csv_path = Path(args.csv)
+    outdir = Path(args.outdir) if args.outdir else csv_path.resolve().parent
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    with csv_path.open(newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+        if not rows:
+            raise SystemExit("El CSV esta vacio: " + str(csv_path))
+
+    groups: dict[tuple[str, str, str], list[dict[str, str]]] = {}
+    for r in rows:
+        groups.setdefault((r.get("programme", ""), r.get("core", ""), r.get("variante", "")), []).append(r)
+
+    colors = plt.rcParams["axes.prop_cycle"].by_key()["color"]
+
+    for (program, core, variant), g_rows in sorted(groups.items()):
+        datasets = order_datasets(sorted({r["jeu_donnees"] for r in g_rows if r.get("jeu_donnees")}))
+        l1_sizes = sorted({r["L1_taille"] for r in g_rows if r.get("L1_taille")}, key=parse_size)
+        if not datasets or not l1_sizes:
+            continue
+        by_key = {(r["jeu_donnees"], r["L1_taille"]): r for r in g_rows}
+
+        x = list(range(len(l1_sizes)))
+        n_datasets = len(datasets)
+        width = 0.8 / n_datasets
+
+        fig, ax = plt.subplots()
+        for j, ds in enumerate(datasets):
+            offset = (j - (n_datasets - 1) / 2.0) * width
+            xs = [i + offset for i in x]
+            bottom = [0.0] * len(l1_sizes)
+            for k, cat in enumerate(CATEGORIES):
+                ys = []
+                for l1 in l1_sizes:
+                    v = parse_float(by_key.get((ds, l1), {}).get(cat))
+                    ys.append(v if v is not None else math.nan)
+                label = LABELS[cat] if j == 0 else None
+                ax.bar(xs, ys, width=width, bottom=bottom, color=colors[k % len(colors)],
+                       hatch=HATCHES.get(ds, ""), edgecolor="white", label=label)
+                bottom = [b + (y if not math.isnan(y) else 0.0) for b, y in zip(bottom, ys)]
+            ax.bar_label(
+                ax.containers[-1],
+                labels=[ds if n_datasets > 1 else "" for _ in l1_sizes],
+                padding=3,
+                fontsize=8,
+                rotation=90,
+            )
+        ymax = max((float(r.get("cpi") or 0.0) for r in g_rows), default=1.0)
+        ax.set_ylim(0.0, max(ymax * 1.2, 1e-6))
+        ax.set_xticks(x)
+        ax.set_xticklabels(l1_sizes)
+        ax.set_xlabel("L1_taille")
+        ax.set_ylabel("CPI")
+        name = f"{program}_{core}_{variant}" if variant else f"{program}_{core}"
+        ax.set_title(f"{name.replace('_', ' ')}: pila de CPI por L1_taille")
+        ax.legend(fontsize=8)
+        fig.tight_layout()
+        out_file = outdir / f"cpistack_{name}_bar.png"
+        fig.savefig(out_file, dpi=150)
+        if args.show:
+            plt.show()
+        plt.close(fig)
+        print("Grafico guardado en:", out_file)
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
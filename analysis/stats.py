@@ -0,0 +1,273 @@
+"""Shared stats reader and discovery of the L1 sweep run folders.
+
+A run's stats may be plain text (stats.txt), gzip-compressed text
+(stats.txt.gz, --stats-format gzip or gem5 --stats-file=stats.txt.gz) or
+gem5's HDF5 output (stats.h5, --stats-format hdf5). read_stats() takes any of
+them; text is streamed line by line, gzip decompressed on the fly.
+
+Run folders may also be packed into a single runs_L1_<core>.pack file
+(analysis.archive): paths below it are read from the archive in place, and
+find_runs() lists its runs unless the unpacked folder is there as well.
+
+HDF5 needs h5py. gem5's HDF5 backend stores scalars and vectors only (no
+distributions) and no vector totals: ``name::total`` is rebuilt as the sum of
+the elements, and for the cache miss rates and average latencies as the ratio
+of the corresponding totals (demandMisses::total / demandAccesses::total, ...).
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import io
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Iterable, Iterator
+
+from cachemodel.common import parse_size
+
+from . import archive
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+LINE_RE = re.compile(r"^(\S+)\s+([0-9eE+\-\.]+|nan|inf)")
+# <programme>_<jeu>_L1_<taille>, then an optional variant of the configuration
+# swept on top of the L1 size (e.g. _pf-stride-bop for the prefetchers).
+RUN_DIR_RE = re.compile(r"^(?P<programme>[A-Za-z0-9]+)_(?P<jeu>[A-Za-z0-9]+)_L1_(?P<l1>[0-9]+[kKmM]?B)"
+                        r"(?:_(?P<variant>[A-Za-z0-9.-]+(?:_[A-Za-z0-9.-]+)*))?$")
+CORE_DIR_RE = re.compile(r"^runs_L1_(?P<core>\w+)(?:\.pack)?$")
+BEGIN_MARKER = "---------- Begin"
+END_MARKER = "---------- End"
+
+# Stats file names of a run folder, in order of preference.
+STATS_FILES = ("stats.txt", "stats.txt.gz", "stats.h5")
+# gem5 cache formulas (demandMissRate, overallAvgMissLatency, ReadReq.mshrMissRate, ...)
+# whose vector total is a ratio of two other totals rather than a sum.
+RATIO_RE = re.compile(r"^(\w*?)(AvgMshrMissLatency|AvgMissLatency|MshrMissRate|MissRate"
+                      r"|avgMshrMissLatency|avgMissLatency|mshrMissRate|missRate)$")
+RATIO_PARTS = {
+    "AvgMshrMissLatency": ("MshrMissLatency", "MshrMisses"),
+    "AvgMissLatency": ("MissLatency", "Misses"),
+    "MshrMissRate": ("MshrMisses", "Accesses"),
+    "MissRate": ("Misses", "Accesses"),
+}
+RATIO_PARTS.update({k[0].lower() + k[1:]: v for k, v in RATIO_PARTS.items()})
+
+
+@dataclass(frozen=True)
+class RunInfo:
+    programme: str
+    core: str
+    jeu_donnees: str
+    l1_size: str
+    path: Path
+    variant: str = ""
+
+    @property
+    def stats_path(self) -> Path:
+        return stats_file(self.path)
+
+    @property
+    def workload(self) -> str:
+        return f"{self.programme}/{self.jeu_donnees}"
+
+
+def has_file(path: Path) -> bool:
+    """True for a file on disk or inside a run archive."""
+    path = Path(path)
+    return path.is_file() or archive.member(path) is not None
+
+
+def open_run_file(path: Path, binary: bool = False) -> IO:
+    """Open a file of a run folder, on disk or inside a run archive."""
+    path = Path(path)
+    if not path.is_file() and archive.locate(path) is not None:
+        f: IO = io.BytesIO(archive.read_bytes(path))
+        return f if binary else io.TextIOWrapper(f, encoding="utf-8", errors="ignore")
+    if binary:
+        return path.open("rb")
+    return path.open(encoding="utf-8", errors="ignore")
+
+
+def stats_file(run_dir: Path) -> Path:
+    """The stats file of a run folder (stats.txt when there is none yet)."""
+    run_dir = Path(run_dir)
+    for name in STATS_FILES:
+        if has_file(run_dir / name):
+            return run_dir / name
+    return run_dir / STATS_FILES[0]
+
+
+def stats_lines(stats_path: Path) -> Iterator[str]:
+    """Lines of a text stats file, gzip-compressed or not."""
+    stats_path = Path(stats_path)
+    if stats_path.suffix == ".gz":
+        f = gzip.open(open_run_file(stats_path, binary=True), "rt", encoding="utf-8", errors="ignore")
+    else:
+        f = open_run_file(stats_path)
+    with f:
+        try:
+            yield from f
+        except EOFError:
+            # Stream cut short (gem5 still writing, or killed): keep what was read.
+            return
+
+
+def read_stats(stats_path: Path, keys: Iterable[str] | None = None) -> dict[str, float]:
+    """Return key -> value for the first statistics dump (all keys if keys is None)."""
+    wanted = set(keys) if keys is not None else None
+    if Path(stats_path).suffix == ".h5":
+        return _read_stats_h5(Path(stats_path), wanted)
+    values: dict[str, float] = {}
+    for line in stats_lines(stats_path):
+        if line.startswith(END_MARKER):
+            break
+        m = LINE_RE.match(line)
+        if not m:
+            continue
+        key = m.group(1)
+        if wanted is not None and key not in wanted:
+            continue
+        try:
+            values[key] = float(m.group(2))
+        except ValueError:
+            pass
+    return values
+
+
+def iter_dumps(lines: Iterable[str], keys: Iterable[str] | None = None) -> Iterator[dict[str, float]]:
+    """Yield key -> value for each statistics dump of a text stream as soon as it ends.
+
+    Works on a pipe or FIFO fed by gem5: a dump is parsed line by line and
+    handed over at its end marker, without waiting for the stream to close.
+    """
+    wanted = set(keys) if keys is not None else None
+    values: dict[str, float] = {}
+    for line in lines:
+        if line.startswith(BEGIN_MARKER):
+            values = {}
+            continue
+        if line.startswith(END_MARKER):
+            yield values
+            values = {}
+            continue
+        m = LINE_RE.match(line)
+        if not m or (wanted is not None and m.group(1) not in wanted):
+            continue
+        try:
+            values[m.group(1)] = float(m.group(2))
+        except ValueError:
+            pass
+
+
+def _ratio_total(stat: str, totals: dict[str, float]) -> float | None:
+    """::total of a gem5 cache ratio formula, rebuilt from the totals it divides."""
+    base, _, leaf = stat.rpartition(".")
+    m = RATIO_RE.match(leaf)
+    if not m:
+        return None
+    prefix, kind = m.group(1), m.group(2)
+    num_leaf, den_leaf = RATIO_PARTS[kind]
+    if not prefix:
+        num_leaf, den_leaf = num_leaf[0].lower() + num_leaf[1:], den_leaf[0].lower() + den_leaf[1:]
+    num = totals.get(f"{base}.{prefix}{num_leaf}")
+    den = totals.get(f"{base}.{prefix}{den_leaf}")
+    if num is None or not den:
+        return None
+    return num / den
+
+
+def _read_stats_h5(stats_path: Path, wanted: set[str] | None) -> dict[str, float]:
+    try:
+        import h5py
+    except ImportError:
+        raise RuntimeError(f"h5py is needed to read {stats_path} (pip install h5py)") from None
+
+    values: dict[str, float] = {}
+    totals: dict[str, float] = {}
+    ratios: list[str] = []
+
+    def visit(name: str, obj: object) -> None:
+        if not isinstance(obj, h5py.Dataset) or obj.ndim not in (1, 2) or not len(obj):
+            return
+        stat = name.strip("/").replace("/", ".")
+        first = obj[0]  # first dump
+        if obj.ndim == 1:
+            values[stat] = float(first)
+            return
+        subnames = [s.decode() if isinstance(s, bytes) else str(s) for s in obj.attrs.get("subnames", [])]
+        if len(subnames) != len(first):
+            subnames = [str(i) for i in range(len(first))]
+        for sub, v in zip(subnames, first):
+            values[f"{stat}::{sub}"] = float(v)
+        if RATIO_RE.match(stat.rpartition(".")[2]):
+            ratios.append(stat)
+        else:
+            totals[stat] = float(sum(first))
+
+    with open_run_file(stats_path, binary=True) as raw, h5py.File(raw, "r") as f:
+        f.visititems(visit)
+    for stat, total in totals.items():
+        values[f"{stat}::total"] = total
+    for stat in ratios:
+        total = _ratio_total(stat, totals)
+        if total is not None:
+            values[f"{stat}::total"] = total
+    if wanted is not None:
+        values = {k: v for k, v in values.items() if k in wanted}
+    return values
+
+
+def run_info(run_dir: Path) -> RunInfo | None:
+    """RunInfo of a <programme>/runs_L1_<core>/<programme>_<jeu>_L1_<taille> folder (None otherwise)."""
+    run_dir = Path(run_dir)
+    m_core = CORE_DIR_RE.match(run_dir.parent.name)
+    m_run = RUN_DIR_RE.match(run_dir.name)
+    if not m_core or not m_run:
+        return None
+    return RunInfo(m_run.group("programme"), m_core.group("core"), m_run.group("jeu"), m_run.group("l1"), run_dir,
+                   m_run.group("variant") or "")
+
+
+def sort_runs(runs: Iterable[RunInfo]) -> list[RunInfo]:
+    return sorted(runs, key=lambda r: (r.programme, r.core, r.variant, r.jeu_donnees, parse_size(r.l1_size)))
+
+
+def find_runs(root: Path = REPO_ROOT, cores: Iterable[str] | None = None) -> list[RunInfo]:
+    """All <programme>/runs_L1_<core>/<programme>_<jeu>_L1_<taille> folders holding stats.
+
+    Runs packed in <programme>/runs_L1_<core>.pack are included when their
+    folder is not also present unpacked.
+    """
+    wanted = set(cores) if cores is not None else None
+    runs: dict[tuple[str, str, str, str, str], RunInfo] = {}
+    run_dirs = sorted(p for p in Path(root).glob("*/runs_L1_*/*") if p.is_dir())
+    for pack in sorted(Path(root).glob(f"*/runs_L1_*{archive.SUFFIX}")):
+        if pack.is_file():
+            run_dirs += archive.run_dirs(pack)
+    for run_dir in run_dirs:
+        run = run_info(run_dir)
+        if run is None or (wanted is not None and run.core not in wanted):
+            continue
+        key = (run.programme, run.core, run.jeu_donnees, run.l1_size, run.variant)
+        if key not in runs and has_file(run.stats_path):
+            runs[key] = run
+    return sort_runs(runs.values())
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Print stat values from stats.txt, stats.txt.gz or stats.h5")
+    ap.add_argument("stats", help="Stats file, or a run folder holding one")
+    ap.add_argument("keys", nargs="+", help="Stat names (one value per line, empty if missing)")
+    args = ap.parse_args()
+
+    path = Path(args.stats)
+    values = read_stats(path if has_file(path) else stats_file(path), args.keys)
+    for key in args.keys:
+        v = values.get(key)
+        print("" if v is None else str(int(v)) if v.is_integer() else repr(v))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
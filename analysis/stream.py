@@ -0,0 +1,106 @@
+"""Aggregate gem5 stats straight from a pipe or FIFO into a metrics table.
+
+    mkfifo /tmp/run/stats.fifo
+    python -m analysis.stream /tmp/run/stats.fifo --out metrics.csv \
+        --field jeu_donnees=small --field L1_taille=4kB &
+    gem5.opt -d /tmp/run --dump-config= --json-config= --dot-config= \
+        --stats-file=/tmp/run/stats.fifo CortexA7L1.py ...
+
+Each dump is parsed as gem5 writes it and reduced at once to one CSV row:
+the --field values followed by the metrics of a metrics.ini section
+(metrics_L1 by default, the collect_metrics.py columns). Nothing else is
+kept, so a sweep run this way leaves no run folder, config.* or stats.txt
+behind. Rows are appended (the header is written when the file is new), so
+several runs, or several sweeps at once, can share one table. The L1 sweep
+scripts do all of this when STATS_PIPE=1.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import io
+import os
+import sys
+from pathlib import Path
+from typing import Iterable, Iterator, Sequence
+
+from .metrics import METRICS_FILE, MetricSet, StatTable, fmt_value, load_metrics
+from .stats import iter_dumps
+
+
+def metric_rows(lines: Iterable[str], metrics: MetricSet) -> Iterator[list[str]]:
+    """Metric values of each dump in the stream, formatted as in collect_metrics.py."""
+    for dump in iter_dumps(lines):
+        table = StatTable.from_dicts([{k: v for k, v in dump.items() if metrics.wants(k)}])
+        values = metrics.evaluate(table)
+        yield [fmt_value(values[name][0]) for name in metrics.names]
+
+
+def parse_fields(specs: Sequence[str]) -> list[tuple[str, str]]:
+    fields = []
+    for spec in specs:
+        name, sep, value = spec.partition("=")
+        if not sep or not name:
+            raise ValueError(f"--field expects name=value, got {spec!r}")
+        fields.append((name, value))
+    return fields
+
+
+def append_row(out: Path, header: list[str], row: list[str]) -> None:
+    """Append one row with a single write, writing the header first if the file is new."""
+    if out.is_file() and out.stat().st_size:
+        with out.open(newline="", encoding="utf-8") as f:
+            existing = next(csv.reader(f), [])
+        if existing != header:
+            raise ValueError(f"{out} has columns {existing}, expected {header}")
+        lines = [row]
+    else:
+        lines = [header, row]
+    buf = io.StringIO()
+    csv.writer(buf).writerows(lines)
+    fd = os.open(out, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    try:
+        os.write(fd, buf.getvalue().encode("utf-8"))
+    finally:
+        os.close(fd)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Turn gem5 stats read from a pipe/FIFO into metric rows")
+    ap.add_argument("source", help="FIFO or file gem5 writes its stats to ('-' for stdin)")
+    ap.add_argument("--out", required=True, help="CSV table the rows are appended to")
+    ap.add_argument("--field", action="append", default=[],
+                    help="Leading column as name=value, e.g. L1_taille=4kB (repeatable)")
+    ap.add_argument("--metrics", default=str(METRICS_FILE), help="Metrics definition file")
+    ap.add_argument("--set", default="metrics_L1", help="Section of the definition file to evaluate")
+    args = ap.parse_args()
+
+    try:
+        fields = parse_fields(args.field)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    metrics = load_metrics(Path(args.metrics), args.set)
+    header = [name for name, _ in fields] + metrics.names
+    out = Path(args.out)
+
+    # Opening a FIFO blocks until gem5 opens it for writing.
+    f = sys.stdin if args.source == "-" else open(args.source, encoding="utf-8", errors="ignore")
+    n = 0
+    try:
+        for row in metric_rows(f, metrics):
+            try:
+                append_row(out, header, [value for _, value in fields] + row)
+            except ValueError as e:
+                raise SystemExit(str(e))
+            n += 1
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    if not n:
+        raise SystemExit(f"No complete statistics dump read from {args.source}")
+    print(f"{n} row(s) appended to {out}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
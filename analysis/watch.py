@@ -0,0 +1,288 @@
+"""Keep the metrics CSVs, the run catalog and the bar plots current during a sweep.
+
+    python -m analysis.watch [--catalog runs_catalog.sqlite] [--poll 5] [--no-plots]
+
+Watches the stats files of */runs_L1_*/* (stats.txt, .txt.gz or .h5) with
+inotify (through libc, Linux only) and falls back to polling their size/mtime
+where inotify is not available or --poll is given. A stats file is picked up once it is complete (its
+"End Simulation Statistics" marker has been written) and has changed since
+the last pass; only those runs are parsed. For each one:
+
+* the catalog, when --catalog is given, ingests the run (Catalog.update);
+* its row in <programme>/plots_L1_<core>/metrics_L1_<core>_<programme>.csv
+  is replaced or inserted, computed from the same metrics.ini section as
+  collect_metrics.py;
+* plot_bars.py of that folder redraws only the metrics whose values moved.
+
+Runs already present when the watcher starts are taken as the baseline;
+rebuild with collect_metrics.py (or catalog update) if they are stale.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import ctypes
+import ctypes.util
+import os
+import select
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from cachemodel.common import parse_size
+
+from .catalog import Catalog
+from .metrics import METRICS_FILE, MetricSet, StatTable, fmt_value, load_metrics
+from .stats import END_MARKER, REPO_ROOT, RunInfo, find_runs, read_stats, sort_runs, stats_lines
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE_SELF = 0x400
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_DELETE_SELF
+
+
+class Inotify:
+    """Minimal inotify wrapper used only as a wake-up signal for a rescan."""
+
+    def __init__(self) -> None:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add = libc.inotify_add_watch
+        self._add.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watched: dict[Path, int] = {}
+
+    def watch(self, path: Path) -> None:
+        """Watch a directory; a folder removed and recreated by the sweep is watched again."""
+        try:
+            inode = path.stat().st_ino
+        except OSError:
+            return
+        if self.watched.get(path) == inode:
+            return
+        if self._add(self.fd, os.fsencode(str(path)), WATCH_MASK) < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_add_watch {path}: {os.strerror(err)}")
+        self.watched[path] = inode
+
+    def wait(self, timeout: float) -> bool:
+        """Block until an event arrives (True) or the timeout expires (False)."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        while True:
+            try:
+                if not os.read(self.fd, 65536):
+                    break
+            except BlockingIOError:
+                break
+        return True
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def is_complete(stats_path: Path) -> bool:
+    """True once gem5 has written the end marker of the (first) dump.
+
+    gem5 writes stats.h5 in one go at the dump, so it is taken as complete.
+    """
+    if stats_path.suffix == ".h5":
+        return stats_path.is_file()
+    if stats_path.suffix == ".gz":
+        try:
+            return any(line.startswith(END_MARKER) for line in stats_lines(stats_path))
+        except (OSError, ValueError):
+            return False
+    try:
+        with stats_path.open("rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - 8192, 0))
+            tail = f.read()
+    except OSError:
+        return False
+    return END_MARKER.encode() in tail
+
+
+def _stamp(path: Path) -> tuple[int, int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def metrics_csv(run: RunInfo) -> Path:
+    """The collect_metrics.py output this run belongs to."""
+    return run.path.parent.parent / f"plots_L1_{run.core}" / f"metrics_L1_{run.core}_{run.programme}.csv"
+
+
+def update_metrics_csv(csv_path: Path, runs: list[RunInfo], metrics: MetricSet, read=read_stats) -> set[str]:
+    """Replace or insert the rows of ``runs``; return the metrics whose values changed."""
+    values = metrics.evaluate(StatTable.load([r.stats_path for r in runs], metrics, read))
+
+    rows: list[dict[str, str]] = []
+    header: list[str] = []
+    if csv_path.is_file():
+        with csv_path.open(newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            rows = list(reader)
+            header = list(reader.fieldnames or [])
+    # Keep the variante column of a variant sweep; add it with the first variant run.
+    variants = "variante" in header or any(r.variant for r in runs)
+    fields = ["jeu_donnees", "L1_taille"] + ["variante"] * variants + metrics.names
+    by_key = {(r.get("jeu_donnees", ""), r.get("L1_taille", ""), r.get("variante") or ""): r for r in rows}
+
+    changed: set[str] = set()
+    for i, run in enumerate(runs):
+        new = {"jeu_donnees": run.jeu_donnees, "L1_taille": run.l1_size}
+        if variants:
+            new["variante"] = run.variant
+        new.update({m: fmt_value(values[m][i]) for m in metrics.names})
+        key = (run.jeu_donnees, run.l1_size, run.variant)
+        old = by_key.get(key)
+        if old is None:
+            rows.append(new)
+            by_key[key] = new
+            changed.update(m for m in metrics.names if new[m])
+        else:
+            changed.update(m for m in metrics.names if old.get(m, "") != new[m])
+            old.clear()
+            old.update(new)
+
+    # Data sets keep the order they first appear in (small before large in the sweeps).
+    ds_order: dict[str, int] = {}
+    for r in rows:
+        ds_order.setdefault(r["jeu_donnees"], len(ds_order))
+    rows.sort(key=lambda r: (r.get("variante") or "", ds_order[r["jeu_donnees"]], parse_size(r["L1_taille"])))
+
+    csv_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = csv_path.with_name(csv_path.name + ".tmp")
+    with tmp.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        w.writeheader()
+        w.writerows(rows)
+    os.replace(tmp, csv_path)
+    return changed
+
+
+def redraw(csv_path: Path, changed: set[str]) -> None:
+    script = csv_path.parent / "plot_bars.py"
+    if not script.is_file():
+        print("No plot_bars.py next to", csv_path, "- plots not redrawn")
+        return
+    cmd = [sys.executable, str(script), "--csv", str(csv_path)]
+    for m in sorted(changed):
+        cmd += ["--metric", m]
+    subprocess.run(cmd, check=False, stdout=subprocess.DEVNULL)
+
+
+class Watcher:
+    def __init__(self, root: Path, metrics: MetricSet, catalog: Catalog | None, plots: bool) -> None:
+        self.root = root
+        self.metrics = metrics
+        self.catalog = catalog
+        self.plots = plots
+        self.seen: dict[Path, tuple[int, int]] = {}
+
+    def scan(self) -> list[RunInfo]:
+        """Complete stats files that are new or changed since the last scan."""
+        fresh = []
+        for run in find_runs(self.root):
+            stamp = _stamp(run.stats_path)
+            if stamp is None or self.seen.get(run.path) == stamp:
+                continue
+            if not is_complete(run.stats_path):
+                continue
+            self.seen[run.path] = stamp
+            fresh.append(run)
+        return fresh
+
+    def process(self, runs: list[RunInfo]) -> None:
+        read = read_stats
+        if self.catalog is not None:
+            self.catalog.update(runs)
+            read = self.catalog.read_stats
+        groups: dict[Path, list[RunInfo]] = {}
+        for run in sort_runs(runs):
+            groups.setdefault(metrics_csv(run), []).append(run)
+        for csv_path, group in groups.items():
+            changed = update_metrics_csv(csv_path, group, self.metrics, read)
+            names = ", ".join("/".join(filter(None, (r.jeu_donnees, r.l1_size, r.variant))) for r in group)
+            print(f"{csv_path}: updated {names}; changed: {', '.join(sorted(changed)) or 'none'}")
+            if self.plots and changed:
+                redraw(csv_path, changed)
+
+    def watch_dirs(self) -> list[Path]:
+        dirs = [self.root]
+        dirs += [p for p in self.root.iterdir() if p.is_dir() and not p.name.startswith(".")]
+        for core_dir in self.root.glob("*/runs_L1_*"):
+            dirs.append(core_dir)
+            dirs += [p for p in core_dir.iterdir() if p.is_dir()]
+        return dirs
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Update metrics CSVs, catalog and plots as sweep runs finish")
+    ap.add_argument("--root", default=str(REPO_ROOT), help="Repository root holding */runs_L1_*")
+    ap.add_argument("--metrics", default=str(METRICS_FILE), help="Metrics definition file")
+    ap.add_argument("--set", default="metrics_L1", help="Section of the definition file to evaluate")
+    ap.add_argument("--catalog", help="Also keep this run catalog (analysis.catalog) up to date")
+    ap.add_argument("--poll", type=float, metavar="SECONDS",
+                    help="Poll every SECONDS instead of using inotify")
+    ap.add_argument("--settle", type=float, default=1.0,
+                    help="Seconds to let a burst of writes finish before rescanning")
+    ap.add_argument("--no-plots", action="store_true", help="Do not redraw the bar plots")
+    args = ap.parse_args()
+
+    root = Path(args.root).resolve()
+    catalog = Catalog(Path(args.catalog), root) if args.catalog else None
+    watcher = Watcher(root, load_metrics(Path(args.metrics), args.set), catalog, not args.no_plots)
+    watcher.scan()
+    if catalog is not None:
+        catalog.update()
+    print(f"Watching {root} ({len(watcher.seen)} runs already done)")
+
+    notify = None
+    if args.poll is None:
+        try:
+            notify = Inotify()
+        except (OSError, AttributeError) as e:
+            print("inotify not available, polling every 5 s:", e)
+    interval = args.poll if args.poll is not None else 5.0
+
+    try:
+        while True:
+            if notify is not None:
+                try:
+                    for d in watcher.watch_dirs():
+                        notify.watch(d)
+                except OSError as e:
+                    print("inotify watch failed, polling every 5 s:", e)
+                    notify.close()
+                    notify = None
+                    continue
+                # Wake up on events; the timeout only guards against missed ones.
+                if notify.wait(60.0):
+                    time.sleep(args.settle)
+            else:
+                time.sleep(interval)
+            runs = watcher.scan()
+            if runs:
+                watcher.process(runs)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if notify is not None:
+            notify.close()
+        if catalog is not None:
+            catalog.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,9 +1,14 @@
 import argparse
 import os
-import re
+import sys
 from dataclasses import dataclass
 from typing import Dict, List
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis.interval import core_mlp  # noqa: E402
+from analysis.stats import REPO_ROOT, find_runs, read_stats, stats_file  # noqa: E402
+
 REQUIRED_KEYS = [
     "simTicks",
     "simFreq",
@@ -17,11 +22,12 @@ REQUIRED_KEYS = [
     "system.l2cache.demandMisses::total",
     "system.l2cache.demandMissLatency::total",
     "system.l2cache.demandAvgMissLatency::total",
+    # MLP / overlap accounting
+    "system.l2cache.demandMshrMissLatency::cpu.data",
+    "system.cpu.rename.blockCycles",
+    "system.cpu.iew.blockCycles",
 ]
 
-LINE_RE = re.compile(r"^(?P<key>\S+)\s+(?P<val>[-+0-9.eE]+)\s*(#.*)?$")
-
-
 @dataclass
 class ResultRow:
     case: str
@@ -54,21 +60,19 @@ class ResultRow:
     pct_cpi_l2_miss: float
     pct_cpi_l1_only: float
 
+    # MLP-aware (overlap-corrected) accounting
+    mlp: float
+    delta_cpi_mem_mlp: float
+    delta_cpi_l2_mlp: float
+    delta_cpi_l1_only_mlp: float
+    pct_cpi_mem_mlp: float
+    pct_cpi_l2_mlp: float
+    pct_cpi_l1_only_mlp: float
+
 
 def parse_stats(stats_path: str) -> Dict[str, float]:
-    """Parse stats.txt and return only the needed key->value entries."""
-    found: Dict[str, float] = {}
-    with open(stats_path, "r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            line = line.strip()
-            if not line or line.startswith("----"):
-                continue
-            m = LINE_RE.match(line)
-            if not m:
-                continue
-            key = m.group("key")
-            if key in REQUIRED_KEYS:
-                found[key] = float(m.group("val"))
+    """Parse stats.txt (or stats.txt.gz / stats.h5) and return only the needed key->value entries."""
+    found = read_stats(stats_path, REQUIRED_KEYS)
 
     missing = [k for k in REQUIRED_KEYS if k not in found]
     if missing:
@@ -76,7 +80,7 @@ def parse_stats(stats_path: str) -> Dict[str, float]:
     return found
 
 
-def compute_one(case: str, stats_path: str) -> ResultRow:
+def compute_one(case: str, stats_path: str, mlp: float) -> ResultRow:
     """Compute all derived metrics for one run."""
     s = parse_stats(stats_path)
 
@@ -123,6 +127,25 @@ def compute_one(case: str, stats_path: str) -> ResultRow:
     pct_cpi_l2_miss = 100.0 * (delta_cpi_l2_miss / cpi)
     pct_cpi_l1_only = 100.0 * (delta_cpi_l1_only / cpi)
 
+    # MLP-aware split: overlapping misses are charged once, i.e. the miss
+    # latency is divided by the MLP of the core (analysis.interval.core_mlp,
+    # fitted on its runs_L1 sweep). The L2 part only counts primary (MSHR) data
+    # misses. The result is capped by the cycles the back-end actually spent
+    # blocked (rename + IEW), which bounds what a bigger L1 can recover.
+    l2_mshr_cycles_total = s["system.l2cache.demandMshrMissLatency::cpu.data"] / ticks_per_cycle
+    backend_stall_cycles = s["system.cpu.rename.blockCycles"] + s["system.cpu.iew.blockCycles"]
+
+    mem_cycles_mlp = min(l1_miss_lat_cycles_total / mlp, backend_stall_cycles)
+    l2_cycles_mlp = min(l2_mshr_cycles_total / mlp, mem_cycles_mlp)
+
+    delta_cpi_mem_mlp = mem_cycles_mlp / numInsts
+    delta_cpi_l2_mlp = l2_cycles_mlp / numInsts
+    delta_cpi_l1_only_mlp = max(delta_cpi_mem_mlp - delta_cpi_l2_mlp, 0.0)
+
+    pct_cpi_mem_mlp = 100.0 * (delta_cpi_mem_mlp / cpi)
+    pct_cpi_l2_mlp = 100.0 * (delta_cpi_l2_mlp / cpi)
+    pct_cpi_l1_only_mlp = 100.0 * (delta_cpi_l1_only_mlp / cpi)
+
     return ResultRow(
         case=case,
         cpi=cpi,
@@ -148,6 +171,13 @@ def compute_one(case: str, stats_path: str) -> ResultRow:
         pct_cpi_mem_total=pct_cpi_mem_total,
         pct_cpi_l2_miss=pct_cpi_l2_miss,
         pct_cpi_l1_only=pct_cpi_l1_only,
+        mlp=mlp,
+        delta_cpi_mem_mlp=delta_cpi_mem_mlp,
+        delta_cpi_l2_mlp=delta_cpi_l2_mlp,
+        delta_cpi_l1_only_mlp=delta_cpi_l1_only_mlp,
+        pct_cpi_mem_mlp=pct_cpi_mem_mlp,
+        pct_cpi_l2_mlp=pct_cpi_l2_mlp,
+        pct_cpi_l1_only_mlp=pct_cpi_l1_only_mlp,
     )
 
 
@@ -160,6 +190,10 @@ def to_csv(rows: List[ResultRow]) -> str:
         "deltaCPI_mem_total", "pctCPI_mem_total",
         "deltaCPI_l1_only", "pctCPI_l1_only",
         "deltaCPI_l2_miss", "pctCPI_l2_miss",
+        "mlp",
+        "deltaCPI_mem_mlp", "pctCPI_mem_mlp",
+        "deltaCPI_l1_only_mlp", "pctCPI_l1_only_mlp",
+        "deltaCPI_l2_mlp", "pctCPI_l2_mlp",
     ]
     lines = [",".join(header)]
     for r in rows:
@@ -178,6 +212,13 @@ def to_csv(rows: List[ResultRow]) -> str:
             f"{r.pct_cpi_l1_only:.4f}",
             f"{r.delta_cpi_l2_miss:.8f}",
             f"{r.pct_cpi_l2_miss:.4f}",
+            f"{r.mlp:.4f}",
+            f"{r.delta_cpi_mem_mlp:.8f}",
+            f"{r.pct_cpi_mem_mlp:.4f}",
+            f"{r.delta_cpi_l1_only_mlp:.8f}",
+            f"{r.pct_cpi_l1_only_mlp:.4f}",
+            f"{r.delta_cpi_l2_mlp:.8f}",
+            f"{r.pct_cpi_l2_mlp:.4f}",
         ]))
     return "\n".join(lines)
 
@@ -190,13 +231,13 @@ def to_latex(rows: List[ResultRow]) -> str:
     out.append(r"\footnotesize")
     out.append(r"\setlength{\tabcolsep}{3pt}")
     out.append(r"\resizebox{\linewidth}{!}{%")
-    out.append(r"\begin{tabular}{ll|c|c|c|c}")
+    out.append(r"\begin{tabular}{l|c|c|c|c|c|c}")
     out.append(r"\hline")
-    out.append(r"\textbf{Case} & \textbf{CPI} & \textbf{\%CPI mem total} & \textbf{\%CPI L1-only (approx)} & \textbf{\%CPI L2-miss} \\")
+    out.append(r"\textbf{Case} & \textbf{CPI} & \textbf{\%CPI mem total} & \textbf{\%CPI L1-only (approx)} & \textbf{\%CPI L2-miss} & \textbf{MLP} & \textbf{\%CPI mem (MLP)} \\")
     out.append(r"\hline")
     for r in rows:
         out.append(
-            rf"{r.case} & {r.cpi:.3f} & {r.pct_cpi_mem_total:.2f}\% & {r.pct_cpi_l1_only:.2f}\% & {r.pct_cpi_l2_miss:.2f}\% \\"
+            rf"{r.case} & {r.cpi:.3f} & {r.pct_cpi_mem_total:.2f}\% & {r.pct_cpi_l1_only:.2f}\% & {r.pct_cpi_l2_miss:.2f}\% & {r.mlp:.2f} & {r.pct_cpi_mem_mlp:.2f}\% \\"
         )
     out.append(r"\hline")
     out.append(r"\end{tabular}")
@@ -220,21 +261,27 @@ def main() -> None:
             "m5bfA7_large",
             "m5bfA15_large",
         ],
-        help="Run folders to process (each must contain stats.txt).",
+        help="Run folders to process (each must contain stats.txt, stats.txt.gz or stats.h5).",
     )
     args = ap.parse_args()
 
+    mlps = core_mlp(find_runs(REPO_ROOT))
     rows: List[ResultRow] = []
     for d in args.dirs:
-        stats_path = os.path.join(args.base, d, "stats.txt")
+        stats_path = str(stats_file(os.path.join(args.base, d)))
         case_name = d.replace("m5", "")
-        rows.append(compute_one(case_name, stats_path))
+        core = "A15" if "A15" in d else "A7"
+        if core not in mlps:
+            raise SystemExit(f"No runs_L1_{core} sweep to fit the MLP of {core} on (see analysis.interval)")
+        rows.append(compute_one(case_name, stats_path, mlps[core]))
 
     csv_text = to_csv(rows)
     with open(args.out, "w", encoding="utf-8") as f:
         f.write(csv_text + "\n")
 
     print(csv_text)
+    print("\nMLP per core, from the interval fit on runs_L1_<core>: "
+          + ", ".join(f"{core} {mlp:.2f}" for core, mlp in sorted(mlps.items())))
     if args.latex:
         print("\n" + to_latex(rows))
 
@@ -4,24 +4,19 @@ from __future__ import annotations
 
 import argparse
 import csv
-import re
+import sys
 from pathlib import Path
 
-METRIC_KEYS = {
-    "system.cpu.cpi": "cpi",
-    "system.cpu.ipc": "ipc",
-    "system.cpu.numCycles": "numCycles",
-    "system.cpu.icache.overallMissRate::total": "icache_miss",
-    "system.cpu.dcache.overallMissRate::total": "dcache_miss",
-    "system.l2cache.overallMissRate::total": "l2_miss",
-    "system.cpu.branchPred.BTBHitRatio": "btb_hit_ratio",
-    "system.cpu.branchPred.condPredicted": "bp_cond_pred",
-    "system.cpu.branchPred.condIncorrect": "bp_cond_incorrect",
-    "system.cpu.branchPred.lookups": "bp_lookups",
-    "system.cpu.commit.branchMispredicts": "bp_mispredicts",
-}
+REPO_ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(REPO_ROOT))
 
-LINE_RE = re.compile(r"^(\S+)\s+([0-9eE+\-\.]+)")
+from analysis.catalog import Catalog  # noqa: E402
+from analysis.metrics import METRICS_FILE, StatTable, fmt_value, load_metrics  # noqa: E402
+from analysis.stats import has_file, read_stats, stats_file  # noqa: E402
+
+# Las columnas (y sus formulas sobre las estadisticas de gem5) se definen en
+# analysis/metrics.ini, seccion [metrics_L1].
+METRIC_SET = "metrics_L1"
 
 
 def pick_input_csv(dir_path: Path, csv_arg: str | None) -> Path:
@@ -35,32 +30,26 @@ def pick_input_csv(dir_path: Path, csv_arg: str | None) -> Path:
     return csvs[0]
 
 
-def read_stats(stats_path: Path) -> dict[str, float]:
-    values: dict[str, float] = {}
-    with stats_path.open(encoding="utf-8") as f:
-        for line in f:
-            m = LINE_RE.match(line)
-            if not m:
-                continue
-            key, val = m.group(1), m.group(2)
-            if key in METRIC_KEYS:
-                try:
-                    values[key] = float(val)
-                except ValueError:
-                    pass
-    return values
-
-
-def fmt(val: float | None) -> str:
-    if val is None:
-        return ""
-    return f"{val:.6f}".rstrip("0").rstrip(".")
+def resolve_run_dir(dossier: str, csv_dir: Path) -> Path:
+    """dossier_sortie as written by the sweep, or the same run folder in this checkout."""
+    outdir = Path(dossier)
+    if has_file(stats_file(outdir)) or not outdir.name:
+        return outdir
+    # Unpacked, or inside runs_L1_<core>.pack (analysis.archive).
+    for folder in (outdir.parent.name, outdir.parent.name + ".pack"):
+        local = csv_dir.parent / folder / outdir.name
+        if has_file(stats_file(local)):
+            return local
+    return outdir
 
 
 def main() -> int:
     parser = argparse.ArgumentParser(description="Extraer métricas desde stats.txt por L1")
     parser.add_argument("--csv", help="Ruta al CSV de resultados (por defecto resultats_*.csv)")
     parser.add_argument("--out", help="Ruta de salida CSV (por defecto metrics_*.csv)")
+    parser.add_argument("--metrics", default=str(METRICS_FILE), help="Fichero de definicion de metricas")
+    parser.add_argument("--set", default=METRIC_SET, help="Seccion del fichero de metricas a usar")
+    parser.add_argument("--catalog", help="Leer las estadisticas del catalogo (analysis.catalog) en vez de stats.txt")
     args = parser.parse_args()
 
     here = Path(__file__).resolve().parent
@@ -73,58 +62,38 @@ def main() -> int:
         rows = list(reader)
         if not rows:
             raise SystemExit("El CSV de entrada esta vacio: " + str(in_csv))
+        # Barridos con variantes de configuracion (prefetchers, ...): columna variante
+        id_fields = ["jeu_donnees", "L1_taille"] + [c for c in ("variante",) if c in (reader.fieldnames or [])]
+
+    metrics = load_metrics(Path(args.metrics), args.set)
+    catalog = Catalog(Path(args.catalog), REPO_ROOT) if args.catalog else None
+
+    runs = []
+    for r in rows:
+        run_dir = resolve_run_dir(r.get("dossier_sortie", ""), in_csv.resolve().parent)
+        if catalog is not None:
+            if run_dir not in catalog:
+                print("Aviso: la ejecucion no esta en el catalogo:", run_dir)
+                continue
+        elif not has_file(stats_file(run_dir)):
+            print("Aviso: no existe stats.txt en", run_dir / "stats.txt")
+            continue
+        runs.append((r, stats_file(run_dir)))
+
+    # Each stats file is parsed once; every metric is then evaluated over all runs.
+    read = catalog.read_stats if catalog is not None else read_stats
+    values = metrics.evaluate(StatTable.load([p for _, p in runs], metrics, read))
 
-    out_fields = [
-        "jeu_donnees",
-        "L1_taille",
-        "cpi",
-        "ipc",
-        "numCycles",
-        "icache_miss",
-        "dcache_miss",
-        "l2_miss",
-        "bp_cond_mispredict_rate",
-        "btb_hit_ratio",
-        "bp_mispredict_rate",
-    ]
+    out_fields = id_fields + metrics.names
 
     with out_csv.open("w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=out_fields)
         writer.writeheader()
 
-        for r in rows:
-            outdir = Path(r.get("dossier_sortie", ""))
-            stats_path = outdir / "stats.txt"
-            if not stats_path.is_file():
-                print("Aviso: no existe stats.txt en", stats_path)
-                continue
-
-            values = read_stats(stats_path)
-            cond_pred = values.get("system.cpu.branchPred.condPredicted")
-            cond_inc = values.get("system.cpu.branchPred.condIncorrect")
-            bp_cond_rate = None
-            if cond_pred and cond_pred > 0:
-                bp_cond_rate = cond_inc / cond_pred if cond_inc is not None else None
-
-            lookups = values.get("system.cpu.branchPred.lookups")
-            mispred = values.get("system.cpu.commit.branchMispredicts")
-            bp_rate = None
-            if lookups and lookups > 0:
-                bp_rate = mispred / lookups if mispred is not None else None
-
-            row_out = {
-                "jeu_donnees": r.get("jeu_donnees", ""),
-                "L1_taille": r.get("L1_taille", ""),
-                "cpi": fmt(values.get("system.cpu.cpi")),
-                "ipc": fmt(values.get("system.cpu.ipc")),
-                "numCycles": fmt(values.get("system.cpu.numCycles")),
-                "icache_miss": fmt(values.get("system.cpu.icache.overallMissRate::total")),
-                "dcache_miss": fmt(values.get("system.cpu.dcache.overallMissRate::total")),
-                "l2_miss": fmt(values.get("system.l2cache.overallMissRate::total")),
-                "bp_cond_mispredict_rate": fmt(bp_cond_rate),
-                "btb_hit_ratio": fmt(values.get("system.cpu.branchPred.BTBHitRatio")),
-                "bp_mispredict_rate": fmt(bp_rate),
-            }
+        for i, (r, _) in enumerate(runs):
+            row_out = {name: r.get(name, "") for name in id_fields}
+            for name in metrics.names:
+                row_out[name] = fmt_value(values[name][i])
             writer.writerow(row_out)
 
     print("CSV generado:", out_csv)
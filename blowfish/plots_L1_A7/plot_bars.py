@@ -12,7 +12,7 @@ except Exception:
     print("ERROR: matplotlib no esta instalado. Instala python3-matplotlib para usar este script.")
     raise SystemExit(1)
 
-SKIP_COLS = {"jeu_donnees", "L1_taille", "dossier_sortie"}
+SKIP_COLS = {"jeu_donnees", "L1_taille", "variante", "dossier_sortie"}
 
 
 def parse_size(label: str) -> float:
@@ -50,6 +50,13 @@ def format_value(value: float | None) -> str:
 
 
 
+def series_name(row: dict[str, str]) -> str:
+    """jeu_donnees, seguido de la variante de configuracion si el CSV la tiene."""
+    ds = row.get("jeu_donnees", "")
+    variant = row.get("variante", "")
+    return f"{ds}/{variant}" if ds and variant else ds
+
+
 def pick_csv(dir_path: Path, csv_arg: str | None) -> Path:
     if csv_arg:
         return Path(csv_arg)
@@ -82,6 +89,7 @@ def main() -> int:
     parser.add_argument("--csv", help="Ruta al CSV (por defecto el primero en el directorio)")
     parser.add_argument("--outdir", help="Directorio de salida para las imagenes (por defecto esta carpeta plots)")
     parser.add_argument("--show", action="store_true", help="Mostrar las figuras en pantalla")
+    parser.add_argument("--metric", action="append", help="Graficar solo esta columna (repetible)")
     args = parser.parse_args()
 
     here = Path(__file__).resolve().parent
@@ -102,11 +110,13 @@ def main() -> int:
             continue
         if any(parse_float(r.get(col)) is not None for r in rows):
             metrics.append(col)
+    if args.metric:
+        metrics = [m for m in metrics if m in args.metric]
 
     if not metrics:
         raise SystemExit("No se encontraron columnas numericas para graficar en el CSV.")
 
-    datasets = sorted({r.get("jeu_donnees", "") for r in rows if r.get("jeu_donnees")})
+    datasets = sorted({series_name(r) for r in rows if r.get("jeu_donnees")})
     if not datasets:
         datasets = ["datos"]
     datasets = order_datasets(datasets)
@@ -120,7 +130,7 @@ def main() -> int:
     }
 
     for r in rows:
-        ds = r.get("jeu_donnees", "") or datasets[0]
+        ds = series_name(r) or datasets[0]
         l1 = r.get("L1_taille", "")
         if ds not in values or l1 not in values[ds]:
             continue
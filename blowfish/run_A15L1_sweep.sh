@@ -10,60 +10,359 @@ KEY="1234567890abcdeffedcba0987654321"
 
 PROG="/home/santiago/archmic/Tp4/blowfish/bf.riscv"
 
+# gem5 stats output: text (stats.txt), gzip (stats.txt.gz) or hdf5 (stats.h5)
+STATS_FORMAT="${STATS_FORMAT:-text}"
+REPO_DIR="$(dirname "$BASE_DIR")"
+
 L1_SIZES=("2kB" "4kB" "8kB" "16kB" "32kB")
 
+# L1D:L2 prefetcher pairs to sweep on top of the L1 sizes (none, stride,
+# tagged, bop, stream), e.g. PREFETCHERS="none:none stride:none stride:bop".
+# Any pair but none:none adds _pf-<l1d>-<l2> to the run folder and a
+# variante column to the CSVs.
+read -r -a PREFETCHERS <<< "${PREFETCHERS:-none:none}"
+
+# Front-end settings to sweep, as <l1i prefetcher>:<fetch buffer B>:<fetch
+# queue> (l1i prefetcher none, nextline or ahead; 0 keeps the core's size),
+# e.g. FRONTENDS="none:0:0 nextline:0:0 ahead:0:16". Anything but none:0:0
+# adds _fe-<l1i>-<buffer>-<queue> to the run folder and variante.
+read -r -a FRONTENDS <<< "${FRONTENDS:-none:0:0}"
+
+# L1:L2 replacement policies to sweep (lru, plru, random, bip, rrip, brrip,
+# fifo), e.g. REPLACEMENTS="lru:lru plru:lru brrip:brrip". Anything but
+# lru:lru adds _rp-<l1>-<l2> to the run folder and variante.
+read -r -a REPLACEMENTS <<< "${REPLACEMENTS:-lru:lru}"
+
+# L1D:L2 compressors to sweep (none, bdi, cpack, fpc), e.g.
+# COMPRESSORS="none:none none:bdi none:fpc". Anything but none:none adds
+# _cz-<l1d>-<l2> to the run folder and variante.
+read -r -a COMPRESSORS <<< "${COMPRESSORS:-none:none}"
+
+# L1D:L2 lines per sector tag to sweep (0 = conventional tags), e.g.
+# SECTORS="0:0 2:0 4:0"; a sectored cache has that many times fewer tags.
+# Anything but 0:0 adds _sec-<l1d>-<l2> to the run folder and variante.
+read -r -a SECTORS <<< "${SECTORS:-0:0}"
+
+# L1D write policy:L1D write buffers:L2 clusivity to sweep (allocate or
+# no-allocate : 0 for gem5's 8 entries : incl or excl), e.g.
+# WRITES="allocate:0:incl no-allocate:0:incl allocate:0:excl". Anything but
+# allocate:0:incl adds _wr-<policy>-<buffers>-<clusivity> to the run folder
+# and variante.
+read -r -a WRITES <<< "${WRITES:-allocate:0:incl}"
+
+# Cache line sizes in bytes to sweep (16, 32, 64, 128; 64 on this core),
+# e.g. LINE_SIZES="16 32 64 128". The fetch buffer follows the line unless a
+# FRONTENDS entry sets it. Any size but 64 adds _line-<bytes> to the run
+# folder and variante.
+LINE_SIZE_CORE=64
+read -r -a LINE_SIZES <<< "${LINE_SIZES:-$LINE_SIZE_CORE}"
+
+# L2 configurations to sweep as <size>:<assoc>[:<latency>], or none for no
+# L2 (the L1s then sit on the memory bus), e.g.
+# L2_CONFIGS="none 128kB:16 256kB:16 512kB:16 1MB:16". The hit latency
+# follows the size (L2_LATENCY in the config) unless given. Anything but
+# 512kB:16 adds _l2-<size>-<assoc>[-<latency>] or _l2-none to the run folder
+# and variante.
+L2_CORE="512kB:16"
+read -r -a L2_CONFIGS <<< "${L2_CONFIGS:-$L2_CORE}"
+
+# Multi-core configurations to sweep as <cores>:<L2 private or shared>:<L3
+# size or none>[:<mix>], e.g. MULTICORE="1:private:none 4:shared:none
+# 4:private:2MB 3:shared:none:blowfish,sha". Core 0 runs this programme; the
+# others run copies of it, or the mix benchmarks (dijkstra, blowfish, sha)
+# on the same data set. CPI and numCycles are those of core 0. Anything but
+# 1:private:none adds _mc-<cores>-<L2>-<L3>[-<mix>] to the run folder and
+# variante (mix names joined by dots).
+read -r -a MULTICORE <<< "${MULTICORE:-1:private:none}"
+
+# I/D splits of an L1 budget as <l1i>:<l1d> in kB, e.g.
+# L1_SPLITS="4kB:12kB 12kB:4kB". When set they replace L1_SIZES: the
+# L1_taille of a split is the mean of its two sizes (budget / 2) and
+# _split-<l1i>-<l1d> is added to the run folder and variante.
+# analysis.l1split runs this with the splits it wants to measure.
+read -r -a L1_SPLITS <<< "${L1_SPLITS:-}"
+if [[ ${#L1_SPLITS[@]} -gt 0 ]]; then
+  L1_SIZES=("${L1_SPLITS[@]}")
+fi
+
+# Data sets to run (small, large)
+read -r -a DATASETS <<< "${DATASETS:-small large}"
+
+VARIANTS=0
+if [[ "${PREFETCHERS[*]}" != "none:none" || "${FRONTENDS[*]}" != "none:0:0" \
+      || "${REPLACEMENTS[*]}" != "lru:lru" || "${COMPRESSORS[*]}" != "none:none" \
+      || "${SECTORS[*]}" != "0:0" || "${WRITES[*]}" != "allocate:0:incl" \
+      || "${LINE_SIZES[*]}" != "$LINE_SIZE_CORE" || "${L2_CONFIGS[*]}" != "$L2_CORE" \
+      || "${MULTICORE[*]}" != "1:private:none" || ${#L1_SPLITS[@]} -gt 0 ]]; then
+  VARIANTS=1
+fi
+
 OUT_SIM_BASE="${BASE_DIR}/runs_L1_A15"
 OUT_CSV_DIR="${BASE_DIR}/plots_L1_A15"
 
-CSV_OUT="${OUT_CSV_DIR}/resultats_L1_A15_blowfish.csv"
+CSV_OUT="${CSV_OUT:-${OUT_CSV_DIR}/resultats_L1_A15_blowfish.csv}"
+METRICS_OUT="${OUT_CSV_DIR}/metrics_L1_A15_blowfish.csv"
+
+# STATS_PIPE=1: no run folders; gem5 streams its stats through a FIFO into
+# analysis.stream, which appends only the metrics rows to METRICS_OUT
+STATS_PIPE="${STATS_PIPE:-0}"
 
 mkdir -p "$OUT_SIM_BASE" "$OUT_CSV_DIR"
 cd "$BASE_DIR"
 
-echo "jeu_donnees,L1_taille,cpi,numCycles,dossier_sortie" > "$CSV_OUT"
+if [[ "$STATS_PIPE" == "1" ]]; then
+  rm -f "$METRICS_OUT"
+else
+  if [[ "$VARIANTS" == "1" ]]; then
+    echo "jeu_donnees,L1_taille,variante,cpi,numCycles,dossier_sortie" > "$CSV_OUT"
+  else
+    echo "jeu_donnees,L1_taille,cpi,numCycles,dossier_sortie" > "$CSV_OUT"
+  fi
+fi
+
+# stat_value <stats file> <key>: value of key in stats.txt, stats.txt.gz or stats.h5
+stat_value() {
+  case "$1" in
+    *.h5) PYTHONPATH="$REPO_DIR" python3 -m analysis.stats "$1" "$2" ;;
+    *) gzip -cdf "$1" | awk -v k="$2" '$1==k && !n {print $2; n=1}' ;;
+  esac
+}
+
+# set_config <prefetchers> <front-end> <replacement> <compressors> <sectors>
+# <writes> <line size> <L2> <multi-core>: one entry of each list above. Sets
+# CFG_OPTS (config options), VARIANT (run folder suffix and variante value,
+# empty for the base configuration) and CPU_STATS (stats prefix of core 0).
+set_config() {
+  local l1d_pf l2_pf l1i_pf fetch_buf fetch_queue l1_rp l2_rp l1d_cz l2_cz l1d_sec l2_sec
+  local wr_policy wr_buffers clusivity l2_size l2_assoc l2_lat cores l2_sharing l3_size mix
+  IFS=: read -r l1d_pf l2_pf <<< "$1"
+  IFS=: read -r l1i_pf fetch_buf fetch_queue <<< "$2"
+  IFS=: read -r l1_rp l2_rp <<< "$3"
+  IFS=: read -r l1d_cz l2_cz <<< "$4"
+  IFS=: read -r l1d_sec l2_sec <<< "$5"
+  IFS=: read -r wr_policy wr_buffers clusivity <<< "$6"
+  IFS=: read -r l2_size l2_assoc l2_lat <<< "$8"
+  IFS=: read -r cores l2_sharing l3_size mix <<< "$9"
+
+  CFG_OPTS=(
+    --l1d-prefetcher="$l1d_pf" --l2-prefetcher="$l2_pf"
+    --l1i-prefetcher="$l1i_pf" --fetch-buffer-size="$fetch_buf" --fetch-queue-size="$fetch_queue"
+    --l1-replacement="$l1_rp" --l2-replacement="$l2_rp"
+    --l1d-compressor="$l1d_cz" --l2-compressor="$l2_cz"
+    --l1d-sector-blocks="$l1d_sec" --l2-sector-blocks="$l2_sec"
+    --l1d-write-policy="$wr_policy" --l1d-write-buffers="$wr_buffers" --l2-clusivity="$clusivity"
+    --line-size="$7"
+    --l2-size="$l2_size"
+  )
+  if [[ "$l2_size" != "none" ]]; then
+    CFG_OPTS+=(--l2-assoc="$l2_assoc" --l2-latency="${l2_lat:-0}")
+  fi
+  CFG_OPTS+=(--cores="$cores" --l2-sharing="$l2_sharing" --l3-size="$l3_size" --mix="$mix")
+  CPU_STATS="system.cpu"
+  if [[ "$cores" -gt 1 ]]; then
+    CPU_STATS="system.cpu0"
+  fi
+
+  local parts=()
+  if [[ "$1" != "none:none" ]]; then
+    parts+=("pf-${l1d_pf}-${l2_pf}")
+  fi
+  if [[ "$2" != "none:0:0" ]]; then
+    parts+=("fe-${l1i_pf}-${fetch_buf}-${fetch_queue}")
+  fi
+  if [[ "$3" != "lru:lru" ]]; then
+    parts+=("rp-${l1_rp}-${l2_rp}")
+  fi
+  if [[ "$4" != "none:none" ]]; then
+    parts+=("cz-${l1d_cz}-${l2_cz}")
+  fi
+  if [[ "$5" != "0:0" ]]; then
+    parts+=("sec-${l1d_sec}-${l2_sec}")
+  fi
+  if [[ "$6" != "allocate:0:incl" ]]; then
+    parts+=("wr-${wr_policy}-${wr_buffers}-${clusivity}")
+  fi
+  if [[ "$7" != "$LINE_SIZE_CORE" ]]; then
+    parts+=("line-$7")
+  fi
+  if [[ "$8" != "$L2_CORE" ]]; then
+    parts+=("l2-${8//:/-}")
+  fi
+  if [[ "$9" != "1:private:none" ]]; then
+    parts+=("mc-${cores}-${l2_sharing}-${l3_size}${mix:+-${mix//,/.}}")
+  fi
+  VARIANT="$(IFS=_; echo "${parts[*]}")"
+}
+
+# size_bytes <size>: bytes of a <n>B, <n>kB or <n>MB size, empty otherwise
+size_bytes() {
+  if [[ "$1" =~ ^([0-9]+)(B|kB|MB)$ ]]; then
+    case "${BASH_REMATCH[2]}" in
+      B) echo "${BASH_REMATCH[1]}" ;;
+      kB) echo "$(( BASH_REMATCH[1] * 1024 ))" ;;
+      MB) echo "$(( BASH_REMATCH[1] * 1024 * 1024 ))" ;;
+    esac
+  fi
+}
+
+# set_l1 <L1_SIZES entry>: sets L1 (L1_taille), L1_OPTS (size options) and
+# RUN_VARIANT (VARIANT, plus split-<l1i>-<l1d> for an I/D split). The two
+# sides of a split must add up to a multiple of 2kB, so that L1_taille (their
+# mean) is a whole number of kB.
+set_l1() {
+  RUN_VARIANT="${VARIANT:-}"
+  if [[ "$1" == *:* ]]; then
+    local l1i="${1%%:*}" l1d="${1##*:}"
+    local bi bd
+    bi="$(size_bytes "$l1i")"
+    bd="$(size_bytes "$l1d")"
+    if [[ -z "$bi" || -z "$bd" || $(( (bi + bd) % 2048 )) -ne 0 ]]; then
+      echo "ERROR: L1_SPLITS entry $1: sizes must be <n>B, <n>kB or <n>MB adding up to a multiple of 2kB"
+      exit 1
+    fi
+    L1="$(( (bi + bd) / 2048 ))kB"
+    L1_OPTS=(--l1i-size="$l1i" --l1d-size="$l1d")
+    RUN_VARIANT="${VARIANT:+${VARIANT}_}split-${l1i}-${l1d}"
+  else
+    L1="$1"
+    L1_OPTS=(--l1-size="$1")
+  fi
+}
 
 run_one() {
   local dataset="$1"
   local input_file="$2"
-  local l1="$3"
+  set_l1 "$3"
+  local l1="$L1"
+  local variant="$RUN_VARIANT"
 
-  local outdir="${OUT_SIM_BASE}/blowfish_${dataset}_L1_${l1}"
+  local outdir="${OUT_SIM_BASE}/blowfish_${dataset}_L1_${l1}${variant:+_${variant}}"
   rm -rf "$outdir"
   mkdir -p "$outdir"
   local output_file="${outdir}/output_${dataset}.enc"
 
-  echo "Running: dataset=${dataset}, L1=${l1}"
+  echo "Running: dataset=${dataset}, L1=${l1}${variant:+, ${variant}}"
   "$GEM5" -d "$outdir" \
     "$CFG" \
     --cmd="$PROG" \
-    --l1-size="$l1" \
+    "${L1_OPTS[@]}" \
+    "${CFG_OPTS[@]}" --mix-dataset="$dataset" \
+    --stats-format="$STATS_FORMAT" \
     --options e "$input_file" "$output_file" "$KEY" >/dev/null
 
-  local stats="${outdir}/stats.txt"
-  if [[ ! -f "$stats" ]]; then
+  local stats=""
+  for f in stats.txt stats.txt.gz stats.h5; do
+    if [[ -f "${outdir}/${f}" ]]; then
+      stats="${outdir}/${f}"
+      break
+    fi
+  done
+  if [[ -z "$stats" ]]; then
     echo "ERROR: No stats.txt in $outdir"
     exit 1
   fi
 
   local cpi cycles
-  cpi="$(awk '$1=="system.cpu.cpi"{print $2; exit}' "$stats")"
-  cycles="$(awk '$1=="system.cpu.numCycles"{print $2; exit}' "$stats")"
+  cpi="$(stat_value "$stats" "${CPU_STATS}.cpi")"
+  cycles="$(stat_value "$stats" "${CPU_STATS}.numCycles")"
 
   if [[ -z "${cpi}" || -z "${cycles}" ]]; then
-    echo "ERROR: Missing system.cpu.cpi or system.cpu.numCycles in $stats"
+    echo "ERROR: Missing ${CPU_STATS}.cpi or ${CPU_STATS}.numCycles in $stats"
     exit 1
   fi
 
-  echo "${dataset},${l1},${cpi},${cycles},${outdir}" >> "$CSV_OUT"
+  if [[ "$VARIANTS" == "1" ]]; then
+    echo "${dataset},${l1},${variant},${cpi},${cycles},${outdir}" >> "$CSV_OUT"
+  else
+    echo "${dataset},${l1},${cpi},${cycles},${outdir}" >> "$CSV_OUT"
+  fi
   echo "CPI=${cpi} | numCycles=${cycles}"
 }
 
+run_one_piped() {
+  local dataset="$1"
+  local input_file="$2"
+  set_l1 "$3"
+  local l1="$L1"
+  local variant="$RUN_VARIANT"
+
+  local tmpdir
+  tmpdir="$(mktemp -d)"
+  local fifo="${tmpdir}/stats.fifo"
+  mkfifo "$fifo"
+  local output_file="${tmpdir}/output_${dataset}.enc"
+
+  echo "Running (pipe): dataset=${dataset}, L1=${l1}${variant:+, ${variant}}"
+  local fields=(--field jeu_donnees="$dataset" --field L1_taille="$l1")
+  if [[ "$VARIANTS" == "1" ]]; then
+    fields+=(--field variante="$variant")
+  fi
+  PYTHONPATH="$REPO_DIR" python3 -m analysis.stream "$fifo" --out "$METRICS_OUT" "${fields[@]}" &
+  local reader=$!
+
+  if ! "$GEM5" -d "$tmpdir" --dump-config= --json-config= --dot-config= \
+    --stats-file="$fifo" \
+    "$CFG" \
+    --cmd="$PROG" \
+    "${L1_OPTS[@]}" \
+    "${CFG_OPTS[@]}" --mix-dataset="$dataset" \
+    --options e "$input_file" "$output_file" "$KEY" >/dev/null; then
+    kill "$reader" 2>/dev/null || true
+    rm -rf "$tmpdir"
+    echo "ERROR: gem5 failed for dataset=${dataset}, L1=${l1}${variant:+, ${variant}}"
+    exit 1
+  fi
+  wait "$reader"
+  rm -rf "$tmpdir"
+}
+
+run() {
+  if [[ "$STATS_PIPE" == "1" ]]; then
+    run_one_piped "$@"
+  else
+    run_one "$@"
+  fi
+}
+
+# Check every L1_SIZES / L1_SPLITS entry before the first run
 for l1 in "${L1_SIZES[@]}"; do
-  run_one "small" "$INPUT_SMALL" "$l1"
+  set_l1 "$l1"
 done
 
-for l1 in "${L1_SIZES[@]}"; do
-  run_one "large" "$INPUT_LARGE" "$l1"
+for pf in "${PREFETCHERS[@]}"; do
+for fe in "${FRONTENDS[@]}"; do
+for rp in "${REPLACEMENTS[@]}"; do
+for cz in "${COMPRESSORS[@]}"; do
+for sec in "${SECTORS[@]}"; do
+for wr in "${WRITES[@]}"; do
+for line in "${LINE_SIZES[@]}"; do
+for l2 in "${L2_CONFIGS[@]}"; do
+for mc in "${MULTICORE[@]}"; do
+  set_config "$pf" "$fe" "$rp" "$cz" "$sec" "$wr" "$line" "$l2" "$mc"
+
+  if [[ " ${DATASETS[*]} " == *" small "* ]]; then
+    for l1 in "${L1_SIZES[@]}"; do
+      run "small" "$INPUT_SMALL" "$l1"
+    done
+  fi
+
+  if [[ " ${DATASETS[*]} " == *" large "* ]]; then
+    for l1 in "${L1_SIZES[@]}"; do
+      run "large" "$INPUT_LARGE" "$l1"
+    done
+  fi
+done
+done
+done
+done
+done
+done
+done
+done
 done
 
-echo "CSV guardado en: $CSV_OUT"
+if [[ "$STATS_PIPE" == "1" ]]; then
+  echo "CSV guardado en: $METRICS_OUT"
+else
+  echo "CSV guardado en: $CSV_OUT"
+fi
@@ -0,0 +1 @@
+"""Trace-driven (offline) cache models used next to the gem5 L1 sweeps."""
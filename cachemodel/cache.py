@@ -0,0 +1,252 @@
+"""Set-associative cache simulation over a trace: LRU and Belady's OPT.
+
+LRU is what the gem5 L1s use by default; OPT (Belady's MIN, evict the block
+whose next use is furthest away) is the lower bound on misses for the same
+size, associativity and line. OPT needs the future, so the trace is first
+turned into a next-use index in one backward pass; each access then costs
+O(log assoc) with a lazily-cleaned max-heap per set.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import heapq
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Sequence
+
+from .common import fmt, fmt_size, parse_size, parse_size_list
+from .trace import STREAMS, load_lines
+
+NEVER = (1 << 63) - 1
+
+
+@dataclass(frozen=True)
+class CacheConfig:
+    size: int      # [bytes]
+    assoc: int     # 0 = fully associative
+    line: int      # [bytes]
+
+    @property
+    def num_lines(self) -> int:
+        return self.size // self.line
+
+    @property
+    def ways(self) -> int:
+        return self.num_lines if self.assoc <= 0 else min(self.assoc, self.num_lines)
+
+    @property
+    def num_sets(self) -> int:
+        return max(1, self.num_lines // self.ways)
+
+    def label(self) -> str:
+        a = "full" if self.assoc <= 0 else f"{self.assoc}way"
+        return f"{fmt_size(self.size)}_{a}"
+
+
+@dataclass
+class SimResult:
+    config: CacheConfig
+    accesses: int
+    lru_misses: int
+    opt_misses: int | None = None
+
+    @property
+    def lru_miss_rate(self) -> float:
+        return self.lru_misses / self.accesses if self.accesses else 0.0
+
+    @property
+    def opt_miss_rate(self) -> float | None:
+        if self.opt_misses is None:
+            return None
+        return self.opt_misses / self.accesses if self.accesses else 0.0
+
+
+def next_use_index(lines: Sequence[int]) -> array:
+    """next_use[i] = index of the next access to lines[i], or NEVER."""
+    n = len(lines)
+    nxt = array("q", [NEVER]) * n
+    seen: dict[int, int] = {}
+    for i in range(n - 1, -1, -1):
+        ln = lines[i]
+        nxt[i] = seen.get(ln, NEVER)
+        seen[ln] = i
+    return nxt
+
+
+class LruCache:
+    """Incremental LRU set-associative cache, for streamed references."""
+
+    def __init__(self, cfg: CacheConfig) -> None:
+        self.config = cfg
+        self.sets = [OrderedDict() for _ in range(cfg.num_sets)]
+        self.accesses = 0
+        self.misses = 0
+
+    def feed(self, lines: Iterable[int]) -> None:
+        n_sets, ways = self.config.num_sets, self.config.ways
+        sets = self.sets
+        accesses = misses = 0
+        for ln in lines:
+            accesses += 1
+            s = sets[ln % n_sets]
+            if ln in s:
+                s.move_to_end(ln)
+                continue
+            misses += 1
+            if len(s) >= ways:
+                s.popitem(last=False)
+            s[ln] = None
+        self.accesses += accesses
+        self.misses += misses
+
+
+def simulate_lru(lines: Sequence[int], cfg: CacheConfig) -> int:
+    """Number of misses of an LRU set-associative cache."""
+    cache = LruCache(cfg)
+    cache.feed(lines)
+    return cache.misses
+
+
+def simulate_opt(lines: Sequence[int], next_use: Sequence[int], cfg: CacheConfig) -> int:
+    """Number of misses of Belady's OPT for the same geometry (no bypass)."""
+    n_sets, ways = cfg.num_sets, cfg.ways
+    resident: list[dict[int, int]] = [{} for _ in range(n_sets)]
+    heaps: list[list[tuple[int, int]]] = [[] for _ in range(n_sets)]
+    misses = 0
+    for i, ln in enumerate(lines):
+        idx = ln % n_sets
+        res = resident[idx]
+        h = heaps[idx]
+        nu = next_use[i]
+        if ln not in res:
+            misses += 1
+            if len(res) >= ways:
+                # Pop stale heap entries until the top matches a resident block.
+                while True:
+                    neg, victim = heapq.heappop(h)
+                    if res.get(victim) == -neg:
+                        del res[victim]
+                        break
+        res[ln] = nu
+        heapq.heappush(h, (-nu, ln))
+        if len(h) > 4 * ways + 16:
+            # Keep the heap bounded: rebuild from the resident blocks only.
+            h[:] = [(-v, k) for k, v in res.items()]
+            heapq.heapify(h)
+    return misses
+
+
+def simulate_3c(lines: Sequence[int], cfg: CacheConfig) -> tuple[int, int, int, int]:
+    """Classify every miss of an LRU cache as compulsory, capacity or conflict.
+
+    A shadow fully-associative LRU cache of the same size runs alongside:
+    a miss is compulsory on the first touch of a line, capacity if the shadow
+    cache misses too, and conflict if only the set mapping caused it.
+    Returns (misses, compulsory, capacity, conflict).
+    """
+    n_sets, ways = cfg.num_sets, cfg.ways
+    sets = [OrderedDict() for _ in range(n_sets)]
+    shadow: OrderedDict[int, None] = OrderedDict()
+    shadow_size = cfg.num_lines
+    seen: set[int] = set()
+    compulsory = capacity = conflict = 0
+    for ln in lines:
+        fa_hit = ln in shadow
+        if fa_hit:
+            shadow.move_to_end(ln)
+        else:
+            if len(shadow) >= shadow_size:
+                shadow.popitem(last=False)
+            shadow[ln] = None
+
+        s = sets[ln % n_sets]
+        if ln in s:
+            s.move_to_end(ln)
+            continue
+        if len(s) >= ways:
+            s.popitem(last=False)
+        s[ln] = None
+
+        if ln not in seen:
+            seen.add(ln)
+            compulsory += 1
+        elif not fa_hit:
+            capacity += 1
+        else:
+            conflict += 1
+    return compulsory + capacity + conflict, compulsory, capacity, conflict
+
+
+def simulate(lines: Sequence[int], configs: list[CacheConfig], opt: bool = True) -> list[SimResult]:
+    next_use = next_use_index(lines) if opt else None
+    results = []
+    for cfg in configs:
+        r = SimResult(cfg, len(lines), simulate_lru(lines, cfg))
+        if next_use is not None:
+            r.opt_misses = simulate_opt(lines, next_use, cfg)
+        results.append(r)
+    return results
+
+
+def write_csv(out: Path, results: list[SimResult]) -> None:
+    fields = [
+        "cache_size", "assoc", "line", "accesses",
+        "lru_misses", "lru_miss_rate", "opt_misses", "opt_miss_rate", "opt_gap",
+    ]
+    with out.open("w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=fields)
+        w.writeheader()
+        for r in results:
+            opt_rate = r.opt_miss_rate
+            w.writerow({
+                "cache_size": fmt_size(r.config.size),
+                "assoc": r.config.assoc if r.config.assoc > 0 else "full",
+                "line": r.config.line,
+                "accesses": r.accesses,
+                "lru_misses": r.lru_misses,
+                "lru_miss_rate": fmt(r.lru_miss_rate),
+                "opt_misses": "" if r.opt_misses is None else r.opt_misses,
+                "opt_miss_rate": fmt(opt_rate),
+                # Fraction of LRU misses that a perfect replacement would remove.
+                "opt_gap": fmt(None if r.opt_misses is None or not r.lru_misses
+                               else 1.0 - r.opt_misses / r.lru_misses),
+            })
+
+
+def build_configs(sizes: list[int], assocs: list[int], line: int) -> list[CacheConfig]:
+    return [CacheConfig(s, a, line) for s in sizes for a in assocs]
+
+
+def parse_assoc_list(text: str) -> list[int]:
+    return [0 if a.strip() in ("0", "full") else int(a) for a in text.split(",") if a.strip()]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Trace-driven LRU / Belady OPT cache simulation")
+    ap.add_argument("trace", help="Trace file (.trc binary or text, see cachemodel.trace)")
+    ap.add_argument("--stream", choices=sorted(STREAMS), default="d", help="Reference stream to model")
+    ap.add_argument("--line", default="32", help="Cache line size (32 for A7, 64 for A15)")
+    ap.add_argument("--sizes", default="1kB,2kB,4kB,8kB,16kB,32kB", help="Comma-separated cache sizes")
+    ap.add_argument("--assoc", default="2", help="Comma-separated associativities ('full' = fully assoc.)")
+    ap.add_argument("--no-opt", action="store_true", help="Only simulate LRU")
+    ap.add_argument("--out", default="cache_sim.csv", help="CSV output filename")
+    args = ap.parse_args()
+
+    line = parse_size(args.line)
+    configs = build_configs(parse_size_list(args.sizes), parse_assoc_list(args.assoc), line)
+    lines = load_lines(Path(args.trace), line, args.stream)
+    results = simulate(lines, configs, opt=not args.no_opt)
+    write_csv(Path(args.out), results)
+
+    for r in results:
+        opt = "" if r.opt_misses is None else f" opt={r.opt_miss_rate:.4f}"
+        print(f"{r.config.label()}: lru={r.lru_miss_rate:.4f}{opt}")
+    print("CSV written:", args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
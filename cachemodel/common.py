@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+# Same suffix convention as gem5 ("32kB", "512kB", "2MB").
+SIZE_SUFFIXES = (("kb", 1024), ("mb", 1024 * 1024), ("gb", 1024 * 1024 * 1024), ("b", 1))
+
+
+def parse_size(label: str) -> int:
+    """Parse a gem5-style size label ("4kB", "512kB", "64") into bytes."""
+    s = label.strip().lower()
+    for suffix, factor in SIZE_SUFFIXES:
+        if s.endswith(suffix):
+            return int(float(s[: -len(suffix)]) * factor)
+    return int(s)
+
+
+def fmt_size(n_bytes: int) -> str:
+    """Inverse of parse_size for the labels used in the run folders (1kB, 16kB...)."""
+    for suffix, factor in (("MB", 1024 * 1024), ("kB", 1024)):
+        if n_bytes >= factor and n_bytes % factor == 0:
+            return f"{n_bytes // factor}{suffix}"
+    return f"{n_bytes}B"
+
+
+def parse_size_list(text: str) -> list[int]:
+    return [parse_size(s) for s in text.split(",") if s.strip()]
+
+
+def fmt(val: float | None) -> str:
+    if val is None:
+        return ""
+    return f"{val:.6f}".rstrip("0").rstrip(".")
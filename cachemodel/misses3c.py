@@ -0,0 +1,98 @@
+"""3C miss breakdown (compulsory / capacity / conflict) per workload and L1 size.
+
+One row per (programme, jeu_donnees, L1_taille, cache), using the same column
+names as the metrics_L1_*.csv files so the sweeps and the offline model can be
+read side by side. Plot the result with cachemodel.plot_3c.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+from pathlib import Path
+
+from .cache import CacheConfig, simulate_3c
+from .common import fmt, fmt_size, parse_size, parse_size_list
+from .trace import load_lines
+
+CACHES = {"icache": "i", "dcache": "d"}
+
+OUT_FIELDS = [
+    "programme",
+    "jeu_donnees",
+    "L1_taille",
+    "cache",
+    "assoc",
+    "accesses",
+    "misses",
+    "compulsory",
+    "capacity",
+    "conflict",
+    "miss_rate",
+    "compulsory_rate",
+    "capacity_rate",
+    "conflict_rate",
+]
+
+
+def parse_trace_arg(text: str) -> tuple[str, str, Path]:
+    try:
+        program, dataset, path = text.split(":", 2)
+    except ValueError:
+        raise SystemExit(f"--trace expects PROGRAMME:JEU:CHEMIN, got {text!r}")
+    return program, dataset, Path(path)
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="3C miss classification from traces")
+    ap.add_argument("--trace", action="append", required=True,
+                    help="PROGRAMME:JEU:CHEMIN, e.g. dijkstra:small:traces/dijkstra_small.trc (repeatable)")
+    ap.add_argument("--line", default="32", help="Cache line size (32 for A7, 64 for A15)")
+    ap.add_argument("--sizes", default="1kB,2kB,4kB,8kB,16kB", help="Comma-separated L1 sizes")
+    ap.add_argument("--assoc", type=int, default=2, help="L1 associativity (2 in both Cortex configs)")
+    ap.add_argument("--caches", default="icache,dcache", help="Which L1s to model")
+    ap.add_argument("--out", default="misses3c_L1.csv", help="CSV output filename")
+    args = ap.parse_args()
+
+    line = parse_size(args.line)
+    sizes = parse_size_list(args.sizes)
+    caches = [c.strip() for c in args.caches.split(",") if c.strip()]
+    for c in caches:
+        if c not in CACHES:
+            raise SystemExit(f"Unknown cache {c!r} (expected one of {sorted(CACHES)})")
+
+    with open(args.out, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=OUT_FIELDS)
+        writer.writeheader()
+        for spec in args.trace:
+            program, dataset, path = parse_trace_arg(spec)
+            for cache in caches:
+                lines = load_lines(path, line, CACHES[cache])
+                n = len(lines)
+                for size in sizes:
+                    cfg = CacheConfig(size, args.assoc, line)
+                    misses, comp, cap, conf = simulate_3c(lines, cfg)
+                    writer.writerow({
+                        "programme": program,
+                        "jeu_donnees": dataset,
+                        "L1_taille": fmt_size(size),
+                        "cache": cache,
+                        "assoc": args.assoc,
+                        "accesses": n,
+                        "misses": misses,
+                        "compulsory": comp,
+                        "capacity": cap,
+                        "conflict": conf,
+                        "miss_rate": fmt(misses / n if n else None),
+                        "compulsory_rate": fmt(comp / n if n else None),
+                        "capacity_rate": fmt(cap / n if n else None),
+                        "conflict_rate": fmt(conf / n if n else None),
+                    })
+                    print(f"{program} {dataset} {cache} {fmt_size(size)}: "
+                          f"comp={comp} cap={cap} conf={conf}")
+
+    print("CSV written:", args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,267 @@
+"""LRU miss-ratio curves from reuse (stack) distances.
+
+Exact mode tracks every distinct cache line. Sampled mode follows SHARDS
+(Waldspurger et al., FAST'15): a line is kept only if its spatial hash falls
+under a threshold T, and distances are rescaled by the sampling rate R = T/P.
+With ``max_lines`` the sample has a fixed size: when it overflows, T is lowered
+to evict the lines with the largest hashes, so memory stays bounded whatever
+the trace length.
+
+The error estimate splits the sampled lines into ERROR_GROUPS independent hash
+groups, each with its own stack (a SHARDS sample at rate R/G), and reports the
+standard error of the mean of the per-group curves at each cache size.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import heapq
+import math
+from pathlib import Path
+
+from .common import fmt, fmt_size, parse_size, parse_size_list
+from .trace import STREAMS, read_lines
+
+HASH_BITS = 24
+HASH_MODULUS = 1 << HASH_BITS
+ERROR_GROUP_BITS = 3
+ERROR_GROUPS = 1 << ERROR_GROUP_BITS
+
+_M64 = (1 << 64) - 1
+
+
+def spatial_hash(line: int) -> int:
+    """splitmix64 finalizer: cheap, well-mixed 64-bit hash of a line number."""
+    z = (line + 0x9E3779B97F4A7C15) & _M64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _M64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _M64
+    return z ^ (z >> 31)
+
+
+class LruStack:
+    """Reuse distances over a Fenwick tree indexed by last-access time.
+
+    Timestamps are renumbered when the tree is full, so its size follows the
+    number of live lines rather than the number of references.
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.capacity = capacity
+        self.tree = [0] * (capacity + 1)
+        self.last: dict[int, int] = {}
+        self.now = 0
+
+    def _add(self, i: int, delta: int) -> None:
+        tree, n = self.tree, self.capacity
+        while i <= n:
+            tree[i] += delta
+            i += i & -i
+
+    def _prefix(self, i: int) -> int:
+        tree, s = self.tree, 0
+        while i > 0:
+            s += tree[i]
+            i -= i & -i
+        return s
+
+    def _compact(self) -> None:
+        order = sorted(self.last, key=self.last.__getitem__)
+        self.capacity = max(1024, 2 * len(order) + 2)
+        tree = [0] * (self.capacity + 1)
+        for t, line in enumerate(order, 1):
+            self.last[line] = t
+            tree[t] = 1
+        # O(n) Fenwick build: push every node into its parent.
+        for t in range(1, self.capacity + 1):
+            parent = t + (t & -t)
+            if parent <= self.capacity:
+                tree[parent] += tree[t]
+        self.tree = tree
+        self.now = len(order)
+
+    def access(self, line: int) -> int:
+        """Record an access; return its reuse distance, or -1 on first touch."""
+        if self.now >= self.capacity:
+            self._compact()
+        t = self.last.get(line)
+        self.now += 1
+        if t is None:
+            dist = -1
+        else:
+            dist = self._prefix(self.now - 1) - self._prefix(t)
+            self._add(t, -1)
+        self._add(self.now, 1)
+        self.last[line] = self.now
+        return dist
+
+    def remove(self, line: int) -> None:
+        self._add(self.last.pop(line), -1)
+
+    def __len__(self) -> int:
+        return len(self.last)
+
+
+class MissRatioCurve:
+    """Weighted reuse-distance histogram, in lines (already rescaled by 1/R)."""
+
+    def __init__(self) -> None:
+        self.hist: dict[int, float] = {}
+        self.cold = 0.0
+        self.total = 0.0
+
+    def add(self, dist: float, weight: float = 1.0) -> None:
+        self.total += weight
+        if dist < 0:
+            self.cold += weight
+        else:
+            b = int(dist)
+            self.hist[b] = self.hist.get(b, 0.0) + weight
+
+    def scale(self, factor: float) -> None:
+        for b in self.hist:
+            self.hist[b] *= factor
+        self.cold *= factor
+        self.total *= factor
+
+    def miss_ratios(self, sizes_lines: list[int]) -> list[float]:
+        """Miss ratio of a fully-associative LRU cache of each size (in lines)."""
+        if self.total <= 0:
+            return [math.nan] * len(sizes_lines)
+        out = []
+        for c in sizes_lines:
+            misses = self.cold + sum(w for d, w in self.hist.items() if d >= c)
+            out.append(min(max(misses / self.total, 0.0), 1.0))
+        return out
+
+
+class ShardsResult:
+    def __init__(self, curve: MissRatioCurve, groups: list[MissRatioCurve],
+                 refs: int, sampled_refs: int, rate: float, peak_lines: int) -> None:
+        self.curve = curve
+        self.groups = groups
+        self.refs = refs
+        self.sampled_refs = sampled_refs
+        self.rate = rate
+        self.peak_lines = peak_lines
+
+    def miss_ratios(self, sizes_lines: list[int]) -> list[float]:
+        return self.curve.miss_ratios(sizes_lines)
+
+    def stderr(self, sizes_lines: list[int]) -> list[float]:
+        """Between-group standard error of the miss ratio (0 for exact runs)."""
+        if self.rate >= 1.0:
+            return [0.0] * len(sizes_lines)
+        per_group = [g.miss_ratios(sizes_lines) for g in self.groups if g.total > 0]
+        if len(per_group) < 2:
+            return [math.nan] * len(sizes_lines)
+        out = []
+        for col in zip(*per_group):
+            mean = sum(col) / len(col)
+            var = sum((x - mean) ** 2 for x in col) / (len(col) - 1)
+            out.append(math.sqrt(var / len(col)))
+        return out
+
+
+def shards(lines, rate: float = 1.0, max_lines: int = 0, adjust: bool = False) -> ShardsResult:
+    """Build an LRU miss-ratio curve from an iterable of line numbers.
+
+    rate: initial sampling rate (1.0 = exact, every line tracked).
+    max_lines: if > 0, cap the number of tracked lines (SHARDS fixed-size).
+    adjust: apply the SHARDS_adj correction for the sampled reference count.
+    """
+    if not 0.0 < rate <= 1.0:
+        raise ValueError(f"rate must be in (0, 1], got {rate}")
+    threshold = max(1, min(HASH_MODULUS, int(round(rate * HASH_MODULUS))))
+    # Lines are hashed whenever the rate is below 1 or may drop below it
+    # (max_lines); every hashed line also goes to its error-group stack, so the
+    # evicted lines below are always in both stacks.
+    hashed = threshold < HASH_MODULUS or max_lines > 0
+    stack = LruStack()
+    curve = MissRatioCurve()
+    group_stacks = [LruStack() for _ in range(ERROR_GROUPS)]
+    groups = [MissRatioCurve() for _ in range(ERROR_GROUPS)]
+    # Max-heap on the hash value of tracked lines (only needed for max_lines).
+    heap: list[tuple[int, int]] = []
+    tracked_hash: dict[int, int] = {}
+    refs = sampled = peak = 0
+
+    for line in lines:
+        refs += 1
+        r = threshold / HASH_MODULUS
+        h = spatial_hash(line) if hashed else 0
+        if (h & (HASH_MODULUS - 1)) >= threshold:
+            continue
+        sampled += 1
+        dist = stack.access(line)
+        scaled = dist / r if dist >= 0 else -1
+        curve.add(scaled)
+        if hashed:
+            g = h >> (64 - ERROR_GROUP_BITS)
+            gdist = group_stacks[g].access(line)
+            groups[g].add(gdist * ERROR_GROUPS / r if gdist >= 0 else -1)
+
+        if max_lines > 0 and line not in tracked_hash:
+            hv = h & (HASH_MODULUS - 1)
+            tracked_hash[line] = hv
+            heapq.heappush(heap, (-hv, line))
+            if len(stack) > max_lines:
+                # Lower T to the largest tracked hash and drop those lines.
+                new_t = -heap[0][0]
+                while heap and -heap[0][0] >= new_t:
+                    _, victim = heapq.heappop(heap)
+                    del tracked_hash[victim]
+                    stack.remove(victim)
+                    group_stacks[spatial_hash(victim) >> (64 - ERROR_GROUP_BITS)].remove(victim)
+                factor = new_t / threshold
+                curve.scale(factor)
+                for g in groups:
+                    g.scale(factor)
+                threshold = new_t
+        peak = max(peak, len(stack))
+
+    final_rate = threshold / HASH_MODULUS
+    if adjust and final_rate < 1.0:
+        # SHARDS_adj: credit the missing/extra sampled refs to distance 0.
+        # The histogram is kept at the final rate, so N * R is the reference.
+        curve.add(0, refs * final_rate - curve.total)
+    return ShardsResult(curve, groups, refs, sampled, final_rate, peak)
+
+
+def write_csv(out: Path, sizes: list[int], res: ShardsResult, line_size: int) -> None:
+    sizes_lines = [max(1, s // line_size) for s in sizes]
+    ratios = res.miss_ratios(sizes_lines)
+    errs = res.stderr(sizes_lines)
+    with out.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["cache_size", "lines", "miss_ratio", "stderr"])
+        for s, n, m, e in zip(sizes, sizes_lines, ratios, errs):
+            w.writerow([fmt_size(s), n, fmt(m), fmt(e)])
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="LRU miss-ratio curve (exact or SHARDS-sampled) from a trace")
+    ap.add_argument("trace", help="Trace file (.trc binary or text, see cachemodel.trace)")
+    ap.add_argument("--stream", choices=sorted(STREAMS), default="d", help="Reference stream to model")
+    ap.add_argument("--line", default="32", help="Cache line size (32 for A7, 64 for A15)")
+    ap.add_argument("--sizes", default="1kB,2kB,4kB,8kB,16kB,32kB,64kB", help="Comma-separated cache sizes")
+    ap.add_argument("--rate", type=float, default=1.0, help="Sampling rate (1.0 = exact)")
+    ap.add_argument("--max-lines", type=int, default=0,
+                    help="Fixed-size sample: max tracked lines (bounded memory); starts at --rate")
+    ap.add_argument("--adjust", action="store_true",
+                    help="Apply the SHARDS_adj correction (not reflected in the stderr column)")
+    ap.add_argument("--out", default="mrc.csv", help="CSV output filename")
+    args = ap.parse_args()
+
+    line_size = parse_size(args.line)
+    sizes = parse_size_list(args.sizes)
+    res = shards(read_lines(Path(args.trace), line_size, args.stream),
+                 rate=args.rate, max_lines=args.max_lines, adjust=args.adjust)
+    write_csv(Path(args.out), sizes, res, line_size)
+
+    print(f"refs={res.refs} sampled={res.sampled_refs} rate={res.rate:.6g} peak_lines={res.peak_lines}")
+    print("CSV written:", args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
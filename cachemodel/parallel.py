@@ -0,0 +1,144 @@
+"""Fan many cache configurations out to a process pool over one shared trace.
+
+The parent decodes the trace once per line size into a flat file of uint64
+line numbers (plus the next-use index when OPT is requested). Workers
+memory-map those files read-only and wrap them in ``memoryview.cast("Q")``,
+so every process reads the same page-cache pages with no copy and no
+pickling of the trace. Each task returns a small array of counters.
+
+With --workdir the decoded files are kept and reused by later runs on the
+same trace, as long as they are newer than the trace file.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import mmap
+import os
+import tempfile
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from .cache import (CacheConfig, SimResult, build_configs, next_use_index, parse_assoc_list,
+                    simulate_lru, simulate_opt, write_csv)
+from .common import parse_size_list
+from .trace import STREAMS, load_lines
+
+# Per-worker state: line size -> (lines view, next-use view or None).
+_VIEWS: dict[int, tuple[memoryview, memoryview | None]] = {}
+_MAPS: list[mmap.mmap] = []
+
+
+def _map_file(path: str, typecode: str) -> memoryview:
+    if os.path.getsize(path) == 0:
+        return memoryview(b"").cast(typecode)
+    with open(path, "rb") as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    _MAPS.append(mm)
+    return memoryview(mm).cast(typecode)
+
+
+def _init_worker(files: dict[int, tuple[str, str | None]]) -> None:
+    for line, (lines_path, nu_path) in files.items():
+        _VIEWS[line] = (_map_file(lines_path, "Q"), _map_file(nu_path, "q") if nu_path else None)
+
+
+def _run_config(cfg: CacheConfig) -> array:
+    lines, next_use = _VIEWS[cfg.line]
+    lru = simulate_lru(lines, cfg)
+    opt = simulate_opt(lines, next_use, cfg) if next_use is not None else -1
+    return array("q", [len(lines), lru, opt])
+
+
+def _dump(path: Path, data: array) -> None:
+    # Written aside then renamed, so an interrupted run leaves no partial file to reuse
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        data.tofile(f)
+    os.replace(tmp, path)
+
+
+def _fresh(path: Path, trace: Path) -> bool:
+    return path.is_file() and path.stat().st_mtime >= trace.stat().st_mtime
+
+
+def _load(path: Path, typecode: str) -> array:
+    data = array(typecode)
+    with path.open("rb") as f:
+        data.frombytes(f.read())
+    return data
+
+
+def prepare(trace: Path, line_sizes: list[int], stream: str, opt: bool,
+            workdir: Path) -> dict[int, tuple[str, str | None]]:
+    """Decode the trace once per line size into mmap-able files, reusing those newer than the trace."""
+    files: dict[int, tuple[str, str | None]] = {}
+    # Keyed on the resolved path so same-named traces from other folders never share files.
+    key = hashlib.sha1(str(trace.resolve()).encode()).hexdigest()[:12]
+    for line in line_sizes:
+        stem = f"{trace.name}.{key}.{line}B.{stream}"
+        lines_path = workdir / f"{stem}.lines"
+        nu_path = workdir / f"{stem}.nextuse" if opt else None
+        lines = None
+        if not _fresh(lines_path, trace):
+            lines = load_lines(trace, line, stream)
+            _dump(lines_path, lines)
+        if nu_path is not None and (lines is not None or not _fresh(nu_path, trace)):
+            if lines is None:
+                lines = _load(lines_path, "Q")
+            _dump(nu_path, next_use_index(lines))
+        files[line] = (str(lines_path), str(nu_path) if nu_path else None)
+    return files
+
+
+def run(files: dict[int, tuple[str, str | None]], configs: list[CacheConfig],
+        jobs: int) -> list[SimResult]:
+    # Largest (slowest) configurations first so the pool tail stays short.
+    order = sorted(range(len(configs)), key=lambda i: -configs[i].ways)
+    results: list[SimResult | None] = [None] * len(configs)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(files,)) as pool:
+        for i, counters in zip(order, pool.map(_run_config, [configs[i] for i in order])):
+            n, lru, opt = counters
+            results[i] = SimResult(configs[i], n, lru, None if opt < 0 else opt)
+    return results  # type: ignore[return-value]
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Parallel trace-driven LRU / OPT simulation of many configurations")
+    ap.add_argument("trace", help="Trace file (.trc binary or text, see cachemodel.trace)")
+    ap.add_argument("--stream", choices=sorted(STREAMS), default="d", help="Reference stream to model")
+    ap.add_argument("--lines", default="32", help="Comma-separated cache line sizes")
+    ap.add_argument("--sizes", default="1kB,2kB,4kB,8kB,16kB,32kB,64kB", help="Comma-separated cache sizes")
+    ap.add_argument("--assoc", default="1,2,4,8", help="Comma-separated associativities ('full' allowed)")
+    ap.add_argument("--no-opt", action="store_true", help="Only simulate LRU")
+    ap.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    ap.add_argument("--workdir", help="Keep the decoded trace here and reuse it while newer than the trace "
+                    "(default: a temporary directory)")
+    ap.add_argument("--out", default="cache_sim.csv", help="CSV output filename")
+    args = ap.parse_args()
+
+    line_sizes = parse_size_list(args.lines)
+    sizes = parse_size_list(args.sizes)
+    assocs = parse_assoc_list(args.assoc)
+    configs = [cfg for line in line_sizes for cfg in build_configs(sizes, assocs, line)]
+
+    with tempfile.TemporaryDirectory(prefix="cachemodel_") as tmp:
+        workdir = Path(args.workdir) if args.workdir else Path(tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        t0 = time.perf_counter()
+        files = prepare(Path(args.trace), line_sizes, args.stream, not args.no_opt, workdir)
+        t1 = time.perf_counter()
+        results = run(files, configs, args.jobs)
+        t2 = time.perf_counter()
+
+    write_csv(Path(args.out), results)
+    print(f"{len(configs)} configurations, {args.jobs} workers: "
+          f"decode {t1 - t0:.1f}s, simulate {t2 - t1:.1f}s")
+    print("CSV written:", args.out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import argparse
+import csv
+from pathlib import Path
+
+try:
+    import matplotlib.pyplot as plt
+except Exception:
+    print("ERROR: matplotlib no esta instalado. Instala python3-matplotlib para usar este script.")
+    raise SystemExit(1)
+
+INDEX_ORDER = ["mod", "xor", "skew"]
+
+
+def parse_size(label: str) -> float:
+    s = label.strip()
+    lower = s.lower()
+    for suffix, factor in (("kb", 1.0), ("mb", 1024.0), ("gb", 1024.0 * 1024.0)):
+        if lower.endswith(suffix):
+            try:
+                return float(lower[: -len(suffix)]) * factor
+            except ValueError:
+                return float("inf")
+    try:
+        return float(lower)
+    except ValueError:
+        return float("inf")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Mapas de calor por conjunto (accesos y fallos) desde sets.csv")
+    parser.add_argument("--csv", default="sets.csv", help="CSV por conjunto generado por cachemodel.setmap")
+    parser.add_argument("--outdir", help="Directorio de salida para las imagenes (por defecto el del CSV)")
+    parser.add_argument("--show", action="store_true", help="Mostrar las figuras en pantalla")
+    args = parser.parse_args()
+
+    csv_path = Path(args.csv)
+    outdir = Path(args.outdir) if args.outdir else csv_path.resolve().parent
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    with csv_path.open(newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+        if not rows:
+            raise SystemExit("El CSV esta vacio: " + str(csv_path))
+
+    # data[L1][index] -> (accesses per set, misses per set)
+    data: dict[str, dict[str, tuple[list[int], list[int]]]] = {}
+    for r in rows:
+        acc, mis = data.setdefault(r["L1_taille"], {}).setdefault(r["index"], ([], []))
+        s = int(r["set"])
+        while len(acc) <= s:
+            acc.append(0)
+            mis.append(0)
+        acc[s] = int(r["accesses"])
+        mis[s] = int(r["misses"])
+
+    for l1 in sorted(data, key=parse_size):
+        per_index = data[l1]
+        names = [n for n in INDEX_ORDER if n in per_index] + sorted(n for n in per_index if n not in INDEX_ORDER)
+        fig, axes = plt.subplots(2, 1, figsize=(10, 1.2 + 0.9 * len(names) * 2), sharex=True)
+        for ax, k, title in ((axes[0], 0, "accesos"), (axes[1], 1, "fallos")):
+            grid = [per_index[n][k] for n in names]
+            im = ax.imshow(grid, aspect="auto", interpolation="nearest", cmap="viridis")
+            ax.set_yticks(range(len(names)))
+            ax.set_yticklabels(names)
+            ax.set_title(f"{title} por conjunto (L1 {l1})")
+            fig.colorbar(im, ax=ax)
+        axes[1].set_xlabel("conjunto")
+        fig.tight_layout()
+        out_file = outdir / f"sets_{l1}_heatmap.png"
+        fig.savefig(out_file, dpi=150)
+        if args.show:
+            plt.show()
+        plt.close(fig)
+        print("Grafico guardado en:", out_file)
+
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,180 @@
+"""Per-set pressure and alternative set-index functions, in one trace pass.
+
+Every access is fed to one cache model per index function:
+
+* ``mod``:  set = line mod n_sets (what gem5 and the Cortex parts do);
+* ``xor``:  set = (line XOR line >> log2(n_sets)) mod n_sets, i.e. the low
+  tag bits are folded into the index;
+* ``skew``: skewed-associative cache (Seznec), each way indexed by its own
+  hash; the victim is the least recently used block among the candidates.
+
+For each model the per-set access and miss counts are kept, so the heat maps
+from cachemodel.plot_sets show whether a few sets take most of the misses and
+whether hashing spreads them.
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Sequence
+
+from .cache import CacheConfig
+from .common import fmt, fmt_size, parse_size, parse_size_list
+from .trace import STREAMS, load_lines
+
+INDEX_FUNCS = ("mod", "xor", "skew")
+
+
+def _index_fn(name: str, n_sets: int) -> Callable[[int], int]:
+    bits = n_sets.bit_length() - 1
+    mask = n_sets - 1
+    if name == "mod":
+        return lambda ln: ln % n_sets
+    if 1 << bits != n_sets:
+        raise ValueError(f"{name} indexing needs a power-of-two number of sets, got {n_sets}")
+    if name == "xor":
+        return lambda ln: (ln ^ (ln >> bits)) & mask
+    raise ValueError(f"Unknown index function: {name}")
+
+
+def _rotl(x: int, r: int, bits: int) -> int:
+    if bits == 0:
+        return 0
+    r %= bits
+    mask = (1 << bits) - 1
+    return ((x << r) | (x >> (bits - r))) & mask
+
+
+class SetStats:
+    def __init__(self, name: str, n_sets: int) -> None:
+        self.name = name
+        self.accesses = array("Q", [0]) * n_sets
+        self.misses = array("Q", [0]) * n_sets
+
+    @property
+    def total_misses(self) -> int:
+        return sum(self.misses)
+
+
+def simulate_sets(lines: Sequence[int], cfg: CacheConfig,
+                  index_funcs: Sequence[str] = INDEX_FUNCS) -> list[SetStats]:
+    """Run one LRU cache per index function over the trace, in a single pass."""
+    n_sets, ways = cfg.num_sets, cfg.ways
+    bits = n_sets.bit_length() - 1
+    mask = n_sets - 1
+
+    # Conventional (one index for all ways) models.
+    conv = []
+    for name in index_funcs:
+        if name == "skew":
+            continue
+        conv.append((_index_fn(name, n_sets), [OrderedDict() for _ in range(n_sets)],
+                     SetStats(name, n_sets)))
+
+    skew_stats = None
+    if "skew" in index_funcs:
+        if 1 << bits != n_sets:
+            raise ValueError(f"skew indexing needs a power-of-two number of sets, got {n_sets}")
+        skew_stats = SetStats("skew", n_sets)
+        # One slot array per way: resident line and its last-use time.
+        skew_line = [array("q", [-1]) * n_sets for _ in range(ways)]
+        skew_time = [array("Q", [0]) * n_sets for _ in range(ways)]
+
+    for t, ln in enumerate(lines, 1):
+        for fn, sets, st in conv:
+            idx = fn(ln)
+            s = sets[idx]
+            st.accesses[idx] += 1
+            if ln in s:
+                s.move_to_end(ln)
+                continue
+            st.misses[idx] += 1
+            if len(s) >= ways:
+                s.popitem(last=False)
+            s[ln] = None
+
+        if skew_stats is not None:
+            low = ln & mask
+            tag = ln >> bits
+            victim_w = victim_i = -1
+            oldest = None
+            hit = False
+            for w in range(ways):
+                i = (low ^ _rotl(tag & mask, w, bits) ^ ((tag >> bits) * w)) & mask if w else low
+                if skew_line[w][i] == ln:
+                    skew_time[w][i] = t
+                    skew_stats.accesses[i] += 1
+                    hit = True
+                    break
+                lt = skew_time[w][i]
+                if oldest is None or lt < oldest:
+                    oldest, victim_w, victim_i = lt, w, i
+            if not hit:
+                skew_stats.accesses[victim_i] += 1
+                skew_stats.misses[victim_i] += 1
+                skew_line[victim_w][victim_i] = ln
+                skew_time[victim_w][victim_i] = t
+
+    out = [st for _, _, st in conv]
+    if skew_stats is not None:
+        out.append(skew_stats)
+    return out
+
+
+def imbalance(counts: Sequence[int]) -> float:
+    """max/mean of the per-set counts (1.0 = perfectly uniform)."""
+    total = sum(counts)
+    if not total:
+        return 0.0
+    return max(counts) / (total / len(counts))
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Per-set access/miss counts and set-index hashing comparison")
+    ap.add_argument("trace", help="Trace file (.trc binary or text, see cachemodel.trace)")
+    ap.add_argument("--stream", choices=sorted(STREAMS), default="d", help="Reference stream to model")
+    ap.add_argument("--line", default="32", help="Cache line size (32 for A7, 64 for A15)")
+    ap.add_argument("--sizes", default="1kB,2kB,4kB,8kB,16kB", help="Comma-separated cache sizes")
+    ap.add_argument("--assoc", type=int, default=2, help="Associativity")
+    ap.add_argument("--index", default=",".join(INDEX_FUNCS), help="Index functions to compare")
+    ap.add_argument("--out", default="sets.csv", help="Per-set CSV output filename")
+    ap.add_argument("--summary", default="sets_summary.csv", help="Per-config summary CSV filename")
+    args = ap.parse_args()
+
+    line = parse_size(args.line)
+    funcs = [f.strip() for f in args.index.split(",") if f.strip()]
+    for f in funcs:
+        if f not in INDEX_FUNCS:
+            raise SystemExit(f"Unknown index function {f!r} (expected one of {INDEX_FUNCS})")
+    lines = load_lines(Path(args.trace), line, args.stream)
+    n = len(lines)
+
+    with open(args.out, "w", newline="", encoding="utf-8") as f_sets, \
+            open(args.summary, "w", newline="", encoding="utf-8") as f_sum:
+        w_sets = csv.writer(f_sets)
+        w_sets.writerow(["L1_taille", "index", "set", "accesses", "misses"])
+        w_sum = csv.writer(f_sum)
+        w_sum.writerow(["L1_taille", "index", "assoc", "sets", "accesses", "misses", "miss_rate",
+                        "access_imbalance", "miss_imbalance"])
+        for size in parse_size_list(args.sizes):
+            cfg = CacheConfig(size, args.assoc, line)
+            for st in simulate_sets(lines, cfg, funcs):
+                label = fmt_size(size)
+                for i, (a, m) in enumerate(zip(st.accesses, st.misses)):
+                    w_sets.writerow([label, st.name, i, a, m])
+                misses = st.total_misses
+                w_sum.writerow([label, st.name, args.assoc, cfg.num_sets, n, misses,
+                                fmt(misses / n if n else None),
+                                fmt(imbalance(st.accesses)), fmt(imbalance(st.misses))])
+                print(f"{label} {st.name}: miss_rate={misses / max(n, 1):.4f} "
+                      f"miss_imbalance={imbalance(st.misses):.2f}")
+
+    print("CSV written:", args.out, args.summary)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,121 @@
+"""Memory-reference traces for the offline cache models.
+
+Two on-disk formats are supported:
+
+* text (``*.txt`` / ``*.txt.gz``): one reference per line, ``<kind> <hex addr>``
+  where kind is ``I`` (instruction fetch), ``R`` (load) or ``W`` (store).
+  Blank lines and ``#`` comments are ignored.
+* binary (``*.trc``): packed little-endian uint64 records, the kind in the two
+  top bits and the virtual address in the low 62 bits.
+"""
+from __future__ import annotations
+
+import gzip
+import sys
+from array import array
+from pathlib import Path
+from typing import Iterable, Iterator
+
+KIND_IFETCH = 0
+KIND_READ = 1
+KIND_WRITE = 2
+KIND_NAMES = "IRW"
+
+KIND_SHIFT = 62
+ADDR_MASK = (1 << KIND_SHIFT) - 1
+
+# Which kinds feed which L1 ("i" -> L1I, "d" -> L1D, "all" -> unified).
+STREAMS = {
+    "i": (KIND_IFETCH,),
+    "d": (KIND_READ, KIND_WRITE),
+    "all": (KIND_IFETCH, KIND_READ, KIND_WRITE),
+}
+
+_CHUNK = 1 << 16
+
+
+def is_binary(path: Path) -> bool:
+    return path.suffix == ".trc"
+
+
+def pack(kind: int, addr: int) -> int:
+    return (kind << KIND_SHIFT) | (addr & ADDR_MASK)
+
+
+def _open_text(path: Path, mode: str):
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="ascii")
+    return path.open(mode, encoding="ascii")
+
+
+def read_trace(path: Path, stream: str = "all") -> Iterator[tuple[int, int]]:
+    """Yield (kind, addr) pairs, keeping only the kinds of the given stream."""
+    kinds = STREAMS[stream]
+    if is_binary(path):
+        with path.open("rb") as f:
+            while True:
+                buf = array("Q")
+                data = f.read(_CHUNK * 8)
+                if not data:
+                    break
+                buf.frombytes(data)
+                if sys.byteorder != "little":
+                    buf.byteswap()
+                for rec in buf:
+                    kind = rec >> KIND_SHIFT
+                    if kind in kinds:
+                        yield kind, rec & ADDR_MASK
+        return
+
+    with _open_text(path, "r") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            k, a = line.split()[:2]
+            kind = KIND_NAMES.index(k.upper())
+            if kind in kinds:
+                yield kind, int(a, 16)
+
+
+def read_lines(path: Path, line_size: int, stream: str = "all") -> Iterator[int]:
+    """Yield cache-line numbers (addr // line_size) of the selected stream."""
+    shift = line_size.bit_length() - 1
+    if 1 << shift != line_size:
+        raise ValueError(f"line size must be a power of two: {line_size}")
+    for _, addr in read_trace(path, stream):
+        yield addr >> shift
+
+
+def write_trace(path: Path, records: Iterable[tuple[int, int]]) -> int:
+    """Write (kind, addr) pairs in the format implied by the file name."""
+    n = 0
+    if is_binary(path):
+        with path.open("wb") as f:
+            buf = array("Q")
+            for kind, addr in records:
+                buf.append(pack(kind, addr))
+                if len(buf) >= _CHUNK:
+                    n += len(buf)
+                    _flush(f, buf)
+                    buf = array("Q")
+            n += len(buf)
+            _flush(f, buf)
+        return n
+
+    with _open_text(path, "w") as f:
+        for kind, addr in records:
+            f.write(f"{KIND_NAMES[kind]} {addr:x}\n")
+            n += 1
+    return n
+
+
+def _flush(f, buf: array) -> None:
+    if sys.byteorder != "little":
+        buf.byteswap()
+    buf.tofile(f)
+
+
+def load_lines(path: Path, line_size: int, stream: str = "all") -> array:
+    """Materialize the line-number stream as a compact array (8 bytes/ref)."""
+    return array("Q", read_lines(path, line_size, stream))
@@ -0,0 +1,24 @@
+import random
+
+from cachemodel.mrc import shards
+
+
+def _lines(n=20000, footprint=4000, seed=1):
+    rng = random.Random(seed)
+    return [rng.randrange(footprint) for _ in range(n)]
+
+
+def test_exact_rate_tracks_every_line():
+    lines = _lines()
+    res = shards(lines)
+    assert res.rate == 1.0
+    assert res.sampled_refs == len(lines)
+    assert res.peak_lines == len(set(lines))
+
+
+def test_max_lines_from_full_rate():
+    lines = _lines()
+    res = shards(lines, rate=1.0, max_lines=500)
+    assert res.rate < 1.0
+    assert res.peak_lines <= 501
+    assert 0.0 <= res.miss_ratios([100])[0] <= 1.0